@@ -0,0 +1,172 @@
+"""Many creates, updates and deletes in one request.
+
+Operations are validated with the same ``*Create`` models as the single-resource
+endpoints and applied in order by the same insert/update/delete helpers, all on
+one connection and inside one transaction, so the request costs one token
+check, one commit and one executor hop. Every helper issues fixed SQL, so
+operations of the same kind reuse the connection's cached prepared statements.
+
+Each operation runs in a savepoint. With ``atomic`` (the default) the first
+failure rolls back the whole batch and nothing is committed; otherwise a failed
+operation is rolled back alone and the rest commit.
+"""
+import sqlite3
+import uuid
+from typing import NamedTuple
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, ValidationError
+
+from app.models.models import (
+    BatchOperationResult, BatchRequest, BatchResult, CategoryCreate, CategoryInDB, GoalCreate, GoalInDB,
+    RecurringTransactionCreate, RecurringTransactionInDB, TransactionCreate, TransactionInDB, UserInDB, quantize_money,
+)
+from app.api.category_api import _delete_category, _insert_category, _update_category
+from app.api.goal_api import _delete_goal, _insert_goal, _update_goal
+from app.api.recurring_transaction_api import (
+    _delete_recurring_transaction, _insert_recurring_transaction, _update_recurring_transaction,
+)
+from app.api.transaction_api import _delete_transaction, _insert_transaction, _update_transaction
+from app.api.transaction_import import _validation_message
+from app.auth.auth import get_current_active_user
+from app.config import settings
+from app.data.write_queue import run_write
+
+router = APIRouter()
+
+class Resource(NamedTuple):
+    label: str
+    create_model: type
+    response_model: type
+    insert: object
+    update: object
+    delete: object
+    money_fields: tuple = ()
+
+RESOURCES = {
+    "transactions": Resource(
+        "Transaction", TransactionCreate, TransactionInDB,
+        _insert_transaction, _update_transaction, _delete_transaction, ("amount",),
+    ),
+    "categories": Resource(
+        "Category", CategoryCreate, CategoryInDB, _insert_category, _update_category, _delete_category,
+    ),
+    "recurring-transactions": Resource(
+        "Recurring transaction", RecurringTransactionCreate, RecurringTransactionInDB,
+        _insert_recurring_transaction, _update_recurring_transaction, _delete_recurring_transaction, ("amount",),
+    ),
+    "goals": Resource(
+        "Goal", GoalCreate, GoalInDB, _insert_goal, _update_goal, _delete_goal, ("target_amount", "current_amount"),
+    ),
+}
+
+class BatchAborted(Exception):
+    """An atomic batch failed; carries the results up to and including the failure."""
+
+    def __init__(self, results):
+        super().__init__("batch aborted")
+        self.results = results
+
+def _prepare(operation):
+    """``(resource, op, id, body)`` for a valid operation, or a failed result."""
+    resource = RESOURCES[operation.resource]
+    if operation.op == "create":
+        operation_id = operation.id or str(uuid.uuid4())
+    elif operation.id:
+        operation_id = operation.id
+    else:
+        return BatchOperationResult(status=422, detail=f"{operation.op} needs an id")
+    body = None
+    if operation.op != "delete":
+        try:
+            body = resource.create_model(**(operation.data or {}))
+        except ValidationError as e:
+            return BatchOperationResult(status=422, id=operation_id, detail=_validation_message(e))
+    return resource, operation.op, operation_id, body
+
+def _response(resource: Resource, operation_id, user_id, body: BaseModel):
+    data = body.model_dump()
+    for field in resource.money_fields:
+        data[field] = quantize_money(data[field])
+    return resource.response_model(id=operation_id, user_id=user_id, **data).model_dump(mode="json")
+
+def _apply_one(conn, user_id, resource: Resource, op, operation_id, body):
+    if op == "create":
+        try:
+            resource.insert(conn, operation_id, user_id, body)
+        except Exception as e:
+            return BatchOperationResult(status=status.HTTP_400_BAD_REQUEST, id=operation_id, detail=str(e))
+        return BatchOperationResult(status=status.HTTP_200_OK, id=operation_id, data=_response(resource, operation_id, user_id, body))
+    try:
+        if op == "update":
+            changed = resource.update(conn, operation_id, user_id, body)
+        else:
+            changed = resource.delete(conn, operation_id, user_id)
+    except sqlite3.IntegrityError as e:
+        return BatchOperationResult(status=status.HTTP_409_CONFLICT, id=operation_id, detail=str(e))
+    if changed is None:
+        return BatchOperationResult(status=status.HTTP_409_CONFLICT, id=operation_id, detail=f"{resource.label} is in use")
+    if changed == 0:
+        return BatchOperationResult(status=status.HTTP_404_NOT_FOUND, id=operation_id, detail=f"{resource.label} not found")
+    if op == "delete":
+        return BatchOperationResult(status=status.HTTP_204_NO_CONTENT, id=operation_id)
+    return BatchOperationResult(status=status.HTTP_200_OK, id=operation_id, data=_response(resource, operation_id, user_id, body))
+
+def apply_batch(conn, user_id, prepared, atomic):
+    """Apply prepared operations in order; raises ``BatchAborted`` when an atomic batch fails."""
+    if not conn.in_transaction:
+        # Otherwise releasing the first savepoint would commit it on its own.
+        conn.execute("BEGIN IMMEDIATE")
+    results = []
+    for operation in prepared:
+        if isinstance(operation, BatchOperationResult):
+            results.append(operation)
+            continue
+        conn.execute("SAVEPOINT batch_operation")
+        result = _apply_one(conn, user_id, *operation)
+        if result.status >= 400:
+            conn.execute("ROLLBACK TO batch_operation")
+        conn.execute("RELEASE batch_operation")
+        results.append(result)
+        if result.status >= 400 and atomic:
+            raise BatchAborted(results)
+    return results
+
+def _not_applied(results, count):
+    """Pad an aborted batch's results with a 424 for every operation that did not run."""
+    failed = next(i for i, result in enumerate(results) if result.status >= 400)
+    skipped = BatchOperationResult(status=status.HTTP_424_FAILED_DEPENDENCY, detail=f"Not applied: operation {failed} failed")
+    return [
+        result if result.status >= 400 else skipped.model_copy(update={"id": result.id})
+        for result in results
+    ] + [skipped] * (count - len(results))
+
+@router.post("/batch", response_model=BatchResult)
+async def run_batch(
+    batch: BatchRequest,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """Apply ``operations`` in order in one transaction.
+
+    Each result carries the status the single-resource endpoint would have
+    returned. When an ``atomic`` batch fails, ``committed`` is false, the
+    failing operation keeps its error and every other one reports 424.
+    """
+    if len(batch.operations) > settings.BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BATCH_MAX_OPERATIONS} operations per batch",
+        )
+    prepared = [_prepare(operation) for operation in batch.operations]
+    if batch.atomic and any(isinstance(operation, BatchOperationResult) for operation in prepared):
+        results = [
+            operation if isinstance(operation, BatchOperationResult)
+            else BatchOperationResult(status=status.HTTP_200_OK, id=operation[2])
+            for operation in prepared
+        ]
+        return BatchResult(committed=False, results=_not_applied(results, len(results)))
+    try:
+        results = await run_write(current_user.id, apply_batch, current_user.id, prepared, batch.atomic)
+    except BatchAborted as e:
+        return BatchResult(committed=False, results=_not_applied(e.results, len(prepared)))
+    return BatchResult(committed=True, results=results)
@@ -1,27 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Optional
+import sqlite3
 import uuid
 
 from app.models.models import CategoryCreate, CategoryInDB, UserInDB
+from app.api.listing import KeysetListing, ListFormat
 from app.auth.auth import get_current_active_user
-from app.data.database import get_db_connection
+from app.config import settings
+from app.data.write_queue import run_write
 
 router = APIRouter()
 
+category_listing = KeysetListing(
+    "categories",
+    ("id", "user_id", "name", "type"),
+    ("name",),
+)
+
+def _insert_category(conn, category_id, user_id, category: CategoryCreate):
+    conn.execute(
+        "INSERT INTO categories (id, user_id, name, type) VALUES (?, ?, ?, ?)",
+        (category_id, user_id, category.name, category.type),
+    )
+
+def _update_category(conn, category_id, user_id, category: CategoryCreate):
+    # Rows reference the category by key, so a rename rewrites this row only.
+    cursor = conn.execute(
+        "UPDATE categories SET name = ?, type = ? WHERE id = ? AND user_id = ?",
+        (category.name, category.type, category_id, user_id),
+    )
+    return cursor.rowcount
+
+def _delete_category(conn, category_id, user_id):
+    """Return the number of rows deleted, or None if the category is still in use."""
+    # monthly_rollups has a row for every (month, type, category) that still has
+    # transactions, so it answers "is this category used" without a scan.
+    cursor = conn.execute(
+        "DELETE FROM categories WHERE id = ? AND user_id = ? "
+        "AND NOT EXISTS (SELECT 1 FROM monthly_rollups r WHERE r.user_id = categories.user_id AND r.category_key = categories.key) "
+        "AND NOT EXISTS (SELECT 1 FROM recurring_transactions rt WHERE rt.user_id = categories.user_id AND rt.category_key = categories.key)",
+        (category_id, user_id),
+    )
+    if cursor.rowcount:
+        return cursor.rowcount
+    exists = conn.execute("SELECT 1 FROM categories WHERE id = ? AND user_id = ?", (category_id, user_id)).fetchone()
+    return None if exists else 0
+
 @router.post("/categories/", response_model=CategoryInDB)
 async def create_category(
     category: CategoryCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     category_id = str(uuid.uuid4())
     try:
-        cursor.execute(
-            "INSERT INTO categories (id, user_id, name, type) VALUES (?, ?, ?, ?)",
-            (category_id, current_user.id, category.name, category.type),
-        )
-        conn.commit()
+        await run_write(current_user.id, _insert_category, category_id, current_user.id, category)
         return CategoryInDB(
             id=category_id,
             user_id=current_user.id,
@@ -30,37 +62,47 @@ async def create_category(
         )
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    finally:
-        conn.close()
 
 @router.get("/categories/", response_model=List[CategoryInDB])
 async def read_categories(
+    request: Request,
+    current_user: UserInDB = Depends(get_current_active_user),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: ListFormat = "json",
+):
+    return await category_listing.respond(
+        request, current_user.id, limit=limit, cursor=cursor, fields=fields, format=format
+    )
+
+@router.put("/categories/{category_id}", response_model=CategoryInDB)
+async def update_category(
+    category_id: str,
+    category: CategoryCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, user_id, name, type FROM categories WHERE user_id = ?",
-        (current_user.id,),
+    try:
+        updated = await run_write(current_user.id, _update_category, category_id, current_user.id, category)
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A category with this name already exists")
+    if updated == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    return CategoryInDB(
+        id=category_id,
+        user_id=current_user.id,
+        name=category.name,
+        type=category.type,
     )
-    categories_data = cursor.fetchall()
-    conn.close()
-    return [CategoryInDB(**c) for c in categories_data]
 
 @router.delete("/categories/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_category(
     category_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "DELETE FROM categories WHERE id = ? AND user_id = ?",
-        (category_id, current_user.id),
-    )
-    conn.commit()
-    if cursor.rowcount == 0:
-        conn.close()
+    deleted = await run_write(current_user.id, _delete_category, category_id, current_user.id)
+    if deleted is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Category is used by transactions or recurring transactions")
+    if deleted == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
-    conn.close()
-    return
\ No newline at end of file
+    return
@@ -0,0 +1,180 @@
+"""Delta sync: what changed in a user's rows since a cursor.
+
+Triggers log every write to transactions, categories, recurring transactions and
+goals in the user's ``changes`` table, numbered by a per-user ``seq`` (migration
+13). ``GET /changes`` returns the entries after ``since`` oldest first, one per
+row, each with the row as its list endpoint returns it now or marked deleted;
+``cursor`` continues after them. An empty cursor starts from the beginning,
+which is a full sync. ``GET /changes/stream`` sends the same pages as
+Server-Sent Events while the connection stays open.
+
+A cursor that is behind tombstones dropped since it was issued (see
+``app.data.changes``) gets 410 Gone, and the client resyncs.
+"""
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.api.category_api import category_listing
+from app.api.conditional import not_modified, resource_etag, select_versions
+from app.api.fastjson import FastJSONResponse, dumps
+from app.api.goal_api import goal_listing
+from app.api.listing import decode_cursor, encode_cursor
+from app.api.recurring_transaction_api import recurring_transaction_listing
+from app.api.transaction_api import transaction_listing
+from app.auth.auth import get_current_active_user
+from app.config import settings
+from app.data.database import UserMoving
+from app.data.executor import run_ledger
+from app.models.models import ChangeFeed, UserInDB
+
+router = APIRouter()
+
+LISTINGS = {
+    "transactions": transaction_listing,
+    "categories": category_listing,
+    "recurring-transactions": recurring_transaction_listing,
+    "goals": goal_listing,
+}
+
+class CursorExpired(Exception):
+    pass
+
+def _since(cursor: Optional[str]):
+    """``[seq, generation]`` from a cursor; None for an empty one."""
+    values = decode_cursor(cursor, 2)
+    if values is not None and not all(isinstance(value, int) for value in values):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+def changes_page(conn, user_id, after, limit):
+    """``(changes, cursor, more)``: the log after the ``after`` cursor values, the latest
+    entry per row, and the cursor values that continue after them."""
+    # One snapshot for the log and the rows it points at.
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    horizon = conn.execute("SELECT seq, generation FROM change_horizons WHERE user_id = ?", (user_id,)).fetchone()
+    horizon, generation = tuple(horizon) if horizon else (0, 0)
+    since = 0
+    if after is not None:
+        since, issued = after
+        if issued != generation and since < horizon:
+            raise CursorExpired()
+    entries = conn.execute(
+        "SELECT seq, resource, id, deleted FROM changes WHERE user_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+        (user_id, since, limit),
+    ).fetchall()
+    latest = {}
+    for seq, resource, row_id, deleted in entries:
+        latest.pop((resource, row_id), None)
+        latest[(resource, row_id)] = deleted
+
+    wanted = {}
+    for (resource, row_id), deleted in latest.items():
+        if not deleted:
+            wanted.setdefault(resource, []).append(row_id)
+    rows = {}
+    for resource, ids in wanted.items():
+        listing = LISTINGS[resource]
+        page, _ = listing.fetch_page(
+            conn, user_id, (f"id IN ({', '.join('?' * len(ids))})",), ids, None, None, listing.columns,
+        )
+        rows.update(((resource, row["id"]), row) for row in page)
+
+    changes = []
+    for key in latest:
+        # No row: a later entry, past this page, deleted it.
+        data = rows.get(key)
+        changes.append({"resource": key[0], "id": key[1], "deleted": data is None, "data": data})
+    return changes, [entries[-1][0] if entries else since, generation], len(entries) == limit
+
+def _feed(changes, cursor, more):
+    return {"changes": changes, "cursor": encode_cursor(cursor), "more": more}
+
+def _expired():
+    return HTTPException(
+        status_code=status.HTTP_410_GONE,
+        detail="Cursor is older than the retained change log; resync with an empty cursor",
+    )
+
+@router.get("/changes", response_model=ChangeFeed)
+async def read_changes(
+    request: Request,
+    current_user: UserInDB = Depends(get_current_active_user),
+    since: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+):
+    """Changes after ``since``; repeat with the returned ``cursor`` while ``more`` is true."""
+    after = _since(since)
+    etag = await resource_etag(request, current_user.id, ("changes",))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    try:
+        page = await run_ledger(current_user.id, changes_page, current_user.id, after, limit)
+    except CursorExpired:
+        raise _expired()
+    return FastJSONResponse(_feed(*page), headers={"ETag": etag})
+
+def _page_and_version(conn, user_id, after, limit):
+    page = changes_page(conn, user_id, after, limit)
+    return page, select_versions(conn, user_id, ("changes",))[0]
+
+def _event(name, data, event_id=None):
+    head = f"event: {name}\n" + (f"id: {event_id}\n" if event_id else "")
+    return head.encode() + b"data: " + dumps(data) + b"\n\n"
+
+async def _events(request: Request, user_id, page, version, limit):
+    last_sent = time.monotonic()
+    while True:
+        changes, after, more = page
+        if changes:
+            feed = _feed(changes, after, more)
+            yield _event("changes", feed, feed["cursor"])
+            last_sent = time.monotonic()
+        if not more:
+            # Wait for the user's change counter to move; it is one primary-key lookup.
+            while True:
+                await asyncio.sleep(settings.CHANGES_STREAM_POLL_SECONDS)
+                if await request.is_disconnected():
+                    return
+                try:
+                    current = (await run_ledger(user_id, select_versions, user_id, ("changes",)))[0]
+                except UserMoving:
+                    return # the client reconnects with Last-Event-ID
+                if current != version:
+                    break
+                if time.monotonic() - last_sent >= settings.CHANGES_STREAM_HEARTBEAT_SECONDS:
+                    yield b": keep-alive\n\n"
+                    last_sent = time.monotonic()
+        try:
+            page, version = await run_ledger(user_id, _page_and_version, user_id, after, limit)
+        except CursorExpired:
+            yield _event("expired", {"detail": _expired().detail})
+            return
+        except UserMoving:
+            return
+
+@router.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    current_user: UserInDB = Depends(get_current_active_user),
+    since: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-Sent Events: a ``changes`` event per page, shaped like ``GET /changes``,
+    whose event id is its cursor; a reconnecting client resumes with ``Last-Event-ID``."""
+    after = _since(last_event_id or since)
+    try:
+        page, version = await run_ledger(current_user.id, _page_and_version, current_user.id, after, limit)
+    except CursorExpired:
+        raise _expired()
+    return StreamingResponse(
+        _events(request, current_user.id, page, version, limit),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
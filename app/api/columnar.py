@@ -0,0 +1,57 @@
+"""Compact columnar binary encoding used by the ledger export.
+
+A stream is the magic bytes ``PFMCOL1\\n`` followed by blocks. Each block is a
+little-endian ``uint32`` header length, a UTF-8 JSON header
+``{"rows": n, "columns": [{"name": ..., "type": ...}, ...]}`` and then, for every
+column in order, ``n`` validity bytes (1 = value present) and the column data:
+
+* ``f8``   - ``n`` float64 values
+* ``i8``   - ``n`` int64 values
+* ``date`` - ``n`` int32 days since 1970-01-01
+* ``str``  - ``n + 1`` int32 offsets into the UTF-8 bytes that follow
+
+A zero header length marks the end of the stream.
+"""
+import json
+import struct
+import sys
+from array import array
+from datetime import date
+
+MAGIC = b"PFMCOL1\n"
+END = struct.pack("<I", 0)
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_ARRAY_CODES = {"f8": "d", "i8": "q", "date": "i"}
+_NULLS = {"f8": 0.0, "i8": 0, "date": 0}
+
+def _little_endian(values: array):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+def _encode_column(values, type_):
+    validity = bytes(0 if v is None else 1 for v in values)
+    if type_ == "str":
+        offsets = array("i", [0])
+        data = bytearray()
+        for v in values:
+            if v is not None:
+                data += str(v).encode()
+            offsets.append(len(data))
+        return validity + _little_endian(offsets) + bytes(data)
+    if type_ == "date":
+        values = [None if v is None else date.fromisoformat(v).toordinal() - _EPOCH_ORDINAL for v in values]
+    null = _NULLS[type_]
+    return validity + _little_endian(array(_ARRAY_CODES[type_], [null if v is None else v for v in values]))
+
+def encode_block(rows, columns):
+    """Encode a list of row dicts; ``columns`` is a sequence of ``(name, type)``."""
+    header = json.dumps({
+        "rows": len(rows),
+        "columns": [{"name": name, "type": type_} for name, type_ in columns],
+    }, separators=(",", ":")).encode()
+    parts = [struct.pack("<I", len(header)), header]
+    for name, type_ in columns:
+        parts.append(_encode_column([row[name] for row in rows], type_))
+    return b"".join(parts)
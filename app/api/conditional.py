@@ -0,0 +1,46 @@
+"""ETags and ``If-None-Match`` handling from per-user data versions.
+
+``data_versions`` holds one counter per (user, table), bumped by triggers in
+the same transaction as every write (migration 8). A response's ETag is
+derived from the versions of the tables it reads plus the request's path and
+query, so checking a poll costs one primary-key lookup and never touches the
+data tables.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+from app.data.executor import run_ledger
+
+def select_versions(conn, user_id, resources):
+    placeholders = ", ".join("?" * len(resources))
+    rows = conn.execute(
+        f"SELECT resource, version FROM data_versions WHERE user_id = ? AND resource IN ({placeholders})",
+        (user_id, *resources),
+    ).fetchall()
+    versions = dict(rows)
+    return tuple(versions.get(resource, 0) for resource in resources)
+
+def make_etag(request: Request, versions):
+    digest = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:16]
+    return f'"{"-".join(map(str, versions))}-{digest}"'
+
+async def resource_versions(user_id: str, resources):
+    return await run_ledger(user_id, select_versions, user_id, tuple(resources))
+
+async def resource_etag(request: Request, user_id: str, resources) -> str:
+    """Call before reading the data: a write in between then only costs the client
+    one extra full response, never a stale 304."""
+    return make_etag(request, await resource_versions(user_id, resources))
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response when ``If-None-Match`` matches ``etag``, otherwise None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches.
+    if "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
@@ -0,0 +1,126 @@
+import csv
+import io
+import zlib
+from datetime import date
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.api import columnar
+from app.api.fastjson import dumps_lines
+from app.api.category_api import category_listing
+from app.api.goal_api import goal_listing
+from app.api.recurring_transaction_api import recurring_transaction_listing
+from app.api.transaction_api import transaction_listing
+from app.auth.auth import get_current_active_user
+from app.config import settings
+from app.data.executor import run_ledger
+from app.models.models import UserInDB
+
+router = APIRouter()
+
+ExportResource = Literal["transactions", "goals", "categories", "recurring-transactions"]
+ExportFormat = Literal["csv", "ndjson", "columnar"]
+
+# resource -> (listing, column used for start_date/end_date)
+_EXPORTS = {
+    "transactions": (transaction_listing, "date"),
+    "goals": (goal_listing, "target_date"),
+    "categories": (category_listing, None),
+    "recurring-transactions": (recurring_transaction_listing, "next_due_date"),
+}
+
+_COLUMN_TYPES = {
+    "date": "date",
+    "target_date": "date",
+    "start_date": "date",
+    "next_due_date": "date",
+    "amount": "f8",
+    "target_amount": "f8",
+    "current_amount": "f8",
+}
+
+_MEDIA_TYPES = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "columnar": ("application/octet-stream", "pfmcol"),
+}
+
+def _csv_chunk(rows, columns, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([row[c] for c in columns] for row in rows)
+    return buffer.getvalue().encode()
+
+async def _export_stream(listing, user_id, filters, params, format):
+    columns = listing.columns
+    column_types = [(c, _COLUMN_TYPES.get(c, "str")) for c in columns]
+    after = None
+    first = True
+    if format == "columnar":
+        yield columnar.MAGIC
+    while True:
+        # One short read per batch: no pooled connection or read snapshot outlives the batch.
+        rows, after = await run_ledger(
+            user_id, listing.fetch_page, user_id, filters, params, after, settings.STREAM_BATCH_SIZE, columns
+        )
+        if format == "csv":
+            yield _csv_chunk(rows, columns, header=first)
+        elif rows and format == "ndjson":
+            yield dumps_lines(rows)
+        elif rows:
+            yield columnar.encode_block(rows, column_types)
+        first = False
+        if after is None:
+            break
+    if format == "columnar":
+        yield columnar.END
+
+async def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@router.get("/export/{resource}")
+async def export_resource(
+    resource: ExportResource,
+    current_user: UserInDB = Depends(get_current_active_user),
+    format: ExportFormat = "ndjson",
+    gzip: bool = False,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    listing, date_column = _EXPORTS[resource]
+    filters = []
+    params = []
+    if start_date or end_date:
+        if date_column is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{resource} cannot be filtered by date",
+            )
+        if start_date:
+            filters.append(f"{date_column} >= ?")
+            params.append(start_date.isoformat())
+        if end_date:
+            filters.append(f"{date_column} <= ?")
+            params.append(end_date.isoformat())
+
+    media_type, extension = _MEDIA_TYPES[format]
+    filename = f"{resource}.{extension}"
+    body = _export_stream(listing, current_user.id, filters, params, format)
+    if gzip:
+        body = _gzip(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
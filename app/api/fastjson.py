@@ -0,0 +1,28 @@
+"""JSON encoding for responses built from trusted database rows.
+
+Rows read by our own queries already have the shape of the response models,
+so list endpoints encode them directly instead of building a pydantic model
+per row and letting FastAPI validate it again through ``response_model``.
+``orjson`` is used when it is installed; the standard library is the fallback.
+"""
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError: # optional speedup
+    orjson = None
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def dumps_lines(rows) -> bytes:
+    """NDJSON: one encoded row per line."""
+    return b"".join(dumps(row) + b"\n" for row in rows)
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,60 +1,87 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Optional
 import uuid
 
-from app.models.models import GoalCreate, GoalInDB, UserInDB
+from app.models.models import GoalCreate, GoalInDB, UserInDB, quantize_money, to_minor_units
+from app.api.listing import KeysetListing, ListFormat
 from app.auth.auth import get_current_active_user
-from app.data.database import get_db_connection
+from app.config import settings
+from app.data.write_queue import run_write
 
 router = APIRouter()
 
+goal_listing = KeysetListing(
+    "goals",
+    ("id", "user_id", "name", "target_amount", "current_amount", "target_date"),
+    ("target_date", "id"),
+    money_columns=("target_amount", "current_amount"),
+)
+
+def _insert_goal(conn, goal_id, user_id, goal: GoalCreate):
+    conn.execute(
+        "INSERT INTO goals (id, user_id, name, target_amount, current_amount, target_date) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            goal_id,
+            user_id,
+            goal.name,
+            to_minor_units(goal.target_amount),
+            to_minor_units(goal.current_amount),
+            goal.target_date.isoformat(),
+        ),
+    )
+
+def _update_goal(conn, goal_id, user_id, goal: GoalCreate):
+    cursor = conn.execute(
+        "UPDATE goals SET name = ?, target_amount = ?, current_amount = ?, target_date = ? WHERE id = ? AND user_id = ?",
+        (
+            goal.name,
+            to_minor_units(goal.target_amount),
+            to_minor_units(goal.current_amount),
+            goal.target_date.isoformat(),
+            goal_id,
+            user_id,
+        ),
+    )
+    return cursor.rowcount
+
+def _delete_goal(conn, goal_id, user_id):
+    cursor = conn.execute(
+        "DELETE FROM goals WHERE id = ? AND user_id = ?",
+        (goal_id, user_id),
+    )
+    return cursor.rowcount
+
 @router.post("/goals/", response_model=GoalInDB)
 async def create_goal(
     goal: GoalCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     goal_id = str(uuid.uuid4())
     try:
-        cursor.execute(
-            "INSERT INTO goals (id, user_id, name, target_amount, current_amount, target_date) VALUES (?, ?, ?, ?, ?, ?)",
-            (
-                goal_id,
-                current_user.id,
-                goal.name,
-                goal.target_amount,
-                goal.current_amount,
-                goal.target_date.isoformat(),
-            ),
-        )
-        conn.commit()
+        await run_write(current_user.id, _insert_goal, goal_id, current_user.id, goal)
         return GoalInDB(
             id=goal_id,
             user_id=current_user.id,
             name=goal.name,
-            target_amount=goal.target_amount,
-            current_amount=goal.current_amount,
+            target_amount=quantize_money(goal.target_amount),
+            current_amount=quantize_money(goal.current_amount),
             target_date=goal.target_date,
         )
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    finally:
-        conn.close()
 
 @router.get("/goals/", response_model=List[GoalInDB])
 async def read_goals(
-    current_user: UserInDB = Depends(get_current_active_user)
+    request: Request,
+    current_user: UserInDB = Depends(get_current_active_user),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: ListFormat = "json",
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, user_id, name, target_amount, current_amount, target_date FROM goals WHERE user_id = ?",
-        (current_user.id,),
+    return await goal_listing.respond(
+        request, current_user.id, limit=limit, cursor=cursor, fields=fields, format=format
     )
-    goals_data = cursor.fetchall()
-    conn.close()
-    return [GoalInDB(**g) for g in goals_data]
 
 @router.put("/goals/{goal_id}", response_model=GoalInDB)
 async def update_goal(
@@ -62,30 +89,14 @@ async def update_goal(
     goal: GoalCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE goals SET name = ?, target_amount = ?, current_amount = ?, target_date = ? WHERE id = ? AND user_id = ?",
-        (
-            goal.name,
-            goal.target_amount,
-            goal.current_amount,
-            goal.target_date.isoformat(),
-            goal_id,
-            current_user.id,
-        ),
-    )
-    conn.commit()
-    if cursor.rowcount == 0:
-        conn.close()
+    if await run_write(current_user.id, _update_goal, goal_id, current_user.id, goal) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
-    conn.close()
     return GoalInDB(
         id=goal_id,
         user_id=current_user.id,
         name=goal.name,
-        target_amount=goal.target_amount,
-        current_amount=goal.current_amount,
+        target_amount=quantize_money(goal.target_amount),
+        current_amount=quantize_money(goal.current_amount),
         target_date=goal.target_date,
     )
 
@@ -94,15 +105,6 @@ async def delete_goal(
     goal_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "DELETE FROM goals WHERE id = ? AND user_id = ?",
-        (goal_id, current_user.id),
-    )
-    conn.commit()
-    if cursor.rowcount == 0:
-        conn.close()
+    if await run_write(current_user.id, _delete_goal, goal_id, current_user.id) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
-    conn.close()
-    return
\ No newline at end of file
+    return
@@ -0,0 +1,143 @@
+import base64
+import json
+from typing import Literal, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.api.conditional import not_modified, resource_etag
+from app.api.fastjson import FastJSONResponse, dumps_lines
+from app.config import settings
+from app.data.executor import run_ledger
+from app.models.models import from_minor_units
+
+ListFormat = Literal["json", "ndjson"]
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).rstrip(b"=").decode()
+
+def decode_cursor(cursor: Optional[str], size: int):
+    """The ``size`` key values encoded in ``cursor``; None when there is no cursor."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode() + b"=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+class KeysetListing:
+    """A per-user list over ``table`` ordered by ``key_columns`` and paged with keyset cursors.
+
+    The last key column must be unique per user so that every row has a distinct position.
+    ``expressions`` maps output columns to the SQL that computes them, and
+    ``resources`` names every table whose version the ETag depends on.
+    """
+
+    def __init__(self, table, columns, key_columns, money_columns=(), expressions=None, resources=None):
+        self.table = table
+        self.columns = tuple(columns)
+        self.key_columns = tuple(key_columns)
+        self.money_columns = frozenset(money_columns)
+        self.expressions = dict(expressions or {})
+        self.resources = tuple(resources or (table,))
+
+    def parse_fields(self, fields: Optional[str]):
+        if not fields:
+            return self.columns
+        selected = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected if f not in self.columns]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.columns)}",
+            )
+        return selected
+
+    def decode_cursor(self, cursor: Optional[str]):
+        return decode_cursor(cursor, len(self.key_columns))
+
+    def fetch_page(self, conn, user_id, filters, params, after, limit, fields):
+        """Return ``(rows, next_after)``; ``next_after`` is None on the last page."""
+        selected = tuple(dict.fromkeys(fields + self.key_columns))
+        columns = ", ".join(f"{self.expressions[c]} AS {c}" if c in self.expressions else c for c in selected)
+        query = f"SELECT {columns} FROM {self.table} WHERE user_id = ?"
+        args = [user_id]
+        for condition in filters:
+            query += f" AND {condition}"
+        args.extend(params)
+        if after is not None:
+            keys = ", ".join(self.key_columns)
+            query += f" AND ({keys}) > ({', '.join('?' * len(self.key_columns))})"
+            args.extend(after)
+        query += f" ORDER BY {', '.join(self.key_columns)}"
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+
+        # Plain tuples: the column order is known, so skip sqlite3.Row lookups by name.
+        db_cursor = conn.cursor()
+        db_cursor.row_factory = None
+        rows = db_cursor.execute(query, args).fetchall()
+        next_after = None
+        if limit is not None and len(rows) == limit:
+            next_after = [rows[-1][selected.index(k)] for k in self.key_columns]
+        # ``selected`` starts with ``fields``, so zip() drops trailing key-only columns.
+        money = [i for i, f in enumerate(fields) if f in self.money_columns]
+        if not money:
+            return [dict(zip(fields, row)) for row in rows], next_after
+        page = []
+        for row in rows:
+            values = list(row)
+            for i in money:
+                values[i] = from_minor_units(values[i])
+            page.append(dict(zip(fields, values)))
+        return page, next_after
+
+    async def respond(
+        self,
+        request: Request,
+        user_id: str,
+        filters=(),
+        params=(),
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+        format: ListFormat = "json",
+    ):
+        selected = self.parse_fields(fields)
+        after = self.decode_cursor(cursor)
+        etag = await resource_etag(request, user_id, self.resources)
+        unchanged = not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+
+        if format == "ndjson":
+            return StreamingResponse(
+                self._stream(user_id, filters, params, after, limit, selected),
+                media_type="application/x-ndjson",
+                headers={"ETag": etag},
+            )
+
+        rows, next_after = await run_ledger(user_id, self.fetch_page, user_id, filters, params, after, limit, selected)
+        headers = {"ETag": etag}
+        if next_after is not None:
+            headers["X-Next-Cursor"] = encode_cursor(next_after)
+        # Returning a Response skips response_model validation; the route's
+        # response_model still documents the full row shape in the OpenAPI schema.
+        return FastJSONResponse(rows, headers=headers)
+
+    async def _stream(self, user_id, filters, params, after, limit, fields):
+        # Each batch is its own short query, so no connection or read snapshot is held between batches.
+        remaining = limit
+        while remaining is None or remaining > 0:
+            batch = settings.STREAM_BATCH_SIZE if remaining is None else min(settings.STREAM_BATCH_SIZE, remaining)
+            rows, after = await run_ledger(user_id, self.fetch_page, user_id, filters, params, after, batch, fields)
+            if rows:
+                yield dumps_lines(rows)
+            if after is None:
+                return
+            if remaining is not None:
+                remaining -= len(rows)
@@ -1,44 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Optional
 import uuid
 from datetime import date
 
-from app.models.models import RecurringTransactionCreate, RecurringTransactionInDB, UserInDB
+from app.models.models import RecurringTransactionCreate, RecurringTransactionInDB, UserInDB, quantize_money, to_minor_units
+from app.api.listing import KeysetListing, ListFormat
 from app.auth.auth import get_current_active_user
-from app.data.database import get_db_connection
+from app.config import settings
+from app.data.categories import category_name_sql, intern_category
+from app.data.write_queue import run_write
 
 router = APIRouter()
 
+recurring_transaction_listing = KeysetListing(
+    "recurring_transactions",
+    ("id", "user_id", "name", "amount", "type", "category", "description", "frequency", "start_date", "next_due_date"),
+    ("next_due_date", "id"),
+    money_columns=("amount",),
+    expressions={"category": category_name_sql()},
+    resources=("recurring_transactions", "categories"),
+)
+
+def _insert_recurring_transaction(conn, recurring_transaction_id, user_id, recurring_transaction: RecurringTransactionCreate):
+    conn.execute(
+        "INSERT INTO recurring_transactions (id, user_id, name, amount, type, category_key, description, frequency, start_date, next_due_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            recurring_transaction_id,
+            user_id,
+            recurring_transaction.name,
+            to_minor_units(recurring_transaction.amount),
+            recurring_transaction.type,
+            intern_category(conn, user_id, recurring_transaction.category, recurring_transaction.type),
+            recurring_transaction.description,
+            recurring_transaction.frequency,
+            recurring_transaction.start_date.isoformat(),
+            recurring_transaction.next_due_date.isoformat(),
+        ),
+    )
+
+def _update_recurring_transaction(conn, recurring_transaction_id, user_id, recurring_transaction: RecurringTransactionCreate):
+    # Checked first so that a missing row never interns its category.
+    if conn.execute(
+        "SELECT 1 FROM recurring_transactions WHERE id = ? AND user_id = ?", (recurring_transaction_id, user_id)
+    ).fetchone() is None:
+        return 0
+    cursor = conn.execute(
+        "UPDATE recurring_transactions SET name = ?, amount = ?, type = ?, category_key = ?, description = ?, frequency = ?, start_date = ?, next_due_date = ? WHERE id = ? AND user_id = ?",
+        (
+            recurring_transaction.name,
+            to_minor_units(recurring_transaction.amount),
+            recurring_transaction.type,
+            intern_category(conn, user_id, recurring_transaction.category, recurring_transaction.type),
+            recurring_transaction.description,
+            recurring_transaction.frequency,
+            recurring_transaction.start_date.isoformat(),
+            recurring_transaction.next_due_date.isoformat(),
+            recurring_transaction_id,
+            user_id,
+        ),
+    )
+    return cursor.rowcount
+
+def _delete_recurring_transaction(conn, recurring_transaction_id, user_id):
+    cursor = conn.execute(
+        "DELETE FROM recurring_transactions WHERE id = ? AND user_id = ?",
+        (recurring_transaction_id, user_id),
+    )
+    return cursor.rowcount
+
 @router.post("/recurring-transactions/", response_model=RecurringTransactionInDB)
 async def create_recurring_transaction(
     recurring_transaction: RecurringTransactionCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     recurring_transaction_id = str(uuid.uuid4())
     try:
-        cursor.execute(
-            "INSERT INTO recurring_transactions (id, user_id, name, amount, type, category, description, frequency, start_date, next_due_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                recurring_transaction_id,
-                current_user.id,
-                recurring_transaction.name,
-                recurring_transaction.amount,
-                recurring_transaction.type,
-                recurring_transaction.category,
-                recurring_transaction.description,
-                recurring_transaction.frequency,
-                recurring_transaction.start_date.isoformat(),
-                recurring_transaction.next_due_date.isoformat(),
-            ),
-        )
-        conn.commit()
+        await run_write(current_user.id, _insert_recurring_transaction, recurring_transaction_id, current_user.id, recurring_transaction)
         return RecurringTransactionInDB(
             id=recurring_transaction_id,
             user_id=current_user.id,
             name=recurring_transaction.name,
-            amount=recurring_transaction.amount,
+            amount=quantize_money(recurring_transaction.amount),
             type=recurring_transaction.type,
             category=recurring_transaction.category,
             description=recurring_transaction.description,
@@ -48,22 +90,19 @@ async def create_recurring_transaction(
         )
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    finally:
-        conn.close()
 
 @router.get("/recurring-transactions/", response_model=List[RecurringTransactionInDB])
 async def read_recurring_transactions(
-    current_user: UserInDB = Depends(get_current_active_user)
+    request: Request,
+    current_user: UserInDB = Depends(get_current_active_user),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: ListFormat = "json",
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, user_id, name, amount, type, category, description, frequency, start_date, next_due_date FROM recurring_transactions WHERE user_id = ?",
-        (current_user.id,),
+    return await recurring_transaction_listing.respond(
+        request, current_user.id, limit=limit, cursor=cursor, fields=fields, format=format
     )
-    recurring_transactions_data = cursor.fetchall()
-    conn.close()
-    return [RecurringTransactionInDB(**rt) for rt in recurring_transactions_data]
 
 @router.put("/recurring-transactions/{recurring_transaction_id}", response_model=RecurringTransactionInDB)
 async def update_recurring_transaction(
@@ -71,33 +110,13 @@ async def update_recurring_transaction(
     recurring_transaction: RecurringTransactionCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE recurring_transactions SET name = ?, amount = ?, type = ?, category = ?, description = ?, frequency = ?, start_date = ?, next_due_date = ? WHERE id = ? AND user_id = ?",
-        (
-            recurring_transaction.name,
-            recurring_transaction.amount,
-            recurring_transaction.type,
-            recurring_transaction.category,
-            recurring_transaction.description,
-            recurring_transaction.frequency,
-            recurring_transaction.start_date.isoformat(),
-            recurring_transaction.next_due_date.isoformat(),
-            recurring_transaction_id,
-            current_user.id,
-        ),
-    )
-    conn.commit()
-    if cursor.rowcount == 0:
-        conn.close()
+    if await run_write(current_user.id, _update_recurring_transaction, recurring_transaction_id, current_user.id, recurring_transaction) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recurring transaction not found")
-    conn.close()
     return RecurringTransactionInDB(
         id=recurring_transaction_id,
         user_id=current_user.id,
         name=recurring_transaction.name,
-        amount=recurring_transaction.amount,
+        amount=quantize_money(recurring_transaction.amount),
         type=recurring_transaction.type,
         category=recurring_transaction.category,
         description=recurring_transaction.description,
@@ -111,15 +130,6 @@ async def delete_recurring_transaction(
     recurring_transaction_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "DELETE FROM recurring_transactions WHERE id = ? AND user_id = ?",
-        (recurring_transaction_id, current_user.id),
-    )
-    conn.commit()
-    if cursor.rowcount == 0:
-        conn.close()
+    if await run_write(current_user.id, _delete_recurring_transaction, recurring_transaction_id, current_user.id) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recurring transaction not found")
-    conn.close()
-    return
\ No newline at end of file
+    return
@@ -1,55 +1,289 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from datetime import date
-from collections import defaultdict
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+import asyncio
+from datetime import date, timedelta
+from typing import List, Literal, Optional
 
-from app.models.models import ReportSummary, UserInDB
+from app.api.conditional import make_etag, not_modified, resource_etag, resource_versions
+from app.api.fastjson import FastJSONResponse
+from app.api.listing import decode_cursor, encode_cursor
+from app.models.models import Balance, ReportSummary, RunningBalanceEntry, TimeSeriesReport, UserInDB, from_minor_units
 from app.auth.auth import get_current_active_user
-from app.data.database import get_db_connection
+from app.config import settings
+from app.data.balances import balance_as_of, running_balance_page
+from app.data.categories import category_names
+from app.data.executor import get_executor, run_ledger
+from app.data.ledger_cache import ledger_cache, load_columns, load_names, numpy
 
 router = APIRouter()
 
+def _month_floor(d: date):
+    return d.replace(day=1)
+
+def _month_ceil(d: date):
+    if d.day == 1:
+        return d
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _summary_query(table, amount_column, date_column, lower, upper, upper_inclusive):
+    query = f"SELECT type, category_key, SUM({amount_column}) AS total FROM {table} WHERE user_id = ? AND type IN ('income', 'expense')"
+    params = []
+    if lower is not None:
+        query += f" AND {date_column} >= ?"
+        params.append(lower)
+    if upper is not None:
+        query += f" AND {date_column} {'<=' if upper_inclusive else '<'} ?"
+        params.append(upper)
+    return query + " GROUP BY type, category_key", params
+
+def _summarize(conn, user_id, start_date, end_date):
+    # Whole months inside [start_date, end_date] come from monthly_rollups;
+    # only the partial months at either edge are aggregated from raw rows.
+    first_month = _month_ceil(start_date) if start_date else None
+    end_month = _month_floor(end_date + timedelta(days=1)) if end_date else None
+
+    parts = []
+    if first_month and end_month and first_month >= end_month:
+        parts.append(_summary_query("transactions", "amount", "date", start_date.isoformat(), end_date.isoformat(), True))
+    else:
+        parts.append(_summary_query(
+            "monthly_rollups", "total", "month",
+            first_month.strftime("%Y-%m") if first_month else None,
+            end_month.strftime("%Y-%m") if end_month else None,
+            False,
+        ))
+        if start_date and start_date < first_month:
+            parts.append(_summary_query("transactions", "amount", "date", start_date.isoformat(), first_month.isoformat(), False))
+        if end_date and end_month <= end_date:
+            parts.append(_summary_query("transactions", "amount", "date", end_month.isoformat(), end_date.isoformat(), True))
+
+    spending_by_category = {}
+    income_by_category = {}
+    for query, params in parts:
+        for t in conn.execute(query, [user_id, *params]):
+            totals = income_by_category if t['type'] == 'income' else spending_by_category
+            totals[t['category_key']] = totals.get(t['category_key'], 0) + t['total']
+    return _report_summary(income_by_category, spending_by_category, category_names(conn, user_id))
+
+def _report_summary(income_by_category, spending_by_category, names):
+    # Integer minor units sum exactly; convert once at the end.
+    total_income = sum(income_by_category.values())
+    total_expenses = sum(spending_by_category.values())
+    net_balance = total_income - total_expenses
+    return ReportSummary(
+        total_income=from_minor_units(total_income),
+        total_expenses=from_minor_units(total_expenses),
+        net_balance=from_minor_units(net_balance),
+        spending_by_category={names[c]: from_minor_units(v) for c, v in spending_by_category.items()},
+        income_by_category={names[c]: from_minor_units(v) for c, v in income_by_category.items()},
+    )
+
 @router.get("/reports/summary", response_model=ReportSummary)
 async def get_financial_summary(
+    request: Request,
+    response: Response,
     current_user: UserInDB = Depends(get_current_active_user),
     start_date: date = None,
     end_date: date = None,
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT amount, type, category FROM transactions WHERE user_id = ?"
-    params = [current_user.id]
-
-    if start_date:
-        query += " AND date >= ?"
-        params.append(start_date.isoformat())
-    if end_date:
-        query += " AND date <= ?"
-        params.append(end_date.isoformat())
-
-    cursor.execute(query, params)
-    transactions = cursor.fetchall()
-    conn.close()
-
-    total_income = 0.0
-    total_expenses = 0.0
-    spending_by_category = defaultdict(float)
-    income_by_category = defaultdict(float)
-
-    for t in transactions:
-        if t['type'] == 'income':
-            total_income += t['amount']
-            income_by_category[t['category']] += t['amount']
-        elif t['type'] == 'expense':
-            total_expenses += t['amount']
-            spending_by_category[t['category']] += t['amount']
+    versions = await resource_versions(current_user.id, ("transactions", "categories"))
+    etag = make_etag(request, versions)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers["ETag"] = etag
+    if settings.LEDGER_CACHE_ENABLED:
+        return await _cached_summary(current_user.id, versions, start_date, end_date)
+    return await run_ledger(current_user.id, _summarize, current_user.id, start_date, end_date)
 
-    net_balance = total_income - total_expenses
+async def _cached_summary(user_id, versions, start_date, end_date):
+    # versions are the (transactions, categories) versions the ETag was made from.
+    entry = ledger_cache.get(user_id, versions[0])
+    if entry is None:
+        entry = await run_ledger(user_id, load_columns, user_id)
+        ledger_cache.put(user_id, entry)
+    elif entry.names[0] != versions[1]:
+        entry.names = await run_ledger(user_id, load_names, user_id)
+    names = entry.names[1]
+    if numpy is not None:
+        income, spending = entry.totals(start_date, end_date)
+    else:
+        income, spending = await asyncio.get_running_loop().run_in_executor(get_executor(), entry.totals, start_date, end_date)
+    return _report_summary(income, spending, names)
 
-    return ReportSummary(
-        total_income=total_income,
-        total_expenses=total_expenses,
-        net_balance=net_balance,
-        spending_by_category=spending_by_category,
-        income_by_category=income_by_category,
-    )
\ No newline at end of file
+Interval = Literal["day", "week", "month"]
+
+def _bucket_start(d: date, interval: Interval):
+    if interval == "week":
+        return d - timedelta(days=d.weekday())
+    if interval == "month":
+        return d.replace(day=1)
+    return d
+
+def _next_bucket(d: date, interval: Interval):
+    if interval == "day":
+        return d + timedelta(days=1)
+    if interval == "week":
+        return d + timedelta(weeks=1)
+    return _month_ceil(d + timedelta(days=1))
+
+_DAILY_TOTALS_SQL = (
+    "SELECT date, type, category_key, SUM(amount) AS total FROM transactions "
+    "WHERE user_id = ? AND date >= ? AND date < ? AND type IN ('income', 'expense') "
+    "GROUP BY date, type, category_key"
+)
+
+def _timeseries(conn, user_id, interval: Interval, start_date, end_date):
+    if start_date is None or end_date is None:
+        bounds = conn.execute(
+            "SELECT MIN(date), MAX(date) FROM transactions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if bounds[0] is None:
+            return TimeSeriesReport(
+                interval=interval, periods=[], income=[], expenses=[], net=[],
+                income_by_category={}, spending_by_category={},
+            )
+        start_date = start_date or date.fromisoformat(bounds[0])
+        end_date = end_date or date.fromisoformat(bounds[1])
+
+    periods = []
+    current = _bucket_start(start_date, interval)
+    while current <= end_date:
+        periods.append(current)
+        if len(periods) > settings.TIMESERIES_MAX_PERIODS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Range spans more than {settings.TIMESERIES_MAX_PERIODS} {interval} buckets",
+            )
+        current = _next_bucket(current, interval)
+
+    # Rows are grouped by day in index order (no sort), then mapped onto buckets here.
+    # Whole months come pre-aggregated from monthly_rollups, keyed by "YYYY-MM".
+    bucket_of = {}
+    day = start_date
+    i = 0
+    while day <= end_date:
+        while i + 1 < len(periods) and periods[i + 1] <= day:
+            i += 1
+        bucket_of[day.isoformat()] = i
+        day += timedelta(days=1)
+
+    after_end = (end_date + timedelta(days=1)).isoformat()
+    queries = []
+    if interval == "month":
+        first_month = _month_ceil(start_date)
+        end_month = _month_floor(end_date + timedelta(days=1))
+        if first_month < end_month:
+            for i, period in enumerate(periods):
+                bucket_of[period.strftime("%Y-%m")] = i
+            queries.append((
+                "SELECT month, type, category_key, total FROM monthly_rollups "
+                "WHERE user_id = ? AND month >= ? AND month < ? AND type IN ('income', 'expense')",
+                (user_id, first_month.strftime("%Y-%m"), end_month.strftime("%Y-%m")),
+            ))
+            if start_date < first_month:
+                queries.append((_DAILY_TOTALS_SQL, (user_id, start_date.isoformat(), first_month.isoformat())))
+            if end_month <= end_date:
+                queries.append((_DAILY_TOTALS_SQL, (user_id, end_month.isoformat(), after_end)))
+    if not queries:
+        queries.append((_DAILY_TOTALS_SQL, (user_id, start_date.isoformat(), after_end)))
+
+    income = [0] * len(periods)
+    expenses = [0] * len(periods)
+    income_by_category = {}
+    spending_by_category = {}
+    for query, params in queries:
+        for key, type_, category_key, total in conn.execute(query, params):
+            i = bucket_of[key]
+            if type_ == "income":
+                income[i] += total
+                series = income_by_category.get(category_key)
+                if series is None:
+                    series = income_by_category[category_key] = [0] * len(periods)
+            else:
+                expenses[i] += total
+                series = spending_by_category.get(category_key)
+                if series is None:
+                    series = spending_by_category[category_key] = [0] * len(periods)
+            series[i] += total
+
+    def decimals(series):
+        return [from_minor_units(v) for v in series]
+
+    names = category_names(conn, user_id)
+    return TimeSeriesReport(
+        interval=interval,
+        periods=periods,
+        income=decimals(income),
+        expenses=decimals(expenses),
+        net=decimals(i - e for i, e in zip(income, expenses)),
+        income_by_category={names[c]: decimals(s) for c, s in income_by_category.items()},
+        spending_by_category={names[c]: decimals(s) for c, s in spending_by_category.items()},
+    )
+
+@router.get("/reports/timeseries", response_model=TimeSeriesReport)
+async def get_timeseries(
+    request: Request,
+    response: Response,
+    current_user: UserInDB = Depends(get_current_active_user),
+    interval: Interval = "month",
+    start_date: date = None,
+    end_date: date = None,
+):
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_date must not be after end_date")
+    etag = await resource_etag(request, current_user.id, ("transactions", "categories"))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers["ETag"] = etag
+    return await run_ledger(current_user.id, _timeseries, current_user.id, interval, start_date, end_date)
+
+@router.get("/reports/balance", response_model=Balance)
+async def get_balance(
+    request: Request,
+    response: Response,
+    current_user: UserInDB = Depends(get_current_active_user),
+    as_of: Optional[date] = None,
+):
+    """Income minus expenses over every transaction dated on or before ``as_of``."""
+    etag = await resource_etag(request, current_user.id, ("transactions",))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers["ETag"] = etag
+    balance = await run_ledger(current_user.id, balance_as_of, current_user.id, as_of)
+    return Balance(as_of=as_of, balance=from_minor_units(balance))
+
+@router.get("/reports/running-balance", response_model=List[RunningBalanceEntry])
+async def get_running_balance(
+    request: Request,
+    current_user: UserInDB = Depends(get_current_active_user),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Transactions oldest first, each with the balance after it.
+
+    Pages with the ``X-Next-Cursor`` response header, like the list endpoints.
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_date must not be after end_date")
+    after = decode_cursor(cursor, 2)
+    if after is not None:
+        try:
+            date.fromisoformat(after[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    etag = await resource_etag(request, current_user.id, ("transactions", "categories"))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    rows, next_after = await run_ledger(
+        current_user.id, running_balance_page, current_user.id, start_date, end_date, after, limit
+    )
+    headers = {"ETag": etag}
+    if next_after is not None:
+        headers["X-Next-Cursor"] = encode_cursor(next_after)
+    return FastJSONResponse(rows, headers=headers)
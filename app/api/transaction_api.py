@@ -1,90 +1,185 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from typing import List
 import uuid
 from datetime import date
 from typing import Optional
 
-from app.models.models import TransactionCreate, TransactionInDB, UserInDB
+from app.models.models import ImportResult, TransactionCreate, TransactionInDB, UserInDB, from_minor_units, quantize_money, to_minor_units
+from app.api.conditional import not_modified, resource_etag
+from app.api.fastjson import FastJSONResponse
+from app.api.listing import KeysetListing, ListFormat, decode_cursor, encode_cursor
+from app.api.transaction_import import ImportFormat, import_transactions
+from app.api.transaction_search import SearchOrder, search_page, search_terms
 from app.auth.auth import get_current_active_user
-from app.data.database import get_db_connection
+from app.config import settings
+from app.data.categories import category_name_sql, intern_category
+from app.data.executor import run_ledger
+from app.data.ledger_cache import ledger_cache, track_change
+from app.data.write_queue import run_write
 
 router = APIRouter()
 
+transaction_listing = KeysetListing(
+    "transactions",
+    ("id", "user_id", "date", "amount", "type", "category", "description"),
+    ("date", "id"),
+    money_columns=("amount",),
+    expressions={"category": category_name_sql()},
+    resources=("transactions", "categories"),
+)
+
+def _insert_transaction(conn, transaction_id, user_id, transaction: TransactionCreate):
+    conn.execute(
+        "INSERT INTO transactions (id, user_id, date, amount, type, category_key, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            transaction_id,
+            user_id,
+            transaction.date.isoformat(),
+            to_minor_units(transaction.amount),
+            transaction.type,
+            intern_category(conn, user_id, transaction.category, transaction.type),
+            transaction.description,
+        ),
+    )
+
+def _select_transaction(conn, transaction_id, user_id):
+    row = conn.execute(
+        f"SELECT id, user_id, date, amount, type, {category_name_sql()} AS category, description "
+        "FROM transactions WHERE id = ? AND user_id = ?",
+        (transaction_id, user_id),
+    ).fetchone()
+    if row is None:
+        return None
+    return TransactionInDB(**{**row, "amount": from_minor_units(row["amount"])})
+
+def _update_transaction(conn, transaction_id, user_id, transaction: TransactionCreate):
+    # Checked first so that a missing row never interns its category.
+    if conn.execute("SELECT 1 FROM transactions WHERE id = ? AND user_id = ?", (transaction_id, user_id)).fetchone() is None:
+        return 0
+    cursor = conn.execute(
+        "UPDATE transactions SET date = ?, amount = ?, type = ?, category_key = ?, description = ? WHERE id = ? AND user_id = ?",
+        (
+            transaction.date.isoformat(),
+            to_minor_units(transaction.amount),
+            transaction.type,
+            intern_category(conn, user_id, transaction.category, transaction.type),
+            transaction.description,
+            transaction_id,
+            user_id,
+        ),
+    )
+    return cursor.rowcount
+
+def _delete_transaction(conn, transaction_id, user_id):
+    cursor = conn.execute(
+        "DELETE FROM transactions WHERE id = ? AND user_id = ?",
+        (transaction_id, user_id),
+    )
+    return cursor.rowcount
+
 @router.post("/transactions/", response_model=TransactionInDB)
 async def create_transaction(
     transaction: TransactionCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     transaction_id = str(uuid.uuid4())
     try:
-        cursor.execute(
-            "INSERT INTO transactions (id, user_id, date, amount, type, category, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (
-                transaction_id,
-                current_user.id,
-                transaction.date.isoformat(),
-                transaction.amount,
-                transaction.type,
-                transaction.category,
-                transaction.description,
-            ),
-        )
-        conn.commit()
+        _, change = await run_write(current_user.id, track_change, _insert_transaction, transaction_id, current_user.id, transaction)
+        ledger_cache.apply(current_user.id, change)
         return TransactionInDB(
             id=transaction_id,
             user_id=current_user.id,
             date=transaction.date,
-            amount=transaction.amount,
+            amount=quantize_money(transaction.amount),
             type=transaction.type,
             category=transaction.category,
             description=transaction.description,
         )
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    finally:
-        conn.close()
+
+@router.post("/transactions/import", response_model=ImportResult)
+async def import_transactions_bulk(
+    request: Request,
+    current_user: UserInDB = Depends(get_current_active_user),
+    format: Optional[ImportFormat] = None,
+    dedupe: bool = True,
+):
+    """Stream a CSV (with a header row) or NDJSON body of transactions into the ledger.
+
+    Rows are validated like ``POST /transactions/`` and inserted in chunks of
+    ``IMPORT_BATCH_SIZE``, one transaction per chunk. With ``dedupe`` a row whose
+    content matches an earlier imported row is skipped; identical rows within one
+    file are all kept.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    return await import_transactions(request.stream(), current_user.id, format, dedupe)
 
 @router.get("/transactions/", response_model=List[TransactionInDB])
 async def read_transactions(
+    request: Request,
     current_user: UserInDB = Depends(get_current_active_user),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: ListFormat = "json",
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    query = "SELECT id, user_id, date, amount, type, category, description FROM transactions WHERE user_id = ?"
-    params = [current_user.id]
+    filters = []
+    params = []
 
     if start_date:
-        query += " AND date >= ?"
+        filters.append("date >= ?")
         params.append(start_date.isoformat())
     if end_date:
-        query += " AND date <= ?"
+        filters.append("date <= ?")
         params.append(end_date.isoformat())
 
-    cursor.execute(query, params)
-    transactions_data = cursor.fetchall()
-    conn.close()
-    return [TransactionInDB(**t) for t in transactions_data]
+    return await transaction_listing.respond(
+        request, current_user.id, filters, params,
+        limit=limit, cursor=cursor, fields=fields, format=format,
+    )
+
+@router.get("/transactions/search", response_model=List[TransactionInDB])
+async def search_transactions(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Words to find in the description or category; all must match, as prefixes"),
+    current_user: UserInDB = Depends(get_current_active_user),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    order: SearchOrder = "rank",
+    limit: int = Query(50, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Full-text search, best match first (or newest first with ``order=date``).
+
+    Pages with the ``X-Next-Cursor`` response header, like the list endpoint.
+    """
+    if not search_terms(q):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search text has no words")
+    after = decode_cursor(cursor, 2)
+    etag = await resource_etag(request, current_user.id, ("transactions", "categories"))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    rows, next_after = await run_ledger(current_user.id, search_page, current_user.id, q, start_date, end_date, after, limit, order)
+    headers = {"ETag": etag}
+    if next_after is not None:
+        headers["X-Next-Cursor"] = encode_cursor(next_after)
+    return FastJSONResponse(rows, headers=headers)
 
 @router.get("/transactions/{transaction_id}", response_model=TransactionInDB)
 async def read_transaction(
     transaction_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, user_id, date, amount, type, category, description FROM transactions WHERE id = ? AND user_id = ?",
-        (transaction_id, current_user.id),
-    )
-    transaction_data = cursor.fetchone()
-    conn.close()
-    if not transaction_data:
+    transaction = await run_ledger(current_user.id, _select_transaction, transaction_id, current_user.id)
+    if not transaction:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
-    return TransactionInDB(**transaction_data)
+    return transaction
 
 @router.put("/transactions/{transaction_id}", response_model=TransactionInDB)
 async def update_transaction(
@@ -92,30 +187,15 @@ async def update_transaction(
     transaction: TransactionCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE transactions SET date = ?, amount = ?, type = ?, category = ?, description = ? WHERE id = ? AND user_id = ?",
-        (
-            transaction.date.isoformat(),
-            transaction.amount,
-            transaction.type,
-            transaction.category,
-            transaction.description,
-            transaction_id,
-            current_user.id,
-        ),
-    )
-    conn.commit()
-    if cursor.rowcount == 0:
-        conn.close()
+    updated, change = await run_write(current_user.id, track_change, _update_transaction, transaction_id, current_user.id, transaction)
+    ledger_cache.apply(current_user.id, change)
+    if updated == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
-    conn.close()
     return TransactionInDB(
         id=transaction_id,
         user_id=current_user.id,
         date=transaction.date,
-        amount=transaction.amount,
+        amount=quantize_money(transaction.amount),
         type=transaction.type,
         category=transaction.category,
         description=transaction.description,
@@ -126,15 +206,8 @@ async def delete_transaction(
     transaction_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "DELETE FROM transactions WHERE id = ? AND user_id = ?",
-        (transaction_id, current_user.id),
-    )
-    conn.commit()
-    if cursor.rowcount == 0:
-        conn.close()
+    deleted, change = await run_write(current_user.id, track_change, _delete_transaction, transaction_id, current_user.id)
+    ledger_cache.apply(current_user.id, change)
+    if deleted == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
-    conn.close()
-    return
\ No newline at end of file
+    return
@@ -0,0 +1,113 @@
+import re
+from typing import Literal
+
+from app.data.categories import category_name_sql, category_names
+from app.models.models import from_minor_units
+
+SearchOrder = Literal["rank", "date"]
+
+_COLUMNS = ("id", "user_id", "date", "amount", "type", "category", "description")
+_SELECT = ", ".join(f"{category_name_sql('t.category_key')} AS category" if c == "category" else "t." + c for c in _COLUMNS)
+_TERM = re.compile(r"\w+")
+
+# Date-ordered searches with at most this many matches sort the matches; above
+# it, walking the user's (date, id) index and probing the match set stops much
+# sooner. The crossover measured on a 1M-row ledger is around 20k matches.
+_SORT_MATCHES_MAX = 20_000
+
+def search_terms(text):
+    return [term.lower() for term in _TERM.findall(text)]
+
+def fts_query(terms, categories):
+    """An FTS5 query matching every word in ``terms``.
+
+    Every word is quoted, so user input is never parsed as FTS5 syntax. A word
+    matches the description, or the category when it is one of the words of
+    the category's name; ``categories`` maps the user's category keys to names.
+    The last word also matches as a prefix, OR-ed with its exact form so that
+    whole-word matches rank higher.
+    """
+    category_words = [(key, set(search_terms(name))) for key, name in categories.items()]
+    clauses = []
+    for i, term in enumerate(terms):
+        if i < len(terms) - 1:
+            phrase = f'"{term}"'
+            keys = [key for key, words in category_words if term in words]
+        else:
+            phrase = f'("{term}" OR "{term}"*)'
+            keys = [key for key, words in category_words if any(w.startswith(term) for w in words)]
+        clause = f"{{description}} : {phrase}"
+        if keys:
+            categories_match = " OR ".join(f'"{key}"' for key in keys)
+            clause = f"({clause} OR {{category_key}} : ({categories_match}))"
+        clauses.append(clause)
+    return " AND ".join(clauses)
+
+def user_key(user_id):
+    """The token standing for ``user_id`` in the index (see migration 15)."""
+    return user_id.replace("-", "")
+
+def _date_filters(start_date, end_date):
+    filters, args = "", []
+    if start_date:
+        filters += " AND t.date >= ?"
+        args.append(start_date.isoformat())
+    if end_date:
+        filters += " AND t.date <= ?"
+        args.append(end_date.isoformat())
+    return filters, args
+
+def search_page(conn, user_id, text, start_date, end_date, after, limit, order: SearchOrder):
+    """Return ``(rows, next_after)`` for one page of matches.
+
+    ``order="rank"`` pages by ``(bm25 rank, id)``, best match first; it ranks
+    every match, so it costs about 2us per matching row. ``order="date"`` pages
+    by ``(date, id)``, newest first. Ranks depend on the whole index, so pages
+    requested while the ledger changes may overlap or skip rows.
+    """
+    match = f'{{user_key}} : "{user_key(user_id)}" AND {fts_query(search_terms(text), category_names(conn, user_id))}'
+    filters, args = _date_filters(start_date, end_date)
+    if order == "rank":
+        query = (
+            f"SELECT {_SELECT}, f.rank FROM transactions_fts f JOIN transactions t ON t.rowid = f.rowid "
+            f"WHERE transactions_fts MATCH ? AND t.user_id = ?{filters}"
+        )
+        args = [match, user_id, *args]
+        if after is not None:
+            query += " AND (f.rank, t.id) > (?, ?)"
+            args.extend(after)
+        query += " ORDER BY f.rank, t.id LIMIT ?"
+    else:
+        matches = conn.execute("SELECT COUNT(*) FROM transactions_fts WHERE transactions_fts MATCH ?", (match,)).fetchone()[0]
+        if matches <= _SORT_MATCHES_MAX:
+            query = (
+                f"SELECT {_SELECT} FROM transactions_fts f JOIN transactions t ON t.rowid = f.rowid "
+                f"WHERE transactions_fts MATCH ? AND t.user_id = ?{filters}"
+            )
+            args = [match, user_id, *args]
+        else:
+            # The unary + keeps the planner on idx_transactions_user_date_id, in order.
+            query = (
+                f"SELECT {_SELECT} FROM transactions t WHERE t.user_id = ?{filters} "
+                "AND +t.rowid IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)"
+            )
+            args = [user_id, *args, match]
+        if after is not None:
+            query += " AND (t.date, t.id) < (?, ?)"
+            args.extend(after)
+        query += " ORDER BY t.date DESC, t.id DESC LIMIT ?"
+    args.append(limit)
+
+    db_cursor = conn.cursor()
+    db_cursor.row_factory = None
+    rows = db_cursor.execute(query, args).fetchall()
+    next_after = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_after = [last[-1], last[0]] if order == "rank" else [last[2], last[0]]
+    page = []
+    for row in rows:
+        item = dict(zip(_COLUMNS, row))
+        item["amount"] = from_minor_units(item["amount"])
+        page.append(item)
+    return page, next_after
@@ -10,11 +10,11 @@ router = APIRouter()
 
 @router.post("/register", response_model=dict)
 async def register(user: UserCreate):
-    return register_user(user.username, user.password)
+    return await register_user(user.username, user.password)
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -4,21 +4,23 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
+from app.auth.cache import ExpiringLRUCache
+from app.auth.hashing import hash_password, verify_and_update_password
 from app.config import settings
 from app.models.models import TokenData, UserInDB
-from app.data.database import get_db_connection
+from app.data.database import home_shard
+from app.data.executor import run_db
+import hashlib
+import sqlite3
 import uuid
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# token digest -> username, so repeat requests skip jwt.decode
+principal_cache = ExpiringLRUCache(settings.PRINCIPAL_CACHE_SIZE)
+# username -> UserInDB, so repeat requests skip the users SELECT
+user_cache = ExpiringLRUCache(settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -30,22 +32,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_user(username: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username, hashed_password FROM users WHERE username = ?", (username,))
-    user_data = cursor.fetchone()
-    conn.close()
+def _select_user(conn, username: str):
+    user_data = conn.execute(
+        "SELECT id, username, hashed_password FROM users WHERE username = ?", (username,)
+    ).fetchone()
     if user_data:
         return UserInDB(**user_data)
     return None
 
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+def _insert_user(conn, user_id: str, username: str, hashed_password: str):
+    conn.execute("INSERT INTO users (id, username, hashed_password) VALUES (?, ?, ?)", (user_id, username, hashed_password))
+    shard = home_shard(user_id)
+    if shard is not None:
+        conn.execute("INSERT INTO user_shards (user_id, shard) VALUES (?, ?)", (user_id, shard))
+
+def _update_password_hash(conn, user_id: str, hashed_password: str):
+    conn.execute("UPDATE users SET hashed_password = ? WHERE id = ?", (hashed_password, user_id))
+
+async def get_user_cached(username: str):
+    user = user_cache.get(username)
+    if user is None:
+        user = await run_db(_select_user, username)
+        if user is not None:
+            user_cache.set(username, user)
+    return user
+
+def invalidate_user(username: str):
+    """Drop a cached user row; call after any change to the users table."""
+    user_cache.pop(username)
+
+def auth_cache_stats():
+    return {"principal_cache": principal_cache.stats(), "user_cache": user_cache.stats()}
+
+async def authenticate_user(username: str, password: str):
+    user = await run_db(_select_user, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        await run_db(_update_password_hash, user.id, new_hash)
+        invalidate_user(username)
+        user = user.model_copy(update={"hashed_password": new_hash})
     return user
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -54,15 +83,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    token_digest = hashlib.sha256(token.encode()).digest()
+    username = principal_cache.get(token_digest)
+    if username is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+            token_data = TokenData(username=username)
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-    user = get_user(token_data.username)
+        principal_cache.set(token_digest, token_data.username, expires_at=payload.get("exp"))
+    user = await get_user_cached(username)
     if user is None:
         raise credentials_exception
     return user
@@ -70,16 +103,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 async def get_current_active_user(current_user: UserInDB = Depends(get_current_user)):
     return current_user
 
-def register_user(username: str, password: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    existing_user = get_user(username)
+async def register_user(username: str, password: str):
+    existing_user = await run_db(_select_user, username)
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
     
-    hashed_password = get_password_hash(password)
+    hashed_password = await hash_password(password)
     user_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO users (id, username, hashed_password) VALUES (?, ?, ?)", (user_id, username, hashed_password))
-    conn.commit()
-    conn.close()
-    return {"message": "User registered successfully", "user_id": user_id}
\ No newline at end of file
+    try:
+        await run_db(_insert_user, user_id, username, hashed_password)
+    except sqlite3.IntegrityError:
+        # A concurrent registration took the name while the password was hashing.
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
+    return {"message": "User registered successfully", "user_id": user_id}
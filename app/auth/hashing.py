@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.config import settings
+
+@lru_cache(maxsize=None)
+def get_crypt_context(rounds: int):
+    # needs_update() reports hashes whose cost differs from ``rounds``.
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+def _hash(password: str, rounds: int):
+    return get_crypt_context(rounds).hash(password)
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int):
+    return get_crypt_context(rounds).verify_and_update(password, hashed_password)
+
+_pool = None
+_pool_lock = threading.Lock()
+_admission = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+def get_hash_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn keeps the workers free of the parent's sqlite connections and threads
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+def shutdown_hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+async def _run_in_hash_pool(func, *args):
+    if _admission.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent password operations, please retry",
+            headers={"Retry-After": "1"},
+        )
+    async with _admission:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_hash_pool(), func, *args)
+
+async def hash_password(password: str):
+    return await _run_in_hash_pool(_hash, password, settings.BCRYPT_ROUNDS)
+
+async def verify_and_update_password(password: str, hashed_password: str):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash uses an outdated cost."""
+    return await _run_in_hash_pool(_verify_and_update, password, hashed_password, settings.BCRYPT_ROUNDS)
@@ -6,4 +6,74 @@ class Settings:
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
-settings = Settings()
\ No newline at end of file
+    # Connection pool
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "10")) # seconds to wait for a free connection
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", "16384")) # page cache per connection
+    # NORMAL fsyncs the WAL only at checkpoints; FULL fsyncs every commit, so a committed write survives power loss
+    DB_SYNCHRONOUS: str = {"NORMAL": "NORMAL", "FULL": "FULL"}[os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()]
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+    # Threads running database work for async handlers; defaults to the pool size so no worker waits on a connection
+    DB_EXECUTOR_WORKERS: int = int(os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE)))
+
+    # Sharding: 0 keeps every ledger in DATABASE_URL; otherwise users are placed on this many shard files
+    # next to it (see app.data.database). Change it, then run python -m app.data.sharding rebalance.
+    DB_SHARDS: int = int(os.getenv("DB_SHARDS", "0"))
+    DB_SHARD_PLACEMENT_TTL_SECONDS: float = float(os.getenv("DB_SHARD_PLACEMENT_TTL_SECONDS", "5")) # how stale a cached placement may be
+
+    # Authentication caches
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")) # decoded tokens; entries expire at the token's exp
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "60")) # bounds staleness across worker processes
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12")) # stored hashes with a different cost are rehashed on login
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64")) # beyond this, logins get 503
+
+    # List endpoints
+    MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+    STREAM_BATCH_SIZE: int = int(os.getenv("STREAM_BATCH_SIZE", "500")) # rows per query when streaming NDJSON
+
+    # Group commit for request writes (see app.data.write_queue)
+    WRITE_QUEUE_ENABLED: bool = os.getenv("WRITE_QUEUE_ENABLED", "0") == "1"
+    WRITE_QUEUE_MAX_BATCH: int = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "256")) # writes per transaction
+    # How long the oldest write waits for others to join its batch. Writes arriving during a commit are
+    # batched anyway, so a delay only pays off when writes trickle in and each commit is expensive.
+    WRITE_QUEUE_MAX_DELAY_MS: float = float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "0"))
+
+    # Bulk import and batch writes
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "5000")) # rows per executemany / transaction
+    IMPORT_MAX_ERRORS: int = int(os.getenv("IMPORT_MAX_ERRORS", "1000")) # per-row errors returned in the response
+    BATCH_MAX_OPERATIONS: int = int(os.getenv("BATCH_MAX_OPERATIONS", "1000")) # per POST /batch request
+
+    # Balances: a checkpoint is recorded every this many transactions summed (see app.data.balances)
+    BALANCE_CHECKPOINT_INTERVAL: int = int(os.getenv("BALANCE_CHECKPOINT_INTERVAL", "1000"))
+
+    # In-memory columnar ledgers for report summaries (see app.data.ledger_cache)
+    LEDGER_CACHE_ENABLED: bool = os.getenv("LEDGER_CACHE_ENABLED", "0") == "1"
+    LEDGER_CACHE_MAX_BYTES: int = int(os.getenv("LEDGER_CACHE_MAX_BYTES", str(256 * 1024 * 1024))) # whole users are evicted past this
+
+    # Recurring transaction materializer
+    RECURRING_SCHEDULER_ENABLED: bool = os.getenv("RECURRING_SCHEDULER_ENABLED", "1") == "1"
+    RECURRING_INTERVAL_SECONDS: float = float(os.getenv("RECURRING_INTERVAL_SECONDS", "300"))
+    RECURRING_BATCH_SIZE: int = int(os.getenv("RECURRING_BATCH_SIZE", "1000")) # schedules per transaction
+
+    # Change log for delta sync (see app.api.change_api and app.data.changes)
+    CHANGES_COMPACTION_ENABLED: bool = os.getenv("CHANGES_COMPACTION_ENABLED", "1") == "1"
+    CHANGES_COMPACTION_INTERVAL_SECONDS: float = float(os.getenv("CHANGES_COMPACTION_INTERVAL_SECONDS", "3600"))
+    CHANGES_COMPACTION_BATCH_SIZE: int = int(os.getenv("CHANGES_COMPACTION_BATCH_SIZE", "1000")) # rows per delete transaction
+    # Tombstones older than this are dropped; clients whose cursor predates them must resync
+    CHANGES_TOMBSTONE_RETENTION_DAYS: float = float(os.getenv("CHANGES_TOMBSTONE_RETENTION_DAYS", "30"))
+    CHANGES_STREAM_POLL_SECONDS: float = float(os.getenv("CHANGES_STREAM_POLL_SECONDS", "1"))
+    CHANGES_STREAM_HEARTBEAT_SECONDS: float = float(os.getenv("CHANGES_STREAM_HEARTBEAT_SECONDS", "15"))
+
+    # Reports
+    TIMESERIES_MAX_PERIODS: int = int(os.getenv("TIMESERIES_MAX_PERIODS", "10000"))
+
+    # Metrics (Prometheus text format at /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "1") == "1" # request middleware and per-statement SQL timing
+
+settings = Settings()
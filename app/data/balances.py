@@ -0,0 +1,111 @@
+"""Balances from checkpoints.
+
+``balance_checkpoints`` holds a user's balance (income minus expenses, in minor
+units) through the end of a date. A balance read starts from the latest
+checkpoint on or before the date asked for and sums only the transactions
+after it, one index-ordered pass of per-day totals. Whenever that pass covers
+``BALANCE_CHECKPOINT_INTERVAL`` transactions it records a new checkpoint, so
+later reads start from there.
+
+A transaction inserted, updated or deleted on some date drops the checkpoints
+on or after that date (triggers from migration 12); they are rebuilt by the
+next read. Checkpoints are only a cache: deleting them is always safe.
+"""
+import sqlite3
+from datetime import date, timedelta
+
+from app.config import settings
+from app.data.categories import category_name_sql
+from app.models.models import from_minor_units
+
+SIGNED_AMOUNT = "CASE type WHEN 'income' THEN amount WHEN 'expense' THEN -amount ELSE 0 END"
+
+def _begin(conn):
+    # One read snapshot for the whole computation. Saving checkpoints upgrades
+    # it to a write, which SQLite refuses if another write has landed since.
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
+def _balance_through(conn, user_id, day: str):
+    """``(balance, new_checkpoints)`` after every transaction dated on or before ``day``."""
+    row = conn.execute(
+        "SELECT date, balance FROM balance_checkpoints WHERE user_id = ? AND date <= ? ORDER BY date DESC LIMIT 1",
+        (user_id, day),
+    ).fetchone()
+    since, balance = (row[0], row[1]) if row else ("", 0)
+    checkpoints = []
+    pending = 0
+    for day_date, total, count in conn.execute(
+        f"SELECT date, SUM({SIGNED_AMOUNT}), COUNT(*) FROM transactions "
+        "WHERE user_id = ? AND date > ? AND date <= ? GROUP BY date ORDER BY date",
+        (user_id, since, day),
+    ):
+        balance += total
+        pending += count
+        if pending >= settings.BALANCE_CHECKPOINT_INTERVAL:
+            checkpoints.append((user_id, day_date, balance))
+            pending = 0
+    return balance, checkpoints
+
+def _save_checkpoints(conn, checkpoints):
+    if not checkpoints:
+        return
+    try:
+        conn.executemany("INSERT OR REPLACE INTO balance_checkpoints (user_id, date, balance) VALUES (?, ?, ?)", checkpoints)
+    except sqlite3.OperationalError:
+        # Busy, or the ledger changed after the snapshot the sums were taken from:
+        # the answer stands, the checkpoints are left for a later read.
+        conn.rollback()
+
+def balance_as_of(conn, user_id, as_of: date = None):
+    """The balance in minor units after every transaction up to and including ``as_of``."""
+    _begin(conn)
+    balance, checkpoints = _balance_through(conn, user_id, (as_of or date.max).isoformat())
+    _save_checkpoints(conn, checkpoints)
+    return balance
+
+def running_balance_page(conn, user_id, start_date: date, end_date: date, after, limit):
+    """Return ``(rows, next_after)``: transactions in ``(date, id)`` order, each
+    with the balance after it; ``after`` is the last ``[date, id]`` already returned."""
+    _begin(conn)
+    query = (
+        f"SELECT id, date, amount, type, {category_name_sql()} AS category, description "
+        "FROM transactions WHERE user_id = ?"
+    )
+    args = [user_id]
+    if after is None:
+        balance, checkpoints = 0, []
+        if start_date:
+            balance, checkpoints = _balance_through(conn, user_id, (start_date - timedelta(days=1)).isoformat())
+            query += " AND date >= ?"
+            args.append(start_date.isoformat())
+    else:
+        after_date, after_id = after
+        balance, checkpoints = _balance_through(conn, user_id, (date.fromisoformat(after_date) - timedelta(days=1)).isoformat())
+        balance += conn.execute(
+            f"SELECT coalesce(SUM({SIGNED_AMOUNT}), 0) FROM transactions WHERE user_id = ? AND date = ? AND id <= ?",
+            (user_id, after_date, after_id),
+        ).fetchone()[0]
+        query += " AND (date, id) > (?, ?)"
+        args.extend(after)
+    if end_date:
+        query += " AND date <= ?"
+        args.append(end_date.isoformat())
+    query += " ORDER BY date, id LIMIT ?"
+    args.append(limit)
+
+    db_cursor = conn.cursor()
+    db_cursor.row_factory = None
+    rows = []
+    for id_, day, amount, type_, category, description in db_cursor.execute(query, args):
+        if type_ == "income":
+            balance += amount
+        elif type_ == "expense":
+            balance -= amount
+        rows.append({
+            "id": id_, "date": day, "amount": from_minor_units(amount), "type": type_,
+            "category": category, "description": description, "balance": from_minor_units(balance),
+        })
+    _save_checkpoints(conn, checkpoints)
+    next_after = [rows[-1]["date"], rows[-1]["id"]] if len(rows) == limit else None
+    return rows, next_after
@@ -0,0 +1,27 @@
+"""The category dictionary.
+
+Transactions and recurring transactions reference categories by the integer
+``categories.key`` (migration 10). Names are interned on write and joined back
+in only when a response is built, so renaming a category updates one row.
+"""
+import uuid
+
+def category_name_sql(key_column="category_key"):
+    """A correlated subquery selecting the category name for ``key_column``."""
+    return f"(SELECT c.name FROM categories c WHERE c.key = {key_column})"
+
+def intern_category(conn, user_id, name, type_):
+    """The key of the user's category ``name``, created with ``type_`` if it does not exist."""
+    row = conn.execute("SELECT key FROM categories WHERE user_id = ? AND name = ?", (user_id, name)).fetchone()
+    if row is not None:
+        return row[0]
+    # The lookup above may have raced another writer; let the unique index decide.
+    conn.execute(
+        "INSERT INTO categories (id, user_id, name, type) VALUES (?, ?, ?, ?) ON CONFLICT (user_id, name) DO NOTHING",
+        (str(uuid.uuid4()), user_id, name, type_),
+    )
+    return conn.execute("SELECT key FROM categories WHERE user_id = ? AND name = ?", (user_id, name)).fetchone()[0]
+
+def category_names(conn, user_id):
+    """``{key: name}`` for all of the user's categories."""
+    return dict(conn.execute("SELECT key, name FROM categories WHERE user_id = ?", (user_id,)).fetchall())
@@ -0,0 +1,108 @@
+"""Compaction of the ``changes`` log (migration 13).
+
+Triggers append an entry for every write to a user's transactions, categories,
+recurring transactions and goals. A sync client only needs the latest entry for
+each row, so compaction deletes every entry that a later one for the same row
+supersedes; no cursor loses anything by that. Tombstones older than
+``CHANGES_TOMBSTONE_RETENTION_DAYS`` are then dropped as well. The user's
+horizon in ``change_horizons`` moves past them and its generation goes up: a
+cursor issued in an earlier generation that is behind the horizon may have
+missed a delete, so the client has to resync from an empty cursor.
+
+Every batch is its own short write transaction, so requests are never held up
+for long.
+
+    python -m app.data.changes compact [--retention-days DAYS] [--batch-size N]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.data.database import create_tables, db_connection, ledger_paths
+from app.data.executor import get_executor
+
+logger = logging.getLogger(__name__)
+
+def drop_superseded(path, batch_size):
+    """Delete log entries that a later entry for the same row supersedes."""
+    deleted = 0
+    after = ("", "", "")
+    while True:
+        # Found from a read snapshot, walking idx_changes_row in order; the deletes
+        # below only touch entries older than the latest seen, so writes since are safe.
+        with db_connection(path) as conn:
+            rows = conn.execute(
+                "SELECT user_id, resource, id, MAX(seq) FROM changes WHERE (user_id, resource, id) > (?, ?, ?) "
+                "GROUP BY user_id, resource, id HAVING COUNT(*) > 1 ORDER BY user_id, resource, id LIMIT ?",
+                (*after, batch_size),
+            ).fetchall()
+        if not rows:
+            return deleted
+        with db_connection(path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            deleted += conn.executemany(
+                "DELETE FROM changes WHERE user_id = ? AND resource = ? AND id = ? AND seq < ?",
+                [tuple(row) for row in rows],
+            ).rowcount
+        after = tuple(rows[-1])[:3]
+
+def expire_tombstones(path, cutoff, batch_size):
+    """Delete tombstones written before ``cutoff`` (unix seconds) and advance the horizons."""
+    expired = 0
+    while True:
+        with db_connection(path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT user_id, seq FROM changes WHERE deleted = 1 AND changed_at < ? LIMIT ?", (cutoff, batch_size)
+            ).fetchall()
+            if not rows:
+                return expired
+            conn.executemany("DELETE FROM changes WHERE user_id = ? AND seq = ?", [tuple(row) for row in rows])
+            horizons = {}
+            for user_id, seq in rows:
+                horizons[user_id] = max(seq, horizons.get(user_id, 0))
+            conn.executemany(
+                "INSERT INTO change_horizons (user_id, seq, generation) VALUES (?, ?, 1) "
+                "ON CONFLICT (user_id) DO UPDATE SET seq = max(seq, excluded.seq), generation = generation + 1",
+                horizons.items(),
+            )
+        expired += len(rows)
+
+def compact_changes(retention_days: float = None, batch_size: int = None):
+    """Returns ``(superseded, expired)``: the entries deleted across every ledger file."""
+    if retention_days is None:
+        retention_days = settings.CHANGES_TOMBSTONE_RETENTION_DAYS
+    batch_size = batch_size or settings.CHANGES_COMPACTION_BATCH_SIZE
+    cutoff = int(time.time() - retention_days * 86400)
+    superseded = expired = 0
+    for path in ledger_paths():
+        superseded += drop_superseded(path, batch_size)
+        expired += expire_tombstones(path, cutoff, batch_size)
+    return superseded, expired
+
+async def run_compactor():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(settings.CHANGES_COMPACTION_INTERVAL_SECONDS)
+        try:
+            superseded, expired = await loop.run_in_executor(get_executor(), compact_changes)
+            if superseded or expired:
+                logger.info("Compacted the change log: %s superseded entries, %s expired tombstones", superseded, expired)
+        except Exception:
+            logger.exception("Change log compaction failed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact the change log.")
+    parser.add_argument("command", choices=("compact",))
+    parser.add_argument("--retention-days", type=float, default=None, help="keep tombstones this many days")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    create_tables()
+    superseded, expired = compact_changes(args.retention_days, args.batch_size)
+    print(f"Deleted {superseded} superseded entries and {expired} expired tombstones")
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,301 @@
+import hashlib
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from app.auth.cache import ExpiringLRUCache
 from app.config import settings
+from app.data.migrations import apply_migrations
+from app.metrics import db_fetch_seconds, db_statement_duration, exposition, fingerprint, register_collector
 
-def get_db_connection():
-    db_path = Path(settings.DATABASE_URL)
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+class PoolTimeout(Exception):
+    pass
+
+class UserMoving(Exception):
+    """The user's ledger is being moved to another shard; retry shortly."""
+
+class TimedCursor(sqlite3.Cursor):
+    """Records execute() and fetch time under the statement's fingerprint.
+
+    Rows read by iterating the cursor directly are not included in the fetch time.
+    """
+    _statement = None
+
+    def execute(self, sql, parameters=()):
+        self._statement = fingerprint(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            db_statement_duration.observe((self._statement,), time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._statement = fingerprint(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            db_statement_duration.observe((self._statement,), time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        db_fetch_seconds.inc((self._statement,), time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(size or self.arraysize)
+        db_fetch_seconds.inc((self._statement,), time.perf_counter() - started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        db_fetch_seconds.inc((self._statement,), time.perf_counter() - started)
+        return rows
+
+class InstrumentedConnection(sqlite3.Connection):
+    # Connection.execute() does not go through cursor(), so both shortcuts are overridden.
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def get_db_connection(db_path=None):
+    conn = sqlite3.connect(
+        db_path or settings.DATABASE_URL,
+        check_same_thread=False, # pooled connections move between threads, but are never shared concurrently
+        cached_statements=settings.DB_STATEMENT_CACHE_SIZE,
+        factory=InstrumentedConnection if settings.METRICS_ENABLED else sqlite3.Connection,
+    )
     conn.row_factory = sqlite3.Row # This allows accessing columns by name
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {settings.DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout = {int(settings.DB_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings.DB_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size = -{int(settings.DB_CACHE_SIZE_KB)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
     return conn
 
+class ConnectionPool:
+    def __init__(self, db_path, size=None, timeout=None):
+        self.db_path = str(db_path)
+        self.size = size or settings.DB_POOL_SIZE
+        self.timeout = settings.DB_POOL_TIMEOUT if timeout is None else timeout
+        self._idle = []
+        self._opened = 0
+        self._in_use = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        conn = None
+        started = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout(f"Connection pool for {self.db_path} is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    break
+                if started is None:
+                    started = time.monotonic()
+                    self._waits += 1
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += time.monotonic() - started
+                    raise PoolTimeout(f"Timed out waiting for a connection to {self.db_path}")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            if started is not None:
+                self._wait_time += time.monotonic() - started
+        if conn is None:
+            try:
+                conn = get_db_connection(self.db_path)
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # A broken connection is dropped rather than handed to the next caller.
+            conn.close()
+            conn = None
+        with self._cond:
+            self._in_use -= 1
+            if conn is None or self._closed:
+                self._opened -= 1
+                if conn is not None:
+                    conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._opened -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "database": self.db_path,
+                "size": self.size,
+                "open": self._opened,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waits": self._waits,
+                "wait_time_seconds": round(self._wait_time, 6),
+                "timeouts": self._timeouts,
+            }
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path=None):
+    db_path = str(db_path or settings.DATABASE_URL)
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+                pool = _pools[db_path] = ConnectionPool(db_path)
+    return pool
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+def pool_stats():
+    return [pool.stats() for pool in list(_pools.values())]
+
+@register_collector
+def _pool_metrics():
+    stats = pool_stats()
+    yield from exposition("db_pool_connections", "gauge", "Pooled connections by state.", [
+        ({"database": s["database"], "state": state}, s[state]) for s in stats for state in ("idle", "in_use")
+    ])
+    yield from exposition("db_pool_waits_total", "counter", "Acquisitions that had to wait for a connection.", [
+        ({"database": s["database"]}, s["waits"]) for s in stats
+    ])
+    yield from exposition("db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.", [
+        ({"database": s["database"]}, s["wait_time_seconds"]) for s in stats
+    ])
+    yield from exposition("db_pool_timeouts_total", "counter", "Acquisitions that timed out.", [
+        ({"database": s["database"]}, s["timeouts"]) for s in stats
+    ])
+
+@contextmanager
+def db_connection(db_path=None):
+    """Borrow a pooled connection; commits on success, rolls back on error."""
+    pool = get_pool(db_path)
+    conn = pool.acquire()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.release(conn)
+
+# Storage layout: ``DATABASE_URL`` is the catalog and holds ``users`` and
+# ``user_shards``. With ``DB_SHARDS`` > 0, each user's ledger tables
+# (transactions, categories, goals, ...) live in one shard file, so users on
+# different shards never wait for each other's write lock. Every file carries
+# the full schema. A user without a placement keeps their ledger in the
+# catalog file, which is also the whole layout when sharding is off.
+
+def shard_path(shard: int):
+    catalog = Path(settings.DATABASE_URL)
+    return str(catalog.with_name(f"{catalog.stem}-shard{shard:02d}{catalog.suffix}"))
+
+def jump_hash(key: str, buckets: int):
+    """Jump consistent hash of ``key`` into ``buckets``; going from n to n + 1
+    buckets moves only 1/(n + 1) of the keys."""
+    k = int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big")
+    bucket, j = -1, 0
+    while j < buckets:
+        bucket = j
+        k = (k * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * ((1 << 31) / ((k >> 33) + 1)))
+    return bucket
+
+def home_shard(user_id: str, shards: int = None):
+    """The shard a user is placed on, or None for the catalog file when ``shards`` is 0."""
+    shards = settings.DB_SHARDS if shards is None else shards
+    return jump_hash(user_id, shards) if shards > 0 else None
+
+# user_id -> (shard, moving); bounded staleness, which a move waits out (see app.data.sharding)
+_placements = ExpiringLRUCache(settings.USER_CACHE_SIZE, ttl=settings.DB_SHARD_PLACEMENT_TTL_SECONDS)
+
+def ledger_path(user_id: str):
+    """The database file holding ``user_id``'s ledger; raises ``UserMoving`` during a move."""
+    if settings.DB_SHARDS <= 0:
+        return settings.DATABASE_URL
+    placement = _placements.get(user_id)
+    if placement is None:
+        with db_connection() as conn:
+            row = conn.execute("SELECT shard, moving FROM user_shards WHERE user_id = ?", (user_id,)).fetchone()
+        placement = (row[0], bool(row[1])) if row else (None, False)
+        _placements.set(user_id, placement)
+    shard, moving = placement
+    if moving:
+        raise UserMoving(user_id)
+    return settings.DATABASE_URL if shard is None else shard_path(shard)
+
+@contextmanager
+def ledger_connection(user_id: str):
+    """Like ``db_connection``, on the file holding ``user_id``'s ledger."""
+    with db_connection(ledger_path(user_id)) as conn:
+        yield conn
+
+def ledger_paths():
+    """Every file that may hold ledger rows: the catalog, then each shard in use or configured."""
+    shards = set(range(settings.DB_SHARDS))
+    with db_connection() as conn:
+        shards.update(s for (s,) in conn.execute("SELECT DISTINCT shard FROM user_shards WHERE shard IS NOT NULL"))
+    return [settings.DATABASE_URL, *(shard_path(s) for s in sorted(shards))]
+
+def _migrate(path):
+    # Not a pooled connection: statements prepared during a migration (FTS5
+    # keeps its own for the connection's lifetime) were planned for the old
+    # schema and statistics.
+    conn = get_db_connection(path)
+    try:
+        return apply_migrations(conn)
+    finally:
+        conn.close()
+
 def create_tables():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id TEXT PRIMARY KEY,
-            username TEXT UNIQUE NOT NULL,
-            hashed_password TEXT NOT NULL
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS transactions (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            date TEXT NOT NULL,
-            amount REAL NOT NULL,
-            type TEXT NOT NULL,
-            category TEXT NOT NULL,
-            description TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            type TEXT NOT NULL,
-            UNIQUE(user_id, name),
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS recurring_transactions (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            amount REAL NOT NULL,
-            type TEXT NOT NULL,
-            category TEXT NOT NULL,
-            description TEXT,
-            frequency TEXT NOT NULL,
-            start_date TEXT NOT NULL,
-            next_due_date TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS goals (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            target_amount REAL NOT NULL,
-            current_amount REAL NOT NULL,
-            target_date TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-    conn.commit()
-    conn.close()
+    version = _migrate(settings.DATABASE_URL)
+    for path in ledger_paths()[1:]:
+        _migrate(path)
+    return version
 
 if __name__ == "__main__":
-    create_tables()
-    print("Database and tables created successfully!")
\ No newline at end of file
+    version = create_tables()
+    print(f"Database and tables created successfully! (schema version {version})")
\ No newline at end of file
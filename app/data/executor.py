@@ -0,0 +1,53 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+from app.data.database import db_connection, ledger_connection
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DB_EXECUTOR_WORKERS,
+                    thread_name_prefix="db",
+                )
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+def _call_with_connection(func, args, kwargs):
+    with db_connection() as conn:
+        return func(conn, *args, **kwargs)
+
+async def run_db(func, *args, **kwargs):
+    """Run ``func(conn, *args, **kwargs)`` on the database executor with a pooled connection.
+
+    The connection is committed when ``func`` returns and rolled back if it raises.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(_call_with_connection, func, args, kwargs)
+    )
+
+def _call_with_ledger(user_id, func, args, kwargs):
+    with ledger_connection(user_id) as conn:
+        return func(conn, *args, **kwargs)
+
+async def run_ledger(user_id, func, *args, **kwargs):
+    """Like ``run_db``, on the database file holding ``user_id``'s ledger tables."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(_call_with_ledger, user_id, func, args, kwargs)
+    )
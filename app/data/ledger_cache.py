@@ -0,0 +1,322 @@
+"""In-memory columnar copies of users' transactions for analytical reads.
+
+With ``LEDGER_CACHE_ENABLED`` a user's transactions are loaded once into typed
+columns (ordinal day, amount in minor units, +1/-1/0 for income/expense/other,
+a dense category code and a row weight) held in ``array`` buffers, about 18
+bytes per row, sorted by day. With NumPy installed the load also keeps running
+per-category totals through each distinct day, so a summary over any date range
+is two binary searches and a subtraction; without it summaries loop over the
+rows in the range.
+
+Every entry remembers the ``transactions`` data version (migration 8) it
+reflects. Readers pass in the current version, which they read for the ETag
+anyway, and a mismatch reloads the entry, so writes from other processes,
+imports, batches and the scheduler are never missed. Writes made through the
+transaction endpoints in this process patch the entry instead of dropping it:
+an insert appends the new row, a delete appends the old row with weight -1,
+an update does both. Once patches reach a quarter of the rows the entry is
+dropped and reloaded on the next read.
+
+Entries are evicted whole, least recently used first, to keep the resident
+columns under ``LEDGER_CACHE_MAX_BYTES``.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date
+from itertools import chain
+
+from app.config import settings
+from app.data.categories import category_names
+from app.metrics import exposition, register_collector
+
+try:
+    import numpy
+except ImportError: # optional speedup
+    numpy = None
+
+# (date.toordinal(), amount, sign, category_key), the ordinal computed by SQLite.
+_ROW_SQL = (
+    "CAST(julianday(date) - 1721424.5 AS INTEGER), amount, "
+    "CASE type WHEN 'income' THEN 1 WHEN 'expense' THEN -1 ELSE 0 END, category_key"
+)
+
+class LedgerColumns:
+    """One user's transactions as parallel columns, at data version ``version``.
+
+    The ``base`` rows from the load are sorted by day; patches are appended after
+    them in write order.
+    """
+
+    def __init__(self, version, rows, names):
+        self.version = version
+        self.names = names # (categories version, {key: name}), replaced as a whole
+        self.keys = [] # category key of each code
+        self._codes = {}
+        self.patches = 0
+        self.days = array("i", [row[0] for row in rows])
+        self.amounts = array("q", [row[1] for row in rows])
+        self.signs = array("b", [row[2] for row in rows])
+        self.codes = array("i", [self._code(row[3]) for row in rows])
+        self.weights = array("b", bytes([1]) * len(rows))
+        self.base = len(rows)
+        self._prefix = self._build_prefix() if numpy is not None else None
+
+    def _code(self, key):
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.keys)
+            self.keys.append(key)
+        return code
+
+    def append(self, row, weight):
+        day, amount, sign, key = row
+        self.days.append(day)
+        self.amounts.append(amount)
+        self.signs.append(sign)
+        self.codes.append(self._code(key))
+        self.weights.append(weight)
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def nbytes(self):
+        size = sum(column.buffer_info()[1] * column.itemsize for column in (self.days, self.amounts, self.signs, self.codes, self.weights))
+        if self._prefix is not None:
+            size += sum(part.nbytes for part in self._prefix)
+        return size
+
+    def _build_prefix(self):
+        # Running (sum, count) per bucket through each distinct day of the base rows, so a
+        # date range over them is two binary searches and a subtraction.
+        days = numpy.frombuffer(self.days, dtype=numpy.int32)[:self.base]
+        day_keys, day_index = numpy.unique(days, return_inverse=True)
+        size = 2 * len(self.keys)
+        buckets = self._buckets(0, self.base)
+        cells = day_index * size + buckets
+        mask = numpy.frombuffer(self.signs, dtype=numpy.int8)[:self.base] != 0
+        shape = (len(day_keys), size)
+        # Per-day sums stay far below 2**53, where float64 weights are exact.
+        sums = numpy.rint(numpy.bincount(
+            cells[mask], weights=numpy.frombuffer(self.amounts, dtype=numpy.int64)[:self.base][mask],
+            minlength=shape[0] * size,
+        )).astype(numpy.int64).reshape(shape)
+        counts = numpy.bincount(cells[mask], minlength=shape[0] * size).reshape(shape)
+        zero = numpy.zeros((1, size), dtype=numpy.int64)
+        return day_keys, numpy.vstack((zero, sums.cumsum(axis=0))), numpy.vstack((zero, counts.cumsum(axis=0)))
+
+    def _buckets(self, lo, hi):
+        # Bucket 2 * code + 1 holds income, 2 * code expenses.
+        codes = numpy.frombuffer(self.codes, dtype=numpy.int32)[lo:hi].astype(numpy.int64)
+        return codes * 2 + (numpy.frombuffer(self.signs, dtype=numpy.int8)[lo:hi] > 0)
+
+    def totals(self, start: date = None, end: date = None):
+        """``({key: income}, {key: expenses})`` in minor units over rows dated in ``[start, end]``."""
+        start_day = start.toordinal() if start else None
+        end_day = end.toordinal() if end else None
+        if numpy is not None:
+            sums, counts = self._bucket_totals_numpy(start_day, end_day)
+        else:
+            sums, counts = self._bucket_totals_python(start_day, end_day)
+        income, spending = {}, {}
+        for code, key in enumerate(self.keys):
+            if counts[2 * code + 1] > 0:
+                income[key] = sums[2 * code + 1]
+            if counts[2 * code] > 0:
+                spending[key] = sums[2 * code]
+        return income, spending
+
+    def _bucket_totals_numpy(self, start_day, end_day):
+        size = 2 * len(self.keys)
+        day_keys, sum_prefix, count_prefix = self._prefix
+        lo = 0 if start_day is None else numpy.searchsorted(day_keys, start_day, "left")
+        hi = len(day_keys) if end_day is None else numpy.searchsorted(day_keys, end_day, "right")
+        sums = numpy.zeros(size, dtype=numpy.int64)
+        counts = numpy.zeros(size, dtype=numpy.int64)
+        base_size = sum_prefix.shape[1]
+        sums[:base_size] = sum_prefix[hi] - sum_prefix[lo]
+        counts[:base_size] = count_prefix[hi] - count_prefix[lo]
+        if len(self) > self.base:
+            days = numpy.frombuffer(self.days, dtype=numpy.int32)[self.base:]
+            weights = numpy.frombuffer(self.weights, dtype=numpy.int8)[self.base:].astype(numpy.int64)
+            mask = numpy.frombuffer(self.signs, dtype=numpy.int8)[self.base:] != 0
+            if start_day is not None:
+                mask &= days >= start_day
+            if end_day is not None:
+                mask &= days <= end_day
+            buckets = self._buckets(self.base, len(self))[mask]
+            amounts = numpy.frombuffer(self.amounts, dtype=numpy.int64)[self.base:][mask] * weights[mask]
+            sums += numpy.rint(numpy.bincount(buckets, weights=amounts, minlength=size)).astype(numpy.int64)
+            counts += numpy.bincount(buckets, weights=weights[mask], minlength=size).astype(numpy.int64)
+        return sums.tolist(), counts.tolist()
+
+    def _bucket_totals_python(self, start_day, end_day):
+        size = 2 * len(self.keys)
+        sums, counts = [0] * size, [0] * size
+        lo = 0 if start_day is None else bisect_left(self.days, start_day, 0, self.base)
+        hi = self.base if end_day is None else bisect_right(self.days, end_day, 0, self.base)
+        for i in chain(range(lo, hi), range(self.base, len(self))):
+            day, sign = self.days[i], self.signs[i]
+            if sign == 0 or (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+                continue
+            bucket = 2 * self.codes[i] + (sign > 0)
+            sums[bucket] += self.amounts[i] * self.weights[i]
+            counts[bucket] += self.weights[i]
+        return sums, counts
+
+def versions(conn, user_id):
+    """``(transactions, categories)`` data versions of the user."""
+    found = dict(conn.execute(
+        "SELECT resource, version FROM data_versions WHERE user_id = ? AND resource IN ('transactions', 'categories')",
+        (user_id,),
+    ).fetchall())
+    return found.get("transactions", 0), found.get("categories", 0)
+
+def load_columns(conn, user_id):
+    """Read the user's columns and category names from one snapshot."""
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    transactions_version, categories_version = versions(conn, user_id)
+    db_cursor = conn.cursor()
+    db_cursor.row_factory = None
+    # idx_transactions_user_date returns the rows in day order without a sort.
+    rows = db_cursor.execute(f"SELECT {_ROW_SQL} FROM transactions WHERE user_id = ? ORDER BY date", (user_id,)).fetchall()
+    return LedgerColumns(transactions_version, rows, (categories_version, category_names(conn, user_id)))
+
+def load_names(conn, user_id):
+    """``(categories version, {key: name})`` from one snapshot."""
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    return versions(conn, user_id)[1], category_names(conn, user_id)
+
+def track_change(conn, func, transaction_id, user_id, *args):
+    """Run the transaction write ``func(conn, transaction_id, user_id, *args)``.
+
+    Returns ``(result, change)``; pass ``change`` to ``ledger_cache.apply`` once
+    the write has committed. ``change`` is None when the user is not cached.
+    """
+    if user_id not in ledger_cache:
+        return func(conn, transaction_id, user_id, *args), None
+    select = f"SELECT {_ROW_SQL} FROM transactions WHERE id = ? AND user_id = ?"
+    before = conn.execute(select, (transaction_id, user_id)).fetchone()
+    result = func(conn, transaction_id, user_id, *args)
+    after = conn.execute(select, (transaction_id, user_id)).fetchone()
+    return result, (versions(conn, user_id)[0], before and tuple(before), after and tuple(after))
+
+class LedgerCache:
+    """Thread-safe LRU of ``LedgerColumns`` by user id, bounded by resident bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = {}
+        self._resident = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.patches = 0
+        self.evictions = 0
+
+    def __contains__(self, user_id):
+        return user_id in self._entries
+
+    def get(self, user_id, version):
+        """The user's columns if they are cached at ``version``, otherwise None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            if entry is not None:
+                self.stale += 1
+                self._remove(user_id)
+            return None
+
+    def put(self, user_id, entry: LedgerColumns):
+        with self._lock:
+            current = self._entries.get(user_id)
+            if current is not None and current.version > entry.version:
+                return
+            self._remove(user_id)
+            self._add(user_id, entry)
+
+    def apply(self, user_id, change):
+        """Patch the user's entry with a committed write from ``track_change``."""
+        if change is None:
+            return
+        version, before, after = change
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.version == version:
+                return
+            if entry.version != version - 1 or entry.patches >= max(1024, len(entry) // 4):
+                # Another write got in between, or the entry has too many patches: reload it later.
+                self._remove(user_id)
+                return
+            if before is not None:
+                entry.append(before, -1)
+            if after is not None:
+                entry.append(after, 1)
+            entry.patches += 1
+            entry.version = version
+            self.patches += 1
+            self._remove(user_id)
+            self._add(user_id, entry)
+
+    def _add(self, user_id, entry):
+        size = entry.nbytes
+        if size > self.max_bytes:
+            return
+        self._entries[user_id] = entry
+        self._bytes[user_id] = size
+        self._resident += size
+        while self._resident > self.max_bytes:
+            evicted, _ = self._entries.popitem(last=False)
+            self._resident -= self._bytes.pop(evicted)
+            self.evictions += 1
+
+    def _remove(self, user_id):
+        self._entries.pop(user_id, None)
+        self._resident -= self._bytes.pop(user_id, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes.clear()
+            self._resident = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "numpy" if numpy is not None else "array",
+                "users": len(self._entries),
+                "rows": sum(len(entry) for entry in self._entries.values()),
+                "resident_bytes": self._resident,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "patches": self.patches,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+ledger_cache = LedgerCache(settings.LEDGER_CACHE_MAX_BYTES)
+
+@register_collector
+def _ledger_cache_metrics():
+    if not settings.LEDGER_CACHE_ENABLED:
+        return
+    stats = ledger_cache.stats()
+    yield from exposition("ledger_cache_resident_bytes", "gauge", "Bytes held by cached ledger columns.", [({}, stats["resident_bytes"])])
+    yield from exposition("ledger_cache_users", "gauge", "Users with cached ledger columns.", [({}, stats["users"])])
+    yield from exposition("ledger_cache_lookups_total", "counter", "Ledger cache lookups by result.", [
+        ({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"]),
+    ])
+    yield from exposition("ledger_cache_evictions_total", "counter", "Users evicted to stay under the memory budget.", [({}, stats["evictions"])])
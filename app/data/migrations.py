@@ -0,0 +1,704 @@
+"""Ordered schema migrations, tracked with ``PRAGMA user_version``.
+
+Each migration runs in its own ``BEGIN IMMEDIATE`` transaction together with
+the ``user_version`` bump, so it is applied exactly once even when several
+workers start at the same time. Append new migrations; never edit old ones.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+def rollup_triggers(category):
+    """Triggers keeping ``monthly_rollups`` current, grouped on the ``category``
+    column. Recreated whenever ``transactions`` is rebuilt, since dropping a table
+    drops its triggers."""
+    return [
+        f"""
+        CREATE TRIGGER trg_transactions_rollup_insert AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO monthly_rollups (user_id, month, type, {category}, total, count)
+            VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.type, NEW.{category}, NEW.amount, 1)
+            ON CONFLICT (user_id, month, type, {category})
+            DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_rollup_delete AFTER DELETE ON transactions
+        BEGIN
+            UPDATE monthly_rollups SET total = total - OLD.amount, count = count - 1
+            WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND type = OLD.type AND {category} = OLD.{category};
+            DELETE FROM monthly_rollups
+            WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND type = OLD.type AND {category} = OLD.{category} AND count <= 0;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_rollup_update AFTER UPDATE OF user_id, date, amount, type, {category} ON transactions
+        WHEN OLD.user_id IS NOT NEW.user_id OR OLD.date IS NOT NEW.date OR OLD.amount IS NOT NEW.amount
+            OR OLD.type IS NOT NEW.type OR OLD.{category} IS NOT NEW.{category}
+        BEGIN
+            UPDATE monthly_rollups SET total = total - OLD.amount, count = count - 1
+            WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND type = OLD.type AND {category} = OLD.{category};
+            DELETE FROM monthly_rollups
+            WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND type = OLD.type AND {category} = OLD.{category} AND count <= 0;
+            INSERT INTO monthly_rollups (user_id, month, type, {category}, total, count)
+            VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.type, NEW.{category}, NEW.amount, 1)
+            ON CONFLICT (user_id, month, type, {category})
+            DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+    ]
+
+def fts_triggers(category, user_key=False):
+    """Triggers keeping the external-content ``transactions_fts`` index in sync,
+    keyed by rowid (migration 7 preserved rowids when it rebuilt the table).
+    With ``user_key`` the index also holds the owner's id as a single token
+    (the uuid without dashes), so searches can require it in the MATCH."""
+    columns = f"description, {category}"
+    old_values = f"OLD.description, OLD.{category}"
+    new_values = f"NEW.description, NEW.{category}"
+    watched = f"description, {category}"
+    if user_key:
+        columns += ", user_key"
+        old_values += ", replace(OLD.user_id, '-', '')"
+        new_values += ", replace(NEW.user_id, '-', '')"
+        watched += ", user_id"
+    changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in watched.split(", "))
+    return [
+        f"""
+        CREATE TRIGGER trg_transactions_fts_insert AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (rowid, {columns})
+            VALUES (NEW.rowid, {new_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_fts_delete AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, {columns})
+            VALUES ('delete', OLD.rowid, {old_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_fts_update AFTER UPDATE OF {watched} ON transactions
+        WHEN {changed}
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, {columns})
+            VALUES ('delete', OLD.rowid, {old_values});
+            INSERT INTO transactions_fts (rowid, {columns})
+            VALUES (NEW.rowid, {new_values});
+        END
+        """,
+    ]
+
+# A random uuid4 string, for rows created inside a migration.
+_SQL_UUID4 = (
+    "lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-' "
+    "|| substr('89ab', 1 + abs(random()) % 4, 1) || substr(hex(randomblob(2)), 2) || '-' || hex(randomblob(6)))"
+)
+
+def version_triggers(table):
+    """Triggers bumping ``data_versions`` for the owning user on every write to
+    ``table``, in the writing transaction. The resource name is the table name."""
+    bump = """
+            INSERT INTO data_versions (user_id, resource, version) VALUES ({user}, '{table}', 1)
+            ON CONFLICT (user_id, resource) DO UPDATE SET version = version + 1;"""
+    return [
+        f"""
+        CREATE TRIGGER trg_{table}_version_insert AFTER INSERT ON {table}
+        BEGIN{bump.format(user="NEW.user_id", table=table)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_{table}_version_delete AFTER DELETE ON {table}
+        BEGIN{bump.format(user="OLD.user_id", table=table)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_{table}_version_update AFTER UPDATE ON {table}
+        BEGIN{bump.format(user="NEW.user_id", table=table)}
+            INSERT INTO data_versions (user_id, resource, version)
+            SELECT OLD.user_id, '{table}', 1 WHERE OLD.user_id IS NOT NEW.user_id
+            ON CONFLICT (user_id, resource) DO UPDATE SET version = version + 1;
+        END
+        """,
+    ]
+
+def balance_checkpoint_triggers():
+    """Triggers dropping a user's balance checkpoints dated on or after any
+    transaction change; they are recomputed on the next balance read."""
+    return [
+        """
+        CREATE TRIGGER trg_transactions_balance_insert AFTER INSERT ON transactions
+        BEGIN
+            DELETE FROM balance_checkpoints WHERE user_id = NEW.user_id AND date >= NEW.date;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_transactions_balance_delete AFTER DELETE ON transactions
+        BEGIN
+            DELETE FROM balance_checkpoints WHERE user_id = OLD.user_id AND date >= OLD.date;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_transactions_balance_update AFTER UPDATE OF user_id, date, amount, type ON transactions
+        WHEN OLD.user_id IS NOT NEW.user_id OR OLD.date IS NOT NEW.date OR OLD.amount IS NOT NEW.amount
+            OR OLD.type IS NOT NEW.type
+        BEGIN
+            DELETE FROM balance_checkpoints WHERE user_id = OLD.user_id AND date >= min(OLD.date, NEW.date);
+            DELETE FROM balance_checkpoints WHERE user_id = NEW.user_id AND date >= NEW.date;
+        END
+        """,
+    ]
+
+_NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+def change_log_triggers(table, resource):
+    """Triggers appending the written row's id to the owning user's ``changes`` log,
+    in the writing transaction; a delete appends a tombstone. ``resource`` is the
+    name the API uses for ``table``."""
+    log = """
+            INSERT INTO data_versions (user_id, resource, version) VALUES ({user}, 'changes', 1)
+            ON CONFLICT (user_id, resource) DO UPDATE SET version = version + 1;
+            INSERT INTO changes (user_id, seq, resource, id, deleted, changed_at)
+            SELECT {user}, version, '{resource}', {row}.id, {deleted}, {now} FROM data_versions
+            WHERE user_id = {user} AND resource = 'changes';"""
+    def entry(row, deleted):
+        return log.format(user=f"{row}.user_id", resource=resource, row=row, deleted=deleted, now=_NOW)
+    return [
+        f"""
+        CREATE TRIGGER trg_{table}_changes_insert AFTER INSERT ON {table}
+        BEGIN{entry("NEW", 0)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_{table}_changes_delete AFTER DELETE ON {table}
+        BEGIN{entry("OLD", 1)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_{table}_changes_update AFTER UPDATE ON {table}
+        BEGIN{entry("NEW", 0)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_{table}_changes_reassign AFTER UPDATE OF user_id ON {table}
+        WHEN OLD.user_id IS NOT NEW.user_id
+        BEGIN{entry("OLD", 1)}
+        END
+        """,
+    ]
+
+def category_rename_change_triggers():
+    """Log every transaction and recurring transaction of a renamed category too,
+    since their responses carry the category's name."""
+    return [
+        f"""
+        CREATE TRIGGER trg_categories_changes_rename AFTER UPDATE OF name ON categories
+        WHEN OLD.name IS NOT NEW.name
+        BEGIN
+            INSERT INTO changes (user_id, seq, resource, id, deleted, changed_at)
+            SELECT NEW.user_id,
+                (SELECT version FROM data_versions WHERE user_id = NEW.user_id AND resource = 'changes')
+                    + row_number() OVER (ORDER BY resource, id),
+                resource, id, 0, {_NOW}
+            FROM (
+                SELECT 'transactions' AS resource, id FROM transactions
+                WHERE user_id = NEW.user_id AND category_key = NEW.key
+                UNION ALL
+                SELECT 'recurring-transactions', id FROM recurring_transactions
+                WHERE user_id = NEW.user_id AND category_key = NEW.key
+            );
+            UPDATE data_versions SET version = max(version, (SELECT MAX(seq) FROM changes WHERE user_id = NEW.user_id))
+            WHERE user_id = NEW.user_id AND resource = 'changes';
+        END
+        """,
+    ]
+
+MIGRATIONS = [
+    (1, "baseline schema", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            hashed_password TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            amount REAL NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS categories (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            UNIQUE(user_id, name),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS recurring_transactions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            amount REAL NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT,
+            frequency TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            next_due_date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS goals (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            target_amount REAL NOT NULL,
+            current_amount REAL NOT NULL,
+            target_date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+    ]),
+    (2, "per-user indexes", [
+        # Covers both the date-range listing and the summary report without touching the table.
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (user_id, date, type, category, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_goals_user ON goals (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_recurring_transactions_user ON recurring_transactions (user_id)",
+        # categories is already served by the UNIQUE(user_id, name) index.
+        "ANALYZE",
+    ]),
+    (3, "monthly transaction rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS monthly_rollups (
+            user_id TEXT NOT NULL,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, type, category)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_insert AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+            VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+            ON CONFLICT (user_id, month, type, category)
+            DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_delete AFTER DELETE ON transactions
+        BEGIN
+            UPDATE monthly_rollups SET total = total - OLD.amount, count = count - 1
+            WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category;
+            DELETE FROM monthly_rollups
+            WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category AND count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_update AFTER UPDATE OF user_id, date, amount, type, category ON transactions
+        WHEN OLD.user_id IS NOT NEW.user_id OR OLD.date IS NOT NEW.date OR OLD.amount IS NOT NEW.amount
+            OR OLD.type IS NOT NEW.type OR OLD.category IS NOT NEW.category
+        BEGIN
+            UPDATE monthly_rollups SET total = total - OLD.amount, count = count - 1
+            WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category;
+            DELETE FROM monthly_rollups
+            WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category AND count <= 0;
+            INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+            VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+            ON CONFLICT (user_id, month, type, category)
+            DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+        SELECT user_id, substr(date, 1, 7), type, category, SUM(amount), COUNT(*)
+        FROM transactions GROUP BY user_id, substr(date, 1, 7), type, category
+        """,
+    ]),
+    (4, "keyset pagination indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id ON transactions (user_id, date, id)",
+        "DROP INDEX IF EXISTS idx_goals_user",
+        "CREATE INDEX IF NOT EXISTS idx_goals_user_target_date ON goals (user_id, target_date, id)",
+        "DROP INDEX IF EXISTS idx_recurring_transactions_user",
+        "CREATE INDEX IF NOT EXISTS idx_recurring_transactions_user_due ON recurring_transactions (user_id, next_due_date, id)",
+        "ANALYZE",
+    ]),
+    (5, "import deduplication hash", [
+        "ALTER TABLE transactions ADD COLUMN import_hash TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_user_import_hash ON transactions (user_id, import_hash) WHERE import_hash IS NOT NULL",
+    ]),
+    (6, "recurring transaction due index", [
+        "CREATE INDEX IF NOT EXISTS idx_recurring_transactions_due ON recurring_transactions (next_due_date, id)",
+    ]),
+    (7, "integer minor units for money", [
+        # Amounts were REAL dollars; store exact integer cents instead. SQLite cannot
+        # change a column type in place, so each table is rebuilt and its indexes and
+        # triggers recreated.
+        """
+        CREATE TABLE transactions_new (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT,
+            import_hash TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        INSERT INTO transactions_new (rowid, id, user_id, date, amount, type, category, description, import_hash)
+        SELECT rowid, id, user_id, date, CAST(ROUND(amount * 100) AS INTEGER), type, category, description, import_hash
+        FROM transactions
+        """,
+        "DROP TABLE transactions",
+        "ALTER TABLE transactions_new RENAME TO transactions",
+        "CREATE INDEX idx_transactions_user_date ON transactions (user_id, date, type, category, amount)",
+        "CREATE INDEX idx_transactions_user_date_id ON transactions (user_id, date, id)",
+        "CREATE UNIQUE INDEX idx_transactions_user_import_hash ON transactions (user_id, import_hash) WHERE import_hash IS NOT NULL",
+        """
+        CREATE TABLE recurring_transactions_new (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT,
+            frequency TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            next_due_date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        INSERT INTO recurring_transactions_new
+        SELECT id, user_id, name, CAST(ROUND(amount * 100) AS INTEGER), type, category, description, frequency, start_date, next_due_date
+        FROM recurring_transactions
+        """,
+        "DROP TABLE recurring_transactions",
+        "ALTER TABLE recurring_transactions_new RENAME TO recurring_transactions",
+        "CREATE INDEX idx_recurring_transactions_user_due ON recurring_transactions (user_id, next_due_date, id)",
+        "CREATE INDEX idx_recurring_transactions_due ON recurring_transactions (next_due_date, id)",
+        """
+        CREATE TABLE goals_new (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            target_amount INTEGER NOT NULL,
+            current_amount INTEGER NOT NULL,
+            target_date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        INSERT INTO goals_new
+        SELECT id, user_id, name, CAST(ROUND(target_amount * 100) AS INTEGER), CAST(ROUND(current_amount * 100) AS INTEGER), target_date
+        FROM goals
+        """,
+        "DROP TABLE goals",
+        "ALTER TABLE goals_new RENAME TO goals",
+        "CREATE INDEX idx_goals_user_target_date ON goals (user_id, target_date, id)",
+        "DROP TABLE monthly_rollups",
+        """
+        CREATE TABLE monthly_rollups (
+            user_id TEXT NOT NULL,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, type, category)
+        ) WITHOUT ROWID
+        """,
+        *rollup_triggers("category"),
+        """
+        INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+        SELECT user_id, substr(date, 1, 7), type, category, SUM(amount), COUNT(*)
+        FROM transactions GROUP BY user_id, substr(date, 1, 7), type, category
+        """,
+        "ANALYZE",
+    ]),
+    (8, "per-user data versions for conditional requests", [
+        """
+        CREATE TABLE data_versions (
+            user_id TEXT NOT NULL,
+            resource TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (user_id, resource)
+        ) WITHOUT ROWID
+        """,
+        *version_triggers("transactions"),
+        *version_triggers("categories"),
+        *version_triggers("recurring_transactions"),
+        *version_triggers("goals"),
+    ]),
+    (9, "full-text search over transactions", [
+        """
+        CREATE VIRTUAL TABLE transactions_fts USING fts5(
+            description, category,
+            content='transactions', content_rowid='rowid', prefix='2 3'
+        )
+        """,
+        "INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0)')",
+        *fts_triggers("category"),
+        "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')",
+    ]),
+    (10, "integer category keys", [
+        # transactions and recurring_transactions repeated the category name on
+        # every row; they now reference categories by an integer key, and names
+        # are joined back in only when a response is built.
+        """
+        CREATE TABLE categories_new (
+            key INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            UNIQUE(user_id, name),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        "INSERT INTO categories_new (key, id, user_id, name, type) SELECT rowid, id, user_id, name, type FROM categories",
+        "DROP TABLE categories",
+        "ALTER TABLE categories_new RENAME TO categories",
+        *version_triggers("categories"),
+        # Intern every name already in use that has no category row yet.
+        f"""
+        INSERT OR IGNORE INTO categories (id, user_id, name, type)
+        SELECT {_SQL_UUID4}, user_id, category, MIN(type) FROM (
+            SELECT user_id, category, type FROM transactions
+            UNION ALL
+            SELECT user_id, category, type FROM recurring_transactions
+        ) GROUP BY user_id, category
+        """,
+        "DROP TABLE transactions_fts",
+        """
+        CREATE TABLE transactions_new (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            category_key INTEGER NOT NULL,
+            description TEXT,
+            import_hash TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (category_key) REFERENCES categories (key)
+        )
+        """,
+        """
+        INSERT INTO transactions_new (rowid, id, user_id, date, amount, type, category_key, description, import_hash)
+        SELECT t.rowid, t.id, t.user_id, t.date, t.amount, t.type, c.key, t.description, t.import_hash
+        FROM transactions t JOIN categories c ON c.user_id = t.user_id AND c.name = t.category
+        """,
+        "DROP TABLE transactions",
+        "ALTER TABLE transactions_new RENAME TO transactions",
+        "CREATE INDEX idx_transactions_user_date ON transactions (user_id, date, type, category_key, amount)",
+        "CREATE INDEX idx_transactions_user_date_id ON transactions (user_id, date, id)",
+        "CREATE UNIQUE INDEX idx_transactions_user_import_hash ON transactions (user_id, import_hash) WHERE import_hash IS NOT NULL",
+        *version_triggers("transactions"),
+        """
+        CREATE TABLE recurring_transactions_new (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            category_key INTEGER NOT NULL,
+            description TEXT,
+            frequency TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            next_due_date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (category_key) REFERENCES categories (key)
+        )
+        """,
+        """
+        INSERT INTO recurring_transactions_new
+        SELECT r.id, r.user_id, r.name, r.amount, r.type, c.key, r.description, r.frequency, r.start_date, r.next_due_date
+        FROM recurring_transactions r JOIN categories c ON c.user_id = r.user_id AND c.name = r.category
+        """,
+        "DROP TABLE recurring_transactions",
+        "ALTER TABLE recurring_transactions_new RENAME TO recurring_transactions",
+        "CREATE INDEX idx_recurring_transactions_user_due ON recurring_transactions (user_id, next_due_date, id)",
+        "CREATE INDEX idx_recurring_transactions_due ON recurring_transactions (next_due_date, id)",
+        *version_triggers("recurring_transactions"),
+        "DROP TABLE monthly_rollups",
+        """
+        CREATE TABLE monthly_rollups (
+            user_id TEXT NOT NULL,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category_key INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, type, category_key)
+        ) WITHOUT ROWID
+        """,
+        *rollup_triggers("category_key"),
+        """
+        INSERT INTO monthly_rollups (user_id, month, type, category_key, total, count)
+        SELECT user_id, substr(date, 1, 7), type, category_key, SUM(amount), COUNT(*)
+        FROM transactions GROUP BY user_id, substr(date, 1, 7), type, category_key
+        """,
+        # The index holds the category key, so renaming a category never touches
+        # it; searches map words to the user's matching keys (see transaction_search).
+        """
+        CREATE VIRTUAL TABLE transactions_fts USING fts5(
+            description, category_key,
+            content='transactions', content_rowid='rowid', prefix='2 3'
+        )
+        """,
+        "INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0)')",
+        *fts_triggers("category_key"),
+        "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')",
+        "ANALYZE",
+    ]),
+    (11, "user shard placements", [
+        # Read from the catalog file only (see app.data.database.ledger_path); a
+        # user without a row keeps their ledger in the catalog file itself.
+        """
+        CREATE TABLE user_shards (
+            user_id TEXT PRIMARY KEY,
+            shard INTEGER,
+            moving INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (12, "balance checkpoints", [
+        # Running balance through the end of ``date``, in minor units (see app.data.balances).
+        """
+        CREATE TABLE balance_checkpoints (
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            balance INTEGER NOT NULL,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID
+        """,
+        *balance_checkpoint_triggers(),
+    ]),
+    (13, "change log", [
+        # Per-user log of row writes for delta sync (see app.api.change_api). ``seq``
+        # comes from the user's 'changes' counter in data_versions, so it keeps
+        # increasing across compaction and shard moves.
+        """
+        CREATE TABLE changes (
+            user_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            resource TEXT NOT NULL,
+            id TEXT NOT NULL,
+            deleted INTEGER NOT NULL,
+            changed_at INTEGER NOT NULL,
+            PRIMARY KEY (user_id, seq)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX idx_changes_row ON changes (user_id, resource, id, seq)",
+        "CREATE INDEX idx_changes_tombstones ON changes (changed_at) WHERE deleted = 1",
+        # Highest seq of a tombstone dropped by compaction, and how many times
+        # tombstones were dropped; cursors carry the generation they were issued in.
+        """
+        CREATE TABLE change_horizons (
+            user_id TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            generation INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        # Existing rows enter the log as if just written, so a first sync from an
+        # empty cursor sees everything.
+        f"""
+        INSERT INTO changes (user_id, seq, resource, id, deleted, changed_at)
+        SELECT user_id, row_number() OVER (PARTITION BY user_id ORDER BY resource, id), resource, id, 0, {_NOW}
+        FROM (
+            SELECT user_id, 'transactions' AS resource, id FROM transactions
+            UNION ALL SELECT user_id, 'categories', id FROM categories
+            UNION ALL SELECT user_id, 'recurring-transactions', id FROM recurring_transactions
+            UNION ALL SELECT user_id, 'goals', id FROM goals
+        )
+        """,
+        """
+        INSERT INTO data_versions (user_id, resource, version)
+        SELECT user_id, 'changes', MAX(seq) FROM changes GROUP BY user_id
+        """,
+        *change_log_triggers("transactions", "transactions"),
+        *change_log_triggers("categories", "categories"),
+        *change_log_triggers("recurring_transactions", "recurring-transactions"),
+        *change_log_triggers("goals", "goals"),
+        *category_rename_change_triggers(),
+    ]),
+    (14, "drop search index statistics", [
+        # The ANALYZE in migration 10 ran on an empty database and recorded the
+        # index's shadow tables as a couple of rows. Planned from that, FTS5's own
+        # statements got slower with every row indexed. Without statistics the
+        # defaults plan them well; an ANALYZE on a populated ledger records real counts.
+        r"DELETE FROM sqlite_stat1 WHERE tbl LIKE 'transactions\_fts\_%' ESCAPE '\'",
+        "ANALYZE sqlite_schema",
+    ]),
+    (15, "per-user search index", [
+        # The index covered every ledger's rows and searches kept the user's by
+        # joining after MATCH, so ranking and counting read every user's matches.
+        # It now holds the owner as a token that searches AND with their words;
+        # the view gives the external content a column for it.
+        "DROP TRIGGER trg_transactions_fts_insert",
+        "DROP TRIGGER trg_transactions_fts_delete",
+        "DROP TRIGGER trg_transactions_fts_update",
+        "DROP TABLE transactions_fts",
+        """
+        CREATE VIEW transactions_search (row_key, description, category_key, user_key) AS
+        SELECT rowid, description, category_key, replace(user_id, '-', '') FROM transactions
+        """,
+        """
+        CREATE VIRTUAL TABLE transactions_fts USING fts5(
+            description, category_key, user_key,
+            content='transactions_search', content_rowid='row_key', prefix='2 3'
+        )
+        """,
+        "INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 0.0)')",
+        *fts_triggers("category_key", user_key=True),
+        "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn):
+    if conn.in_transaction:
+        conn.commit()
+    for version, description, statements in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have applied it while we waited for the write lock.
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info("Applied migration %s: %s", version, description)
+    return get_schema_version(conn)
@@ -0,0 +1,73 @@
+"""Maintenance for the ``monthly_rollups`` table.
+
+The rollups are kept current by triggers on ``transactions`` (see migration 3);
+this module repairs them if they ever drift, e.g. after manual edits made with
+the triggers dropped.
+
+    python -m app.data.rollups verify [--user USER_ID]
+    python -m app.data.rollups rebuild [--user USER_ID]
+"""
+import argparse
+
+from app.data.database import create_tables, db_connection, ledger_path, ledger_paths
+
+_EXPECTED_QUERY = """
+    SELECT user_id, substr(date, 1, 7) AS month, type, category_key, SUM(amount) AS total, COUNT(*) AS count
+    FROM transactions {where} GROUP BY user_id, substr(date, 1, 7), type, category_key
+"""
+
+def _user_filter(user_id):
+    return ("WHERE user_id = ?", (user_id,)) if user_id else ("", ())
+
+def verify_rollups(conn, user_id=None):
+    where, params = _user_filter(user_id)
+    expected = {
+        (r["user_id"], r["month"], r["type"], r["category_key"]): (r["total"], r["count"])
+        for r in conn.execute(_EXPECTED_QUERY.format(where=where), params)
+    }
+    actual = {
+        (r["user_id"], r["month"], r["type"], r["category_key"]): (r["total"], r["count"])
+        for r in conn.execute(f"SELECT user_id, month, type, category_key, total, count FROM monthly_rollups {where}", params)
+    }
+    drift = []
+    for key in expected.keys() | actual.keys():
+        want = expected.get(key, (0, 0))
+        have = actual.get(key, (0, 0))
+        if want != have:
+            drift.append({"key": key, "expected": want, "actual": have})
+    return drift
+
+def rebuild_rollups(conn, user_id=None):
+    where, params = _user_filter(user_id)
+    conn.execute(f"DELETE FROM monthly_rollups {where}", params)
+    cursor = conn.execute(
+        "INSERT INTO monthly_rollups (user_id, month, type, category_key, total, count) " + _EXPECTED_QUERY.format(where=where),
+        params,
+    )
+    return cursor.rowcount
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild the monthly transaction rollups.")
+    parser.add_argument("command", choices=("verify", "rebuild"))
+    parser.add_argument("--user", help="limit to a single user id")
+    args = parser.parse_args()
+
+    create_tables()
+    paths = [ledger_path(args.user)] if args.user else ledger_paths()
+    drifted = 0
+    for path in paths:
+        with db_connection(path) as conn:
+            if args.command == "verify":
+                drift = verify_rollups(conn, args.user)
+                for entry in drift:
+                    print(f"drift {entry['key']}: expected {entry['expected']}, found {entry['actual']}")
+                drifted += len(drift)
+            else:
+                rows = rebuild_rollups(conn, args.user)
+                print(f"Rebuilt {rows} rollup bucket(s) in {path}")
+    if args.command == "verify":
+        print(f"{drifted} drifted bucket(s)")
+        raise SystemExit(1 if drifted else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Turns due recurring transactions into rows in ``transactions``.
+
+Every due schedule is caught up in full: all missed occurrences up to ``today``
+are inserted and ``next_due_date`` is advanced in the same transaction. The
+generated transaction ids are derived from the schedule id and the occurrence
+date, so re-running after a crash can never insert an occurrence twice.
+
+    python -m app.data.scheduler [--today YYYY-MM-DD] [--batch-size N]
+"""
+import argparse
+import asyncio
+import calendar
+import logging
+import uuid
+from datetime import date, timedelta
+
+from app.config import settings
+from app.data.database import create_tables, db_connection, ledger_paths
+from app.data.executor import get_executor
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+def add_months(anchor: date, months: int):
+    """``anchor`` shifted by ``months``, clamping the day to the end of shorter months."""
+    index = anchor.year * 12 + anchor.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return date(year, month, min(anchor.day, calendar.monthrange(year, month)[1]))
+
+def next_occurrence(start_date: date, current: date, frequency: str):
+    if frequency == "daily":
+        return current + timedelta(days=1)
+    if frequency == "weekly":
+        return current + timedelta(weeks=1)
+    # Step from the start date rather than from ``current`` so that a schedule
+    # anchored on the 31st returns to the 31st after a short month.
+    months = (current.year - start_date.year) * 12 + current.month - start_date.month
+    if frequency == "monthly":
+        return add_months(start_date, months + 1)
+    if frequency == "yearly":
+        return add_months(start_date, (months // 12 + 1) * 12)
+    raise ValueError(f"Unknown frequency: {frequency}")
+
+def due_occurrences(start_date: date, next_due_date: date, frequency: str, today: date):
+    """Return the occurrence dates up to ``today`` and the following due date."""
+    occurrences = []
+    current = next_due_date
+    while current <= today:
+        occurrences.append(current)
+        current = next_occurrence(start_date, current, frequency)
+    return occurrences, current
+
+def occurrence_id(recurring_transaction_id: str, occurrence: date):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"recurring:{recurring_transaction_id}:{occurrence.isoformat()}"))
+
+def materialize_batch(conn, today: date, batch_size: int):
+    """Materialize one index-ordered batch of due schedules.
+
+    Returns ``(selected, inserted, advanced)``. Schedules with an unknown frequency
+    are never selected, so they cannot hold up the ones due after them.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    schedules = conn.execute(
+        "SELECT id, user_id, name, amount, type, category_key, description, frequency, start_date, next_due_date "
+        f"FROM recurring_transactions WHERE next_due_date <= ? AND frequency IN ({', '.join('?' * len(FREQUENCIES))}) "
+        "ORDER BY next_due_date, id LIMIT ?",
+        (today.isoformat(), *FREQUENCIES, batch_size),
+    ).fetchall()
+
+    transactions = []
+    advances = []
+    for rt in schedules:
+        start_date = date.fromisoformat(rt["start_date"])
+        occurrences, next_due = due_occurrences(
+            start_date, date.fromisoformat(rt["next_due_date"]), rt["frequency"], today
+        )
+        transactions.extend(
+            (
+                occurrence_id(rt["id"], occurrence),
+                rt["user_id"],
+                occurrence.isoformat(),
+                rt["amount"],
+                rt["type"],
+                rt["category_key"],
+                rt["description"] or rt["name"],
+            )
+            for occurrence in occurrences
+        )
+        advances.append((next_due.isoformat(), rt["id"]))
+
+    inserted = conn.executemany(
+        "INSERT OR IGNORE INTO transactions (id, user_id, date, amount, type, category_key, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        transactions,
+    ).rowcount if transactions else 0
+    if advances:
+        conn.executemany("UPDATE recurring_transactions SET next_due_date = ? WHERE id = ?", advances)
+    return len(schedules), inserted, len(advances)
+
+def materialize_due(today: date = None, batch_size: int = None):
+    today = today or date.today()
+    batch_size = batch_size or settings.RECURRING_BATCH_SIZE
+    schedules = inserted = 0
+    for path in ledger_paths():
+        while True:
+            with db_connection(path) as conn:
+                seen, batch_inserted, advanced = materialize_batch(conn, today, batch_size)
+            schedules += advanced
+            inserted += batch_inserted
+            if seen < batch_size or advanced == 0:
+                break
+    return schedules, inserted
+
+async def run_scheduler():
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            schedules, inserted = await loop.run_in_executor(get_executor(), materialize_due)
+            if schedules:
+                logger.info("Materialized %s occurrence(s) from %s recurring transaction(s)", inserted, schedules)
+        except Exception:
+            logger.exception("Recurring transaction materializer failed")
+        await asyncio.sleep(settings.RECURRING_INTERVAL_SECONDS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize due recurring transactions.")
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="materialize occurrences up to this date")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    create_tables()
+    schedules, inserted = materialize_due(args.today, args.batch_size)
+    print(f"Materialized {inserted} transaction(s) from {schedules} recurring transaction(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Maintenance for the ``transactions_fts`` full-text index.
+
+The index is kept current by triggers on ``transactions`` (see migrations 9, 10 and 15).
+It refers to rows by rowid, so rebuild it after anything that may renumber
+rowids (e.g. VACUUM) or after edits made with the triggers dropped.
+
+    python -m app.data.search_index verify
+    python -m app.data.search_index rebuild
+    python -m app.data.search_index optimize
+"""
+import argparse
+import sqlite3
+
+from app.data.database import create_tables, db_connection, ledger_paths
+
+def verify_search_index(conn):
+    """Return None if the index matches ``transactions``, otherwise SQLite's error message."""
+    try:
+        conn.execute("INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('integrity-check', 1)")
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    return None
+
+def rebuild_search_index(conn):
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+    return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+def optimize_search_index(conn):
+    # Merges the index b-trees into one; worth running after large imports.
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('optimize')")
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify, rebuild or optimize the transaction search index.")
+    parser.add_argument("command", choices=("verify", "rebuild", "optimize"))
+    args = parser.parse_args()
+
+    create_tables()
+    failed = False
+    for path in ledger_paths():
+        with db_connection(path) as conn:
+            if args.command == "verify":
+                error = verify_search_index(conn)
+                print(f"{path}: search index does not match transactions ({error}); run rebuild" if error else f"{path}: search index is consistent")
+                failed = failed or error is not None
+            elif args.command == "rebuild":
+                rows = rebuild_search_index(conn)
+                print(f"{path}: reindexed {rows} transaction(s)")
+            else:
+                optimize_search_index(conn)
+                print(f"{path}: search index optimized")
+    raise SystemExit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Placing users' ledgers on shard files (see ``app.data.database.ledger_path``).
+
+    python -m app.data.sharding status
+    python -m app.data.sharding rebalance [--shards N] [--grace SECONDS] [--batch N]
+    python -m app.data.sharding move USER_ID SHARD|catalog [--grace SECONDS]
+
+Splitting an existing single file is a rebalance: users without a placement
+live in the catalog file and are moved to their home shard. Restart the
+servers with the new ``DB_SHARDS`` first; users are served from wherever
+their placement points until they are moved.
+
+A move marks the user as moving in the catalog, so requests for them get a 503,
+and waits ``--grace`` seconds for cached placements to expire (0 is fine while
+the server is stopped). It then copies the ledger into the target file, where
+the triggers rebuild the rollups, search index and data versions, switches the
+placement and deletes the old copy in one transaction on the source file that
+first checks that nothing was written there since the copy. Each file commits
+on its own, so a crash can leave a partial copy behind; running the same
+command again finishes the move.
+"""
+import argparse
+import os
+import time
+
+from app.config import settings
+from app.data.database import (
+    _placements, create_tables, db_connection, get_db_connection, home_shard, shard_path,
+)
+from app.data.migrations import apply_migrations
+
+# Per-user rows of the ledger tables, in copy order. Categories get new keys
+# in the target file, so rows referencing them are re-pointed by name. Rollups
+# and the search index are maintained by the target's triggers; balance
+# checkpoints are not copied and are rebuilt by the first balance read.
+COPY_LEDGER = (
+    "INSERT INTO main.categories (id, user_id, name, type) "
+    "SELECT id, user_id, name, type FROM source.categories WHERE user_id = ? ORDER BY key",
+    "INSERT INTO main.transactions (id, user_id, date, amount, type, category_key, description, import_hash) "
+    "SELECT t.id, t.user_id, t.date, t.amount, t.type, nc.key, t.description, t.import_hash "
+    "FROM source.transactions t JOIN source.categories oc ON oc.key = t.category_key "
+    "JOIN main.categories nc ON nc.user_id = oc.user_id AND nc.name = oc.name "
+    "WHERE t.user_id = ? ORDER BY t.rowid",
+    "INSERT INTO main.recurring_transactions "
+    "(id, user_id, name, amount, type, category_key, description, frequency, start_date, next_due_date) "
+    "SELECT r.id, r.user_id, r.name, r.amount, r.type, nc.key, r.description, r.frequency, r.start_date, r.next_due_date "
+    "FROM source.recurring_transactions r JOIN source.categories oc ON oc.key = r.category_key "
+    "JOIN main.categories nc ON nc.user_id = oc.user_id AND nc.name = oc.name "
+    "WHERE r.user_id = ? ORDER BY r.rowid",
+    "INSERT INTO main.goals (id, user_id, name, target_amount, current_amount, target_date) "
+    "SELECT id, user_id, name, target_amount, current_amount, target_date FROM source.goals WHERE user_id = ?",
+    # The copies above logged themselves as changes; keep the source's log instead.
+    "DELETE FROM main.changes WHERE user_id = ?",
+    "INSERT INTO main.changes (user_id, seq, resource, id, deleted, changed_at) "
+    "SELECT user_id, seq, resource, id, deleted, changed_at FROM source.changes WHERE user_id = ?",
+    "INSERT INTO main.change_horizons (user_id, seq, generation) "
+    "SELECT user_id, seq, generation FROM source.change_horizons WHERE user_id = ?",
+    # Continue past the source's versions so no ETag issued there is ever reused.
+    "INSERT INTO main.data_versions (user_id, resource, version) "
+    "SELECT user_id, resource, version FROM source.data_versions WHERE user_id = ? "
+    "ON CONFLICT (user_id, resource) DO UPDATE SET version = version + excluded.version",
+)
+
+DELETE_LEDGER = (
+    "DELETE FROM transactions WHERE user_id = ?",
+    "DELETE FROM recurring_transactions WHERE user_id = ?",
+    "DELETE FROM goals WHERE user_id = ?",
+    "DELETE FROM categories WHERE user_id = ?",
+    "DELETE FROM data_versions WHERE user_id = ?",
+    "DELETE FROM balance_checkpoints WHERE user_id = ?",
+    "DELETE FROM changes WHERE user_id = ?",
+    "DELETE FROM change_horizons WHERE user_id = ?",
+)
+
+def file_path(shard):
+    return settings.DATABASE_URL if shard is None else shard_path(shard)
+
+def placement(conn, user_id):
+    row = conn.execute("SELECT shard, moving FROM user_shards WHERE user_id = ?", (user_id,)).fetchone()
+    return (row[0], bool(row[1])) if row else (None, False)
+
+def _versions(conn, user_id):
+    return conn.execute(
+        "SELECT resource, version FROM data_versions WHERE user_id = ? ORDER BY resource", (user_id,)
+    ).fetchall()
+
+def _copy(user_id, source, target):
+    """Replace the user's ledger in ``target`` with a copy of the one in ``source``;
+    returns the source's data versions as of the copy."""
+    conn = get_db_connection(target)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (source,))
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for statement in DELETE_LEDGER:
+                conn.execute(statement, (user_id,))
+            versions = conn.execute(
+                "SELECT resource, version FROM source.data_versions WHERE user_id = ? ORDER BY resource", (user_id,)
+            ).fetchall()
+            for statement in COPY_LEDGER:
+                conn.execute(statement, (user_id,))
+        conn.execute("DETACH DATABASE source")
+    finally:
+        conn.close()
+    return [tuple(row) for row in versions]
+
+def _switch(user_id, source, target, versions):
+    """Point the user at shard ``target`` and drop their rows from the ``source`` file,
+    unless it changed since ``versions`` were read; returns whether it switched."""
+    with db_connection(source) as conn:
+        # Holding the source's write lock keeps late writers out until the placement has moved.
+        conn.execute("BEGIN IMMEDIATE")
+        if [tuple(row) for row in _versions(conn, user_id)] != versions:
+            return False
+        switch = ("UPDATE user_shards SET shard = ?, moving = 0 WHERE user_id = ?", (target, user_id))
+        if source == settings.DATABASE_URL:
+            conn.execute(*switch)
+        else:
+            with db_connection() as catalog:
+                catalog.execute(*switch)
+        _placements.pop(user_id)
+        for statement in DELETE_LEDGER:
+            conn.execute(statement, (user_id,))
+    return True
+
+def fence(user_ids):
+    """Mark users as moving, keeping their current placement."""
+    with db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO user_shards (user_id, shard, moving) VALUES (?, NULL, 1) "
+            "ON CONFLICT (user_id) DO UPDATE SET moving = 1",
+            [(user_id,) for user_id in user_ids],
+        )
+
+def finish_move(user_id, target):
+    """Move a fenced user's ledger to ``target`` (a shard number, or None for the catalog)."""
+    with db_connection() as conn:
+        source, _ = placement(conn, user_id)
+    if source == target:
+        with db_connection() as conn:
+            conn.execute("UPDATE user_shards SET moving = 0 WHERE user_id = ?", (user_id,))
+        return
+    while True:
+        versions = _copy(user_id, file_path(source), file_path(target))
+        if _switch(user_id, file_path(source), target, versions):
+            return
+
+def move_users(moves, grace):
+    """Move each ``(user_id, target)`` pair, waiting ``grace`` seconds once for cached placements."""
+    fence([user_id for user_id, _ in moves])
+    if moves and grace > 0:
+        time.sleep(grace)
+    for user_id, target in moves:
+        finish_move(user_id, target)
+
+def _prepare(targets):
+    create_tables()
+    for shard in targets:
+        with db_connection(file_path(shard)) as conn:
+            apply_migrations(conn)
+
+def rebalance(shards, grace, batch):
+    """Move every user whose placement differs from their home shard; returns the count moved."""
+    _prepare(range(shards))
+    with db_connection() as conn:
+        users = conn.execute(
+            "SELECT u.id, s.shard, coalesce(s.moving, 0) FROM users u LEFT JOIN user_shards s ON s.user_id = u.id ORDER BY u.id"
+        ).fetchall()
+    moves = []
+    for user_id, shard, moving in users:
+        target = home_shard(user_id, shards)
+        if moving or shard != target:
+            moves.append((user_id, target))
+    for start in range(0, len(moves), batch):
+        move_users(moves[start:start + batch], grace)
+        print(f"Moved {min(start + batch, len(moves))}/{len(moves)} user(s)")
+    return len(moves)
+
+def status():
+    with db_connection() as conn:
+        placed = dict(conn.execute(
+            "SELECT shard, COUNT(*) FROM users u LEFT JOIN user_shards s ON s.user_id = u.id GROUP BY shard"
+        ).fetchall())
+        moving = conn.execute("SELECT COUNT(*) FROM user_shards WHERE moving").fetchone()[0]
+    shards = sorted(set(range(settings.DB_SHARDS)) | {shard for shard in placed if shard is not None})
+    for shard in (None, *shards):
+        path = file_path(shard)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        print(f"{path}: {placed.get(shard, 0)} user(s), {size} bytes")
+    print(f"{moving} user(s) moving")
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or change which file holds each user's ledger.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    rebalance_parser = commands.add_parser("rebalance", help="move every user to their home shard")
+    rebalance_parser.add_argument("--shards", type=int, default=settings.DB_SHARDS, help="shard count (0 = catalog only)")
+    rebalance_parser.add_argument("--batch", type=int, default=100, help="users fenced at a time")
+    move_parser = commands.add_parser("move", help="move one user")
+    move_parser.add_argument("user_id")
+    move_parser.add_argument("target", help="shard number, or 'catalog'")
+    for command in (rebalance_parser, move_parser):
+        command.add_argument(
+            "--grace", type=float, default=settings.DB_SHARD_PLACEMENT_TTL_SECONDS,
+            help="seconds to wait for servers' cached placements to expire",
+        )
+    args = parser.parse_args()
+
+    if args.command == "status":
+        create_tables()
+        status()
+    elif args.command == "rebalance":
+        moved = rebalance(args.shards, args.grace, args.batch)
+        print(f"Rebalanced onto {args.shards} shard(s); {moved} user(s) moved")
+    else:
+        target = None if args.target == "catalog" else int(args.target)
+        _prepare([target])
+        move_users([(args.user_id, target)], args.grace)
+        print(f"Moved {args.user_id} to {file_path(target)}")
+
+if __name__ == "__main__":
+    main()
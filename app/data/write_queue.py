@@ -0,0 +1,140 @@
+"""Group commit for request writes.
+
+With ``WRITE_QUEUE_ENABLED`` each ``run_write`` call is handed to a single
+writer task instead of committing on its own. The writer takes the oldest
+pending write, gathers more for up to ``WRITE_QUEUE_MAX_DELAY_MS`` or until
+``WRITE_QUEUE_MAX_BATCH`` are pending, and runs them in one ``BEGIN IMMEDIATE``
+transaction per ledger file. Each write gets its own savepoint, so one that
+raises is rolled back alone. Callers get their result only after the batch has
+committed.
+
+Writes that arrive while a batch is committing form the next batch, so batches
+grow with load even with a zero delay.
+"""
+import asyncio
+import logging
+
+from app import metrics
+from app.config import settings
+from app.data.database import db_connection, ledger_path
+from app.data.executor import get_executor, run_ledger
+
+logger = logging.getLogger(__name__)
+
+write_batch_size = metrics.Histogram(
+    "db_write_batch_size", "Writes committed together by the group-commit writer.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+
+def _run_batch(writes):
+    """Run ``(user_id, func, args, kwargs)`` writes, one transaction per ledger file;
+    returns ``(ok, value)`` per write."""
+    outcomes = [None] * len(writes)
+    by_path = {}
+    for i, (user_id, _, _, _) in enumerate(writes):
+        try:
+            by_path.setdefault(ledger_path(user_id), []).append(i)
+        except Exception as e:
+            outcomes[i] = (False, e)
+    for path, indexes in by_path.items():
+        try:
+            with db_connection(path) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for i in indexes:
+                    _, func, args, kwargs = writes[i]
+                    conn.execute("SAVEPOINT pending_write")
+                    try:
+                        outcomes[i] = (True, func(conn, *args, **kwargs))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO pending_write")
+                        outcomes[i] = (False, e)
+                    conn.execute("RELEASE pending_write")
+        except Exception as e:
+            # The commit failed (or never started): none of this file's writes happened.
+            for i in indexes:
+                outcomes[i] = (False, e)
+    return outcomes
+
+class WriteQueue:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = self.loop.create_task(self._run())
+
+    async def submit(self, user_id, func, args, kwargs):
+        future = self.loop.create_future()
+        self._queue.put_nowait((user_id, func, args, kwargs, future))
+        return await future
+
+    async def close(self):
+        """Commit everything queued so far, then stop the writer."""
+        self._queue.put_nowait(None)
+        await self._task
+
+    async def _collect(self, first):
+        batch = [first]
+        deadline = self.loop.time() + settings.WRITE_QUEUE_MAX_DELAY_MS / 1000
+        while len(batch) < settings.WRITE_QUEUE_MAX_BATCH:
+            if not self._queue.empty():
+                entry = self._queue.get_nowait()
+            else:
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    async def _run(self):
+        closing = False
+        while not closing:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch, closing = await self._collect(first)
+            # A caller that went away before its batch started has nobody to answer.
+            batch = [entry for entry in batch if not entry[4].cancelled()]
+            if not batch:
+                continue
+            write_batch_size.observe((), len(batch))
+            try:
+                outcomes = await self.loop.run_in_executor(
+                    get_executor(), _run_batch, [entry[:4] for entry in batch]
+                )
+            except Exception as e:
+                logger.warning("Group commit of %s write(s) failed: %s", len(batch), e)
+                outcomes = [(False, e)] * len(batch)
+            for (*_, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+_write_queue = None
+
+async def run_write(user_id, func, *args, **kwargs):
+    """Run the write ``func(conn, *args, **kwargs)`` on ``user_id``'s ledger like ``run_ledger`` does.
+
+    With ``WRITE_QUEUE_ENABLED`` it is committed together with other pending
+    writes, and this returns once that commit is done. ``func`` must not commit
+    or roll back itself.
+    """
+    global _write_queue
+    if not settings.WRITE_QUEUE_ENABLED:
+        return await run_ledger(user_id, func, *args, **kwargs)
+    if _write_queue is None or _write_queue.loop is not asyncio.get_running_loop():
+        _write_queue = WriteQueue()
+    return await _write_queue.submit(user_id, func, args, kwargs)
+
+async def close_write_queue():
+    global _write_queue
+    if _write_queue is not None:
+        queue, _write_queue = _write_queue, None
+        await queue.close()
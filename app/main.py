@@ -1,6 +1,18 @@
-from fastapi import FastAPI
-from app.api import user_api, transaction_api, category_api, recurring_transaction_api, goal_api, report_api
-from app.data.database import create_tables
+import asyncio
+
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.api import user_api, transaction_api, category_api, recurring_transaction_api, goal_api, report_api, export_api, batch_api, change_api
+from app.auth.auth import auth_cache_stats
+from app.auth.hashing import shutdown_hash_pool
+from app.data.changes import run_compactor
+from app.data.database import PoolTimeout, UserMoving, close_pools, create_tables, pool_stats
+from app.data.executor import shutdown_executor
+from app.data.ledger_cache import ledger_cache
+from app.data.scheduler import run_scheduler
+from app.data.write_queue import close_write_queue
+from app.config import settings
+from app import metrics
 
 app = FastAPI(
     title="Personal Finance Manager API",
@@ -8,9 +20,43 @@ app = FastAPI(
     version="1.0.0",
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     create_tables()
+    if settings.RECURRING_SCHEDULER_ENABLED:
+        app.state.scheduler_task = asyncio.create_task(run_scheduler())
+    if settings.CHANGES_COMPACTION_ENABLED:
+        app.state.compactor_task = asyncio.create_task(run_compactor())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for name in ("scheduler_task", "compactor_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await close_write_queue()
+    shutdown_executor()
+    shutdown_hash_pool()
+    close_pools()
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(UserMoving)
+async def user_moving_handler(request: Request, exc: UserMoving):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Your data is being moved, please retry"},
+        headers={"Retry-After": str(max(1, round(settings.DB_SHARD_PLACEMENT_TTL_SECONDS)))},
+    )
 
 app.include_router(user_api.router, prefix="/users", tags=["users"])
 app.include_router(transaction_api.router, prefix="/transactions", tags=["transactions"])
@@ -18,7 +64,23 @@ app.include_router(category_api.router, prefix="/categories", tags=["categories"
 app.include_router(recurring_transaction_api.router, prefix="/recurring-transactions", tags=["recurring-transactions"])
 app.include_router(goal_api.router, prefix="/goals", tags=["goals"])
 app.include_router(report_api.router, prefix="/reports", tags=["reports"])
+app.include_router(export_api.router, prefix="/export", tags=["export"])
+app.include_router(batch_api.router, prefix="/batch", tags=["batch"])
+app.include_router(change_api.router, prefix="/changes", tags=["changes"])
 
 @app.get("/", tags=["root"])
 async def read_root():
-    return {"message": "Welcome to the Personal Finance Manager API"}
\ No newline at end of file
+    return {"message": "Welcome to the Personal Finance Manager API"}
+
+@app.get("/stats", tags=["root"])
+async def read_stats():
+    stats = {"db_pools": pool_stats(), **auth_cache_stats()}
+    if settings.LEDGER_CACHE_ENABLED:
+        stats["ledger_cache"] = ledger_cache.stats()
+    return stats
+
+@app.get("/metrics", tags=["root"], response_class=PlainTextResponse)
+async def read_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
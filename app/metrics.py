@@ -0,0 +1,193 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Request metrics come from ``MetricsMiddleware``; SQL statement timings from the
+instrumented connections handed out by ``app.data.database``. Observations
+are a bisect plus a locked increment, cheap enough to leave on in production.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_metrics = []
+_collectors = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        with self._lock:
+            items = sorted((k, v) for k, v in self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._values.get(labels)
+            if child is None:
+                # Per-bucket counts (made cumulative when rendered) and the sum.
+                child = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][index] += 1
+            child[1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        bounds = self.buckets + (float("inf"),)
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+def exposition(name, type, documentation, samples):
+    """Exposition lines for ``samples``, a list of ``(labels_dict, value)``; for collectors."""
+    yield f"# HELP {name} {documentation}"
+    yield f"# TYPE {name} {type}"
+    for labels, value in samples:
+        yield f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}"
+
+def register_collector(func):
+    """``func()`` returns exposition lines computed at scrape time, e.g. pool gauges."""
+    _collectors.append(func)
+    return func
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, until the response body is sent.", ("method", "route"),
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+db_statement_duration = Histogram(
+    "db_statement_duration_seconds",
+    "SQLite execute() time by statement fingerprint; for SELECTs this is preparation and the first step.",
+    ("statement",), buckets=SQL_BUCKETS,
+)
+db_fetch_seconds = Counter(
+    "db_fetch_seconds_total", "Time spent fetching result rows, by statement fingerprint.", ("statement",),
+)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Normalize a statement to a low-cardinality label: literals become ``?`` and
+    placeholder lists collapse to ``(?, ...)``."""
+    normalized = _STRING.sub("?", sql)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _SPACE.sub(" ", normalized).strip()
+    return _PLACEHOLDER_LIST.sub("(?, ...)", normalized)[:300]
+
+def route_template(scope):
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        # Unmatched paths are not used as labels, so scanners cannot blow up cardinality.
+        return "unmatched"
+    # Routes from an included router may report their path without the include
+    # prefix; recover it from the request path.
+    filled = path
+    for name, value in (scope.get("path_params") or {}).items():
+        filled = filled.replace("{" + name + "}", str(value))
+    request_path = scope["path"]
+    if filled != request_path and request_path.endswith(filled):
+        return request_path[: len(request_path) - len(filled)] + path
+    return path
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so it adds no task or body buffering per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc((method,))
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec((method,))
+            route = route_template(scope)
+            http_request_duration.observe((method, route), elapsed)
+            http_requests.inc((method, route, str(status)))
@@ -1,6 +1,20 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+# Money is stored as integer minor units (cents); the API speaks decimals.
+MINOR_UNITS = 100
+
+def to_minor_units(amount: float) -> int:
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_minor_units(value: int) -> float:
+    return value / MINOR_UNITS
+
+def quantize_money(amount: float) -> float:
+    """The decimal value that ``amount`` is stored as."""
+    return from_minor_units(to_minor_units(amount))
 
 class UserBase(BaseModel):
     username: str
@@ -33,6 +47,20 @@ class TransactionInDB(TransactionBase):
     id: str
     user_id: str
 
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportResult(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool
+    seconds: float
+    rows_per_second: float
+
 class CategoryBase(BaseModel):
     name: str
     type: str # "income" or "expense"
@@ -50,7 +78,7 @@ class RecurringTransactionBase(BaseModel):
     type: str # "income" or "expense"
     category: str
     description: Optional[str] = None
-    frequency: str # e.g., "daily", "weekly", "monthly", "yearly"
+    frequency: Literal["daily", "weekly", "monthly", "yearly"]
     start_date: date
     next_due_date: date
 
@@ -74,9 +102,57 @@ class GoalInDB(GoalBase):
     id: str
     user_id: str
 
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    resource: Literal["transactions", "categories", "recurring-transactions", "goals"]
+    id: Optional[str] = None # required for update and delete; generated for create when omitted
+    data: Optional[dict] = None # the resource's create body, for create and update
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    atomic: bool = True # all or nothing; otherwise failed operations are skipped and the rest commit
+
+class BatchOperationResult(BaseModel):
+    status: int # what the single-resource endpoint would have answered
+    id: Optional[str] = None
+    data: Optional[dict] = None
+    detail: Optional[str] = None
+
+class BatchResult(BaseModel):
+    committed: bool
+    results: List[BatchOperationResult]
+
+class Change(BaseModel):
+    resource: Literal["transactions", "categories", "recurring-transactions", "goals"]
+    id: str
+    deleted: bool
+    data: Optional[dict] = None # the row as the resource's endpoints return it now; None when deleted
+
+class ChangeFeed(BaseModel):
+    changes: List[Change]
+    cursor: str # pass as ``since`` to continue after these changes
+    more: bool # another page is already waiting
+
+class Balance(BaseModel):
+    as_of: Optional[date] = None # None: after every transaction
+    balance: float
+
+class RunningBalanceEntry(TransactionBase):
+    id: str
+    balance: float # after this transaction
+
 class ReportSummary(BaseModel):
     total_income: float
     total_expenses: float
     net_balance: float
     spending_by_category: dict[str, float]
-    income_by_category: dict[str, float]
\ No newline at end of file
+    income_by_category: dict[str, float]
+
+class TimeSeriesReport(BaseModel):
+    interval: str
+    periods: List[date] # start date of each bucket, gaps included
+    income: List[float]
+    expenses: List[float]
+    net: List[float]
+    income_by_category: dict[str, List[float]]
+    spending_by_category: dict[str, List[float]]
\ No newline at end of file
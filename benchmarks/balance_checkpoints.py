@@ -0,0 +1,95 @@
+"""Balance-at-date and running-balance reads with and without checkpoints.
+
+On one large ledger, times a full client-side style sum (every row up to the
+date), the first checkpointed read (which records checkpoints as it goes), warm
+checkpointed reads at random dates, a read right after a past-dated insert
+(which drops the later checkpoints) and one running-balance page in the
+middle of the history.
+
+Run from the repository root:
+
+    python -m benchmarks.balance_checkpoints --transactions 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import percentile, seed_transactions
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--reads", type=int, default=50, help="warm reads at random dates")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        from app.api.transaction_api import _insert_transaction
+        from app.config import settings
+        from app.data.balances import SIGNED_AMOUNT, balance_as_of, running_balance_page
+        from app.data.database import close_pools, create_tables, db_connection
+        from app.models.models import TransactionCreate
+
+        create_tables()
+        user_id = "bench-user"
+        with db_connection() as conn:
+            seed_transactions(conn, user_id, args.transactions)
+            conn.execute("ANALYZE")
+
+        rng = random.Random(1)
+        days = [date(2019, 1, 1) + timedelta(days=rng.randrange(5 * 365)) for _ in range(args.reads)]
+        with db_connection() as conn:
+            full = [
+                timed(lambda: conn.execute(
+                    f"SELECT SUM({SIGNED_AMOUNT}) FROM transactions WHERE user_id = ? AND date <= ?",
+                    (user_id, day.isoformat()),
+                ).fetchone()[0])
+                for day in days[:5]
+            ]
+        with db_connection() as conn:
+            _, first = timed(lambda: balance_as_of(conn, user_id))
+        warm = []
+        for day in days:
+            with db_connection() as conn:
+                balance, seconds = timed(lambda: balance_as_of(conn, user_id, day))
+            warm.append(seconds)
+        checked = [(day, balance) for day, (balance, _) in zip(days[:5], full)]
+        with db_connection() as conn:
+            mismatches = sum(balance_as_of(conn, user_id, day) != (balance or 0) for day, balance in checked)
+            checkpoints = conn.execute("SELECT COUNT(*) FROM balance_checkpoints").fetchone()[0]
+
+        edit_day = date(2021, 6, 15)
+        with db_connection() as conn:
+            _insert_transaction(conn, "past-dated", user_id, TransactionCreate(
+                date=edit_day, amount=12.34, type="expense", category="food",
+            ))
+        with db_connection() as conn:
+            _, after_edit = timed(lambda: balance_as_of(conn, user_id, date(2023, 12, 31)))
+        with db_connection() as conn:
+            _, page = timed(lambda: running_balance_page(conn, user_id, date(2022, 1, 1), None, None, 100))
+        close_pools()
+
+    print(json.dumps({
+        "transactions": args.transactions,
+        "checkpoint_interval": settings.BALANCE_CHECKPOINT_INTERVAL,
+        "checkpoints": checkpoints,
+        "mismatches": mismatches,
+        "full_sum_p50_ms": round(percentile([s for _, s in full], 50) * 1000, 2),
+        "first_checkpointed_read_ms": round(first * 1000, 2),
+        "warm_read_p50_ms": round(percentile(warm, 50) * 1000, 3),
+        "warm_read_p99_ms": round(percentile(warm, 99) * 1000, 3),
+        "read_after_past_dated_insert_ms": round(after_edit * 1000, 2),
+        "running_balance_page_ms": round(page * 1000, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
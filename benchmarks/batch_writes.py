@@ -0,0 +1,119 @@
+"""A sync client's offline edits: one request per edit versus ``POST /batch/batch``.
+
+Each round replays the same mix of creates, updates and deletes over
+transactions, goals and categories, first as individual requests and then as
+one batch request (atomic and best-effort).
+
+Run from the repository root:
+
+    python -m benchmarks.batch_writes --edits 50 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import CATEGORIES, percentile
+from benchmarks.seed import SeedConfig
+
+PATHS = {
+    "transactions": "/transactions/transactions/",
+    "goals": "/goals/goals/",
+    "categories": "/categories/categories/",
+}
+
+def edits(count, round_number):
+    """``(op, resource, id, data)`` edits: creates, then updates and deletes of the created rows."""
+    operations = []
+    created = []
+    for i in range(count):
+        kind = i % 5
+        if kind < 3 or not created:
+            edit_id = str(uuid.uuid4())
+            resource = "goals" if kind == 2 else "transactions"
+            data = (
+                {"name": f"goal {i}", "target_amount": 100 + i, "target_date": "2026-01-01"} if resource == "goals"
+                else {"date": "2024-05-01", "amount": 1 + i, "type": "expense", "category": CATEGORIES[i % len(CATEGORIES)]}
+            )
+            operations.append(("create", resource, edit_id, data))
+            created.append((resource, edit_id, data))
+        elif kind == 3:
+            resource, edit_id, data = created[-1]
+            operations.append(("update", resource, edit_id, {**data, "description": "edited"} if resource == "transactions" else data))
+        else:
+            resource, edit_id, _ = created.pop(0)
+            operations.append(("delete", resource, edit_id, None))
+    operations.append(("create", "categories", None, {"name": f"round {round_number}", "type": "expense"}))
+    return operations
+
+async def one_by_one(client, headers, operations):
+    ids = {}
+    for op, resource, edit_id, data in operations:
+        url = PATHS[resource]
+        if op == "create":
+            ids[edit_id] = (await client.post(url, json=data, headers=headers)).json()["id"]
+        elif op == "update":
+            await client.put(f"{url}{ids[edit_id]}", json=data, headers=headers)
+        else:
+            await client.delete(f"{url}{ids[edit_id]}", headers=headers)
+
+async def batched(client, headers, operations, atomic):
+    body = {
+        "atomic": atomic,
+        "operations": [
+            {"op": op, "resource": resource, "id": edit_id, "data": data} for op, resource, edit_id, data in operations
+        ],
+    }
+    response = await client.post("/batch/batch", json=body, headers=headers)
+    assert response.json()["committed"], response.text
+
+async def run(args):
+    import httpx
+    from app.auth.auth import create_access_token
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.main import app
+    from benchmarks.seed import seed_database
+
+    create_tables()
+    with db_connection() as conn:
+        user = seed_database(conn, SeedConfig(users=1, transactions_per_user=args.transactions))[0]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.username})}"}
+
+    modes = {
+        "one_by_one": lambda client, operations: one_by_one(client, headers, operations),
+        "batch_atomic": lambda client, operations: batched(client, headers, operations, True),
+        "batch_best_effort": lambda client, operations: batched(client, headers, operations, False),
+    }
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, replay in modes.items():
+            latencies = []
+            for round_number in range(args.rounds):
+                operations = edits(args.edits, f"{name} {round_number}")
+                started = time.perf_counter()
+                await replay(client, operations)
+                latencies.append(time.perf_counter() - started)
+            results[name] = {
+                "p50_ms_per_sync": round(percentile(latencies, 50) * 1000, 2),
+                "edits_per_second": round(args.edits * len(latencies) / sum(latencies), 1),
+            }
+    close_pools()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edits", type=int, default=50, help="edits per sync")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=10_000, help="existing ledger size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        print(json.dumps({"edits": args.edits, "modes": asyncio.run(run(args))}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Import a synthetic CSV or NDJSON bank export through POST /transactions/transactions/import.
+
+Run from the repository root:
+
+    python -m benchmarks.bulk_import --rows 100000 --format csv
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+from benchmarks.common import CATEGORIES
+
+def build_body(rows, format, seed=7):
+    rng = random.Random(seed)
+    start = date(2019, 1, 1)
+    lines = ["date,amount,type,category,description"] if format == "csv" else []
+    for i in range(rows):
+        record = {
+            "date": (start + timedelta(days=rng.randrange(5 * 365))).isoformat(),
+            "amount": round(rng.uniform(1, 500), 2),
+            "type": rng.choice(("income", "expense", "expense")),
+            "category": rng.choice(CATEGORIES),
+            "description": f"bank export row {i}",
+        }
+        if format == "csv":
+            lines.append(",".join(str(v) for v in record.values()))
+        else:
+            lines.append(json.dumps(record))
+    return ("\n".join(lines) + "\n").encode()
+
+async def run(args):
+    import httpx
+    from app.auth.auth import create_access_token
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.main import app
+
+    create_tables()
+    with db_connection() as conn:
+        conn.execute(
+            "INSERT INTO users (id, username, hashed_password) VALUES (?, ?, ?)",
+            (str(uuid.uuid4()), "bench", "unused"),
+        )
+    headers = {
+        "Authorization": f"Bearer {create_access_token({'sub': 'bench'})}",
+        "Content-Type": "text/csv" if args.format == "csv" else "application/x-ndjson",
+    }
+    body = build_body(args.rows, args.format)
+
+    async def chunks():
+        for offset in range(0, len(body), 64 * 1024):
+            yield body[offset:offset + 64 * 1024]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        response = await client.post("/transactions/transactions/import", content=chunks(), headers=headers)
+        elapsed = time.perf_counter() - started
+        response.raise_for_status()
+        result = response.json()
+        # Re-importing the same export should insert nothing.
+        repeat = (await client.post("/transactions/transactions/import", content=body, headers=headers)).json()
+    close_pools()
+
+    print(json.dumps({
+        "rows": args.rows,
+        "format": args.format,
+        "bytes": len(body),
+        "inserted": result["inserted"],
+        "failed": result["failed"],
+        "server_rows_per_second": result["rows_per_second"],
+        "end_to_end_seconds": round(elapsed, 3),
+        "reimport_duplicates": repeat["duplicates"],
+        "reimport_seconds": repeat["seconds"],
+    }, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Compare category names stored on every row with integer category keys.
+
+Builds the same synthetic ledger twice, once with the category name in
+``transactions`` (and its covering index) and once with an integer key into
+``categories``, and reports the on-disk size, the per-category summary query
+over raw rows and the cost of renaming one category.
+
+Run from the repository root:
+
+    python -m benchmarks.category_keys --transactions 1000000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.common import seed_transactions
+
+CATEGORIES = (
+    "Groceries", "Rent & Mortgage", "Salary", "Travel", "Utilities", "Entertainment", "Health & Fitness",
+    "Gifts & Donations", "Dining Out", "Transportation", "Subscriptions", "Insurance",
+)
+
+KEY_SCHEMA = """
+CREATE TABLE categories (
+    key INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    UNIQUE(user_id, name)
+);
+CREATE TABLE transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    category_key INTEGER NOT NULL,
+    description TEXT
+);
+CREATE INDEX idx_transactions_user_date ON transactions (user_id, date, type, category_key, amount);
+"""
+
+NAME_SCHEMA = """
+CREATE TABLE transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT
+);
+CREATE INDEX idx_transactions_user_date ON transactions (user_id, date, type, category, amount);
+"""
+
+QUERIES = {
+    "keys": (
+        "SELECT type, category_key, SUM(amount) FROM transactions WHERE user_id = ? GROUP BY type, category_key",
+        "UPDATE categories SET name = ? WHERE user_id = ? AND name = ?",
+    ),
+    "names": (
+        "SELECT type, category, SUM(amount) FROM transactions WHERE user_id = ? GROUP BY type, category",
+        "UPDATE transactions SET category = ? WHERE user_id = ? AND category = ?",
+    ),
+}
+
+def build(tmp, count):
+    key_path = os.path.join(tmp, "keys.db")
+    conn = sqlite3.connect(key_path)
+    conn.executescript(KEY_SCHEMA)
+    seed_transactions(conn, "bench-user", count, categories=CATEGORIES)
+    conn.commit()
+    conn.execute("VACUUM")
+
+    name_path = os.path.join(tmp, "names.db")
+    conn.execute("ATTACH DATABASE ? AS names", (name_path,))
+    conn.executescript(NAME_SCHEMA.replace("CREATE TABLE ", "CREATE TABLE names.").replace("CREATE INDEX ", "CREATE INDEX names."))
+    conn.execute(
+        "INSERT INTO names.transactions SELECT t.id, t.user_id, t.date, t.amount, t.type, c.name, t.description "
+        "FROM main.transactions t JOIN main.categories c ON c.key = t.category_key ORDER BY t.rowid"
+    )
+    conn.commit()
+    conn.close()
+    conn = sqlite3.connect(name_path)
+    conn.execute("VACUUM")
+    conn.close()
+    return {"keys": key_path, "names": name_path}
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {"transactions": args.transactions}
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout, path in build(tmp, args.transactions).items():
+            summary_sql, rename_sql = QUERIES[layout]
+            conn = sqlite3.connect(path)
+            summary = timed(lambda: conn.execute(summary_sql, ("bench-user",)).fetchall(), args.repeat)
+            started = time.perf_counter()
+            conn.execute(rename_sql, ("Groceries & Household", "bench-user", "Groceries"))
+            conn.commit()
+            rename = time.perf_counter() - started
+            conn.close()
+            results[layout] = {
+                "file_bytes": os.path.getsize(path),
+                "summary_seconds": round(summary, 4),
+                "rename_seconds": round(rename, 4),
+            }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""A sync client's cost per sync: refetching every list versus ``GET /changes/changes``.
+
+Seeds one user, lets the client sync once, then applies a round of edits
+(creates, updates and deletes through the API) between syncs. Each sync is
+timed as a full refetch of the four list endpoints and as a delta sync that
+pages through the change feed from the previous cursor; bytes received are
+reported too. Also times single-row inserts with and without the change log
+triggers, and one compaction of the log.
+
+Run from the repository root:
+
+    python -m benchmarks.change_feed --transactions 100000 --edits 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import CATEGORIES, percentile
+from benchmarks.seed import SeedConfig
+
+LISTS = (
+    "/transactions/transactions/",
+    "/categories/categories/",
+    "/recurring-transactions/recurring-transactions/",
+    "/goals/goals/",
+)
+
+async def full_refetch(client, headers, page_size):
+    received = 0
+    for url in LISTS:
+        cursor = None
+        while True:
+            params = {"limit": page_size, **({"cursor": cursor} if cursor else {})}
+            response = await client.get(url, params=params, headers=headers)
+            received += len(response.content)
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+    return received
+
+async def delta_sync(client, headers, cursor, page_size):
+    received = 0
+    while True:
+        response = await client.get(
+            "/changes/changes", params={"limit": page_size, **({"since": cursor} if cursor else {})}, headers=headers,
+        )
+        received += len(response.content)
+        body = response.json()
+        cursor = body["cursor"]
+        if not body["more"]:
+            return cursor, received
+
+async def edit(client, headers, count, round_number):
+    created = []
+    for i in range(count):
+        body = {"date": "2024-05-01", "amount": 1 + i, "type": "expense", "category": CATEGORIES[i % len(CATEGORIES)]}
+        if i % 4 == 3 and created:
+            await client.delete(f"/transactions/transactions/{created.pop()}", headers=headers)
+        elif i % 4 == 2 and created:
+            await client.put(f"/transactions/transactions/{created[-1]}", json={**body, "description": f"round {round_number}"}, headers=headers)
+        else:
+            created.append((await client.post("/transactions/transactions/", json=body, headers=headers)).json()["id"])
+
+def insert_rate(conn, user_id, count):
+    from app.api.transaction_api import _insert_transaction
+    from app.models.models import TransactionCreate
+
+    body = TransactionCreate(date="2024-05-01", amount=12.5, type="expense", category="food")
+    started = time.perf_counter()
+    for i in range(count):
+        conn.execute("BEGIN IMMEDIATE")
+        _insert_transaction(conn, f"rate-{time.perf_counter_ns()}-{i}", user_id, body)
+        conn.commit()
+    return count / (time.perf_counter() - started)
+
+async def run(args):
+    import httpx
+    from app.auth.auth import create_access_token
+    from app.config import settings
+    from app.data.changes import compact_changes
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.main import app
+    from benchmarks.seed import seed_database
+
+    create_tables()
+    with db_connection() as conn:
+        user = seed_database(conn, SeedConfig(users=1, transactions_per_user=args.transactions))[0]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.username})}"}
+    page_size = settings.MAX_PAGE_SIZE
+
+    full, delta, full_bytes, delta_bytes = [], [], [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        cursor, first_bytes = await delta_sync(client, headers, None, page_size)
+        first_sync = time.perf_counter() - started
+        for round_number in range(args.rounds):
+            await edit(client, headers, args.edits, round_number)
+            started = time.perf_counter()
+            full_bytes.append(await full_refetch(client, headers, page_size))
+            full.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            cursor, received = await delta_sync(client, headers, cursor, page_size)
+            delta.append(time.perf_counter() - started)
+            delta_bytes.append(received)
+
+    with db_connection() as conn:
+        with_log = insert_rate(conn, user.id, args.inserts)
+        triggers = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%\\_changes\\_%' ESCAPE '\\'"
+        )]
+        log_size = conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+    started = time.perf_counter()
+    superseded, _ = compact_changes()
+    compaction = time.perf_counter() - started
+    with db_connection() as conn:
+        for name in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+    with db_connection() as conn:
+        without_log = insert_rate(conn, user.id, args.inserts)
+    close_pools()
+
+    return {
+        "transactions": args.transactions,
+        "edits_per_sync": args.edits,
+        "first_sync_ms": round(first_sync * 1000, 1),
+        "first_sync_bytes": first_bytes,
+        "full_refetch_p50_ms": round(percentile(full, 50) * 1000, 1),
+        "full_refetch_bytes": int(percentile(full_bytes, 50)),
+        "delta_sync_p50_ms": round(percentile(delta, 50) * 1000, 2),
+        "delta_sync_bytes": int(percentile(delta_bytes, 50)),
+        "inserts_per_second_with_log": round(with_log),
+        "inserts_per_second_without_log": round(without_log),
+        "log_entries_before_compaction": log_size,
+        "compaction_ms": round(compaction * 1000, 1),
+        "superseded_entries_dropped": superseded,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--edits", type=int, default=20, help="edits between syncs")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--inserts", type=int, default=2000, help="single-row inserts for the trigger overhead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        os.environ.setdefault("RECURRING_SCHEDULER_ENABLED", "0")
+        print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import random
+import uuid
+from datetime import date, timedelta
+
+CATEGORIES = ("food", "rent", "salary", "travel", "utilities", "fun", "health", "gifts")
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def password_hash(password):
+    """A bcrypt hash at the configured cost, computed inline for seeding users."""
+    from app.auth.hashing import get_crypt_context
+    from app.config import settings
+
+    return get_crypt_context(settings.BCRYPT_ROUNDS).hash(password)
+
+def seeded_uuid(rng):
+    """A uuid4-shaped id drawn from ``rng``, so seeded data is identical between runs."""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def seed_transactions(
+    conn, user_id, count, start=date(2019, 1, 1), days=5 * 365, seed=42, batch=50_000,
+    categories=CATEGORIES, descriptions=("synthetic",),
+):
+    from app.data.categories import intern_category
+
+    rng = random.Random(seed)
+    keys = [intern_category(conn, user_id, name, "expense") for name in categories]
+    remaining = count
+    while remaining > 0:
+        size = min(batch, remaining)
+        conn.executemany(
+            "INSERT INTO transactions (id, user_id, date, amount, type, category_key, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    seeded_uuid(rng),
+                    user_id,
+                    (start + timedelta(days=rng.randrange(days))).isoformat(),
+                    rng.randrange(100, 50_000), # cents
+                    rng.choice(("income", "expense", "expense")),
+                    rng.choice(keys),
+                    rng.choice(descriptions),
+                )
+                for _ in range(size)
+            ],
+        )
+        remaining -= size
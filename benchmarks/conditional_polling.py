@@ -0,0 +1,67 @@
+"""Polling cost with and without If-None-Match on unchanged data.
+
+Run from the repository root:
+
+    python -m benchmarks.conditional_polling --transactions 20000 --polls 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import percentile
+from benchmarks.seed import SeedConfig
+
+ENDPOINTS = ("/transactions/transactions/", "/goals/goals/", "/reports/reports/summary")
+
+async def poll(client, url, headers, polls):
+    latencies = []
+    status = None
+    for _ in range(polls):
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        status = response.status_code
+    return status, latencies
+
+async def run(args):
+    import httpx
+    from app.auth.auth import create_access_token
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.main import app
+    from benchmarks.seed import seed_database
+
+    create_tables()
+    with db_connection() as conn:
+        user = seed_database(conn, SeedConfig(users=1, transactions_per_user=args.transactions))[0]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.username})}"}
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for url in ENDPOINTS:
+            etag = (await client.get(url, headers=headers)).headers["etag"]
+            full_status, full = await poll(client, url, headers, args.polls)
+            cond_status, conditional = await poll(client, url, {**headers, "If-None-Match": etag}, args.polls)
+            results[url] = {
+                "full": {"status": full_status, "p50_ms": round(percentile(full, 50) * 1000, 2)},
+                "conditional": {"status": cond_status, "p50_ms": round(percentile(conditional, 50) * 1000, 2)},
+                "speedup": round(percentile(full, 50) / percentile(conditional, 50), 1),
+            }
+    close_pools()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=20_000)
+    parser.add_argument("--polls", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        print(json.dumps({"transactions": args.transactions, "endpoints": asyncio.run(run(args))}, indent=2))
+
+if __name__ == "__main__":
+    main()
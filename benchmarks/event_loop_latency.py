@@ -0,0 +1,93 @@
+"""Latency of cheap GETs while heavy summary reports run on the same worker.
+
+Run from the repository root:
+
+    python -m benchmarks.event_loop_latency --transactions 200000 --heavy 4
+
+If database work blocked the event loop, p99 of the cheap request would jump
+to roughly the duration of a summary report once the heavy clients start.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import password_hash, percentile, seed_transactions
+
+async def measure(client, headers, requests):
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get("/goals/goals/", headers=headers)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return latencies
+
+async def heavy_load(client, headers, stop):
+    completed = 0
+    while not stop.is_set():
+        response = await client.get("/reports/reports/summary", headers=headers)
+        response.raise_for_status()
+        completed += 1
+    return completed
+
+def summarize(latencies):
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+async def run(args):
+    import httpx
+    from app.auth.auth import create_access_token
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.main import app
+
+    create_tables()
+    user_id = str(uuid.uuid4())
+    with db_connection() as conn:
+        conn.execute(
+            "INSERT INTO users (id, username, hashed_password) VALUES (?, ?, ?)",
+            (user_id, "bench", password_hash("bench")),
+        )
+        seed_transactions(conn, user_id, args.transactions)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await measure(client, headers, args.requests)
+
+        stop = asyncio.Event()
+        heavy = [asyncio.create_task(heavy_load(client, headers, stop)) for _ in range(args.heavy)]
+        await asyncio.sleep(0.1)
+        loaded = await measure(client, headers, args.requests)
+        stop.set()
+        reports = sum(await asyncio.gather(*heavy))
+    close_pools()
+
+    print(json.dumps({
+        "transactions": args.transactions,
+        "heavy_clients": args.heavy,
+        "summary_reports_completed": reports,
+        "idle": summarize(idle),
+        "under_load": summarize(loaded),
+    }, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--heavy", type=int, default=4, help="concurrent clients requesting summary reports")
+    parser.add_argument("--requests", type=int, default=500, help="cheap requests measured per phase")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Insert throughput and latency with and without the group-commit writer.
+
+Many concurrent writers each insert transactions through the same function the
+``POST /transactions/`` handler uses, once committing every insert on its own
+(``run_ledger``) and once through the write queue (``run_write``) at each of the
+given ``WRITE_QUEUE_MAX_DELAY_MS`` values.
+
+Run from the repository root:
+
+    python -m benchmarks.group_commit --writers 64 --inserts 50
+    DB_SYNCHRONOUS=FULL python -m benchmarks.group_commit
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import date
+
+from benchmarks.common import CATEGORIES, percentile
+
+async def run_mode(write, user_id, writers, inserts):
+    from app.api.transaction_api import _insert_transaction
+    from app.models.models import TransactionCreate
+
+    latencies = []
+    errors = 0
+
+    async def writer(w):
+        nonlocal errors
+        for i in range(inserts):
+            transaction = TransactionCreate(
+                date=date(2024, 1, 1 + i % 28), amount=1 + i, type="expense",
+                category=CATEGORIES[(w + i) % len(CATEGORIES)], description=f"writer {w}",
+            )
+            started = time.perf_counter()
+            try:
+                await write(user_id, _insert_transaction, str(uuid.uuid4()), user_id, transaction)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(w) for w in range(writers)))
+    seconds = time.perf_counter() - started
+    return {
+        "inserts_per_second": round(writers * inserts / seconds, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "errors": errors,
+    }
+
+async def run(args):
+    from app.config import settings
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.data.executor import run_ledger
+    from app.data.write_queue import close_write_queue, run_write
+
+    create_tables()
+    user_id = str(uuid.uuid4())
+    with db_connection() as conn:
+        conn.execute("INSERT INTO users (id, username, hashed_password) VALUES (?, 'bench', '-')", (user_id,))
+
+    results = {"direct": await run_mode(run_ledger, user_id, args.writers, args.inserts)}
+    settings.WRITE_QUEUE_ENABLED = True
+    for delay in args.delays:
+        settings.WRITE_QUEUE_MAX_DELAY_MS = delay
+        results[f"group_commit_{delay:g}ms"] = await run_mode(run_write, user_id, args.writers, args.inserts)
+        await close_write_queue()
+    close_pools()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=64, help="concurrent writers")
+    parser.add_argument("--inserts", type=int, default=50, help="inserts per writer")
+    parser.add_argument("--delays", type=float, nargs="+", default=[0, 2, 10], help="WRITE_QUEUE_MAX_DELAY_MS values")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        from app.config import settings
+
+        results = asyncio.run(run(args))
+        print(json.dumps({
+            "writers": args.writers,
+            "inserts": args.writers * args.inserts,
+            "synchronous": settings.DB_SYNCHRONOUS,
+            "modes": results,
+        }, indent=2))
+
+if __name__ == "__main__":
+    main()
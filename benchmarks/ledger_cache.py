@@ -0,0 +1,94 @@
+"""Report summaries from SQL (rollups plus edge months) versus the columnar ledger cache.
+
+On one large ledger, times the SQL summary for the whole history and for
+random date ranges, then the same summaries from cached columns, the load that
+fills the cache, and a patch from an update through the write path.
+
+Run from the repository root:
+
+    python -m benchmarks.ledger_cache --transactions 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import percentile, seed_transactions
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--reads", type=int, default=50, help="summaries over random date ranges")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        from app.api.report_api import _report_summary, _summarize
+        from app.api.transaction_api import _update_transaction
+        from app.data.database import close_pools, create_tables, db_connection
+        from app.data.ledger_cache import ledger_cache, load_columns, track_change
+        from app.models.models import TransactionCreate
+
+        create_tables()
+        user_id = "bench-user"
+        with db_connection() as conn:
+            seed_transactions(conn, user_id, args.transactions)
+            conn.execute("ANALYZE")
+            transaction_id = conn.execute("SELECT id FROM transactions LIMIT 1").fetchone()[0]
+
+        rng = random.Random(1)
+        ranges = [(None, None)]
+        for _ in range(args.reads):
+            start = date(2019, 1, 1) + timedelta(days=rng.randrange(5 * 365))
+            ranges.append((start, start + timedelta(days=rng.randrange(1, 365))))
+
+        sql = []
+        for start, end in ranges:
+            with db_connection() as conn:
+                _, seconds = timed(lambda: _summarize(conn, user_id, start, end))
+            sql.append(seconds)
+        with db_connection() as conn:
+            entry, load = timed(lambda: load_columns(conn, user_id))
+        ledger_cache.put(user_id, entry)
+        names = entry.names[1]
+        entry.totals() # first call pays for NumPy warm-up
+        cached = []
+        mismatches = 0
+        for start, end in ranges:
+            summary, seconds = timed(lambda: _report_summary(*entry.totals(start, end), names))
+            cached.append(seconds)
+            with db_connection() as conn:
+                mismatches += summary != _summarize(conn, user_id, start, end)
+
+        update = TransactionCreate(date=date(2021, 6, 15), amount=12.34, type="expense", category="food")
+        with db_connection() as conn:
+            (_, change), write = timed(lambda: track_change(conn, _update_transaction, transaction_id, user_id, update))
+        _, patch = timed(lambda: ledger_cache.apply(user_id, change))
+        stats = ledger_cache.stats()
+        close_pools()
+
+    print(json.dumps({
+        "transactions": args.transactions,
+        "backend": stats["backend"],
+        "resident_bytes": stats["resident_bytes"],
+        "mismatches": mismatches,
+        "sql_full_history_ms": round(sql[0] * 1000, 2),
+        "sql_range_p50_ms": round(percentile(sql[1:], 50) * 1000, 2),
+        "cache_load_ms": round(load * 1000, 2),
+        "cached_full_history_ms": round(cached[0] * 1000, 3),
+        "cached_range_p50_ms": round(percentile(cached[1:], 50) * 1000, 3),
+        "tracked_update_ms": round(write * 1000, 3),
+        "patch_us": round(patch * 1e6, 1),
+        "patches": stats["patches"],
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Per-row serialization cost of a large list response, before and after the fast path.
+
+``model_path`` repeats what list endpoints used to do: read ``sqlite3.Row``
+objects, convert each to a dict, build a response model per row and let
+FastAPI validate and serialize the list again through ``response_model``.
+``fast_path`` is the current ``KeysetListing`` path: tuple rows zipped into
+dicts and encoded in one call.
+
+Run from the repository root:
+
+    python -m benchmarks.list_serialization --rows 10000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+from typing import List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.common import seed_transactions
+
+def best_of(func, repeat):
+    best = float("inf")
+    body = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        best = min(best, time.perf_counter() - started)
+    return body, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        from app.api import fastjson
+        from app.api.transaction_api import transaction_listing
+        from app.data.database import close_pools, create_tables, db_connection
+        from app.models.models import TransactionInDB, from_minor_units
+
+        create_tables()
+        user_id = str(uuid.uuid4())
+        with db_connection() as conn:
+            seed_transactions(conn, user_id, args.rows)
+
+        adapter = TypeAdapter(List[TransactionInDB])
+        columns = transaction_listing.columns
+        # Computed columns such as ``category`` come from the listing's expressions, as in fetch_page.
+        select = ", ".join(f"{transaction_listing.expressions[c]} AS {c}" if c in transaction_listing.expressions else c for c in columns)
+
+        def model_path():
+            rows = conn.execute(
+                f"SELECT {select} FROM transactions WHERE user_id = ? ORDER BY date, id", (user_id,)
+            ).fetchall()
+            models = [TransactionInDB(**{**row, "amount": from_minor_units(row["amount"])}) for row in rows]
+            content = adapter.dump_python(adapter.validate_python(models, from_attributes=True), mode="json")
+            return JSONResponse(content).body
+
+        def fast_path():
+            rows, _ = transaction_listing.fetch_page(conn, user_id, (), (), None, None, columns)
+            return fastjson.FastJSONResponse(rows).body
+
+        with db_connection() as conn:
+            before, before_seconds = best_of(model_path, args.repeat)
+            after, after_seconds = best_of(fast_path, args.repeat)
+        close_pools()
+
+    assert json.loads(before) == json.loads(after)
+    print(json.dumps({
+        "rows": args.rows,
+        "encoder": "orjson" if fastjson.orjson is not None else "json",
+        "model_path": {"seconds": round(before_seconds, 4), "us_per_row": round(before_seconds / args.rows * 1e6, 2)},
+        "fast_path": {"seconds": round(after_seconds, 4), "us_per_row": round(after_seconds / args.rows * 1e6, 2)},
+        "speedup": round(before_seconds / after_seconds, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
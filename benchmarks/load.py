@@ -0,0 +1,360 @@
+"""Drive the API in-process through scenario workloads and report per-endpoint latency.
+
+Seeds a throwaway database (see ``benchmarks.seed``), then runs each scenario
+against the ASGI app with ``--concurrency`` clients. Results are JSON with
+throughput and p50/p95/p99 per endpoint, keyed by route template, and contain
+no timestamps or paths so two runs can be diffed directly.
+
+Run from the repository root:
+
+    python -m benchmarks.load --users 20 --transactions-per-user 20000 --output before.json
+    python -m benchmarks.load --scenario summary_5y --scenario large_list --requests 200
+
+Scenarios:
+    login_storm   POST /users/token with the seeded password
+    large_list    full, unpaginated transaction lists
+    summary_5y    /reports/summary over the whole 5-year seeded range
+    read_mix      every GET endpoint, weighted towards small pages
+    mixed_writes  write-heavy traffic across every router
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import percentile
+from benchmarks.seed import DAYS, SEED_PASSWORD, START, add_seed_arguments, category_names, seed_config
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, seconds, ok):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, elapsed):
+        requests = sum(len(samples) for samples in self.latencies.values())
+        return {
+            "requests": requests,
+            "errors": sum(self.errors.values()),
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(requests / elapsed, 1) if elapsed else 0.0,
+            "endpoints": {
+                endpoint: {
+                    "requests": len(samples),
+                    "errors": self.errors.get(endpoint, 0),
+                    "requests_per_second": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+                    "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                    "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                    "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                }
+                for endpoint, samples in sorted(self.latencies.items())
+            },
+        }
+
+class Session:
+    """One simulated client: a seeded user, its token and the ids it has written."""
+
+    def __init__(self, client, recorder, user, headers, rng, categories):
+        self.client = client
+        self.recorder = recorder
+        self.user = user
+        self.headers = headers
+        self.rng = rng
+        self.categories = categories
+        self.created = {"transactions": [], "goals": [], "recurring": []}
+
+    async def request(self, method, template, url=None, **kwargs):
+        """Send one request, recorded under ``template``; ``url`` is the filled-in path."""
+        kwargs.setdefault("headers", self.headers)
+        started = time.perf_counter()
+        response = await self.client.request(method, url or template, **kwargs)
+        self.recorder.record(f"{method} {template}", time.perf_counter() - started, response.is_success)
+        return response
+
+    def random_range(self, max_days):
+        start = START + timedelta(days=self.rng.randrange(DAYS))
+        return start, start + timedelta(days=self.rng.randrange(1, max_days))
+
+    def transaction_body(self):
+        return {
+            "date": (START + timedelta(days=self.rng.randrange(DAYS))).isoformat(),
+            "amount": round(self.rng.uniform(1, 500), 2),
+            "type": self.rng.choice(("income", "expense", "expense")),
+            "category": self.rng.choice(self.categories),
+            "description": "load",
+        }
+
+async def login_storm(session):
+    await session.request(
+        "POST", "/users/token", data={"username": session.user.username, "password": SEED_PASSWORD}, headers={},
+    )
+
+async def large_list(session):
+    await session.request("GET", "/transactions/transactions/")
+
+async def summary_5y(session):
+    await session.request(
+        "GET", "/reports/reports/summary",
+        params={"start_date": START.isoformat(), "end_date": (START + timedelta(days=DAYS - 1)).isoformat()},
+    )
+
+async def _list_page(session):
+    resource = session.rng.choice(("transactions", "goals", "categories", "recurring-transactions"))
+    await session.request("GET", f"/{resource}/{resource}/", params={"limit": 50})
+
+async def _date_range_page(session):
+    start, end = session.random_range(90)
+    await session.request(
+        "GET", "/transactions/transactions/",
+        params={"start_date": start.isoformat(), "end_date": end.isoformat(), "limit": 100},
+    )
+
+async def _read_transaction(session):
+    response = await session.request("GET", "/transactions/transactions/", params={"limit": 20, "fields": "id"})
+    rows = response.json()
+    if rows:
+        transaction_id = session.rng.choice(rows)["id"]
+        await session.request(
+            "GET", "/transactions/transactions/{transaction_id}", f"/transactions/transactions/{transaction_id}",
+        )
+
+async def _timeseries(session):
+    start, end = session.random_range(365)
+    await session.request(
+        "GET", "/reports/reports/timeseries",
+        params={"interval": session.rng.choice(("day", "week", "month")), "start_date": start.isoformat(), "end_date": end.isoformat()},
+    )
+
+async def _summary_range(session):
+    start, end = session.random_range(365)
+    await session.request(
+        "GET", "/reports/reports/summary", params={"start_date": start.isoformat(), "end_date": end.isoformat()},
+    )
+
+async def _export(session):
+    start, end = session.random_range(60)
+    await session.request(
+        "GET", "/export/export/{resource}", "/export/export/transactions",
+        params={"format": session.rng.choice(("csv", "ndjson", "columnar")), "start_date": start.isoformat(), "end_date": end.isoformat()},
+    )
+
+async def _me(session):
+    await session.request("GET", "/users/users/me/")
+
+async def _stats(session):
+    await session.request("GET", "/stats", headers={})
+
+READ_MIX = [
+    (_list_page, 30), (_date_range_page, 20), (_read_transaction, 10), (_timeseries, 10),
+    (_summary_range, 10), (_export, 5), (_me, 10), (_stats, 5),
+]
+
+async def _create_transaction(session):
+    response = await session.request("POST", "/transactions/transactions/", json=session.transaction_body())
+    if response.status_code == 200:
+        session.created["transactions"].append(response.json()["id"])
+
+async def _update_transaction(session):
+    if not session.created["transactions"]:
+        return await _create_transaction(session)
+    transaction_id = session.rng.choice(session.created["transactions"])
+    await session.request(
+        "PUT", "/transactions/transactions/{transaction_id}", f"/transactions/transactions/{transaction_id}",
+        json=session.transaction_body(),
+    )
+
+async def _delete_transaction(session):
+    if not session.created["transactions"]:
+        return await _create_transaction(session)
+    transaction_id = session.created["transactions"].pop(session.rng.randrange(len(session.created["transactions"])))
+    await session.request(
+        "DELETE", "/transactions/transactions/{transaction_id}", f"/transactions/transactions/{transaction_id}",
+    )
+
+async def _import_transactions(session):
+    lines = ["date,amount,type,category,description"]
+    for _ in range(50):
+        body = session.transaction_body()
+        lines.append(f"{body['date']},{body['amount']},{body['type']},{body['category']},import")
+    await session.request(
+        "POST", "/transactions/transactions/import", content="\n".join(lines).encode(),
+        headers={**session.headers, "content-type": "text/csv"},
+    )
+
+async def _create_goal(session):
+    response = await session.request("POST", "/goals/goals/", json={
+        "name": "load goal", "target_amount": 5000, "current_amount": 0,
+        "target_date": (date.today() + timedelta(days=365)).isoformat(),
+    })
+    if response.status_code == 200:
+        session.created["goals"].append(response.json()["id"])
+
+async def _update_goal(session):
+    if not session.created["goals"]:
+        return await _create_goal(session)
+    goal_id = session.rng.choice(session.created["goals"])
+    await session.request("PUT", "/goals/goals/{goal_id}", f"/goals/goals/{goal_id}", json={
+        "name": "load goal", "target_amount": 5000, "current_amount": round(session.rng.uniform(0, 5000), 2),
+        "target_date": (date.today() + timedelta(days=365)).isoformat(),
+    })
+
+async def _delete_goal(session):
+    if not session.created["goals"]:
+        return await _create_goal(session)
+    goal_id = session.created["goals"].pop()
+    await session.request("DELETE", "/goals/goals/{goal_id}", f"/goals/goals/{goal_id}")
+
+async def _create_delete_category(session):
+    name = f"load-{session.rng.getrandbits(48):x}"
+    response = await session.request("POST", "/categories/categories/", json={"name": name, "type": "expense"})
+    if response.status_code == 200:
+        category_id = response.json()["id"]
+        await session.request("DELETE", "/categories/categories/{category_id}", f"/categories/categories/{category_id}")
+
+def _recurring_body(session):
+    start = date.today() + timedelta(days=session.rng.randrange(1, 60))
+    return {
+        "name": "load schedule", "amount": round(session.rng.uniform(5, 500), 2), "type": "expense",
+        "category": session.rng.choice(session.categories), "frequency": session.rng.choice(("weekly", "monthly")),
+        "start_date": start.isoformat(), "next_due_date": start.isoformat(),
+    }
+
+async def _create_recurring(session):
+    response = await session.request("POST", "/recurring-transactions/recurring-transactions/", json=_recurring_body(session))
+    if response.status_code == 200:
+        session.created["recurring"].append(response.json()["id"])
+
+async def _update_recurring(session):
+    if not session.created["recurring"]:
+        return await _create_recurring(session)
+    recurring_id = session.rng.choice(session.created["recurring"])
+    await session.request(
+        "PUT", "/recurring-transactions/recurring-transactions/{recurring_transaction_id}",
+        f"/recurring-transactions/recurring-transactions/{recurring_id}", json=_recurring_body(session),
+    )
+
+async def _delete_recurring(session):
+    if not session.created["recurring"]:
+        return await _create_recurring(session)
+    recurring_id = session.created["recurring"].pop()
+    await session.request(
+        "DELETE", "/recurring-transactions/recurring-transactions/{recurring_transaction_id}",
+        f"/recurring-transactions/recurring-transactions/{recurring_id}",
+    )
+
+async def _register(session):
+    await session.request(
+        "POST", "/users/register", headers={},
+        json={"username": f"load-{session.rng.getrandbits(64):x}", "password": SEED_PASSWORD},
+    )
+
+MIXED_WRITES = [
+    (_create_transaction, 35), (_update_transaction, 15), (_delete_transaction, 10), (_import_transactions, 3),
+    (_create_goal, 3), (_update_goal, 5), (_delete_goal, 2), (_create_delete_category, 3),
+    (_create_recurring, 3), (_update_recurring, 3), (_delete_recurring, 2), (_register, 1),
+    (_list_page, 10), (_summary_range, 5),
+]
+
+def weighted(operations):
+    functions = [f for f, _ in operations]
+    weights = [w for _, w in operations]
+
+    async def operation(session):
+        await session.rng.choices(functions, weights)[0](session)
+    return operation
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "large_list": large_list,
+    "summary_5y": summary_5y,
+    "read_mix": weighted(READ_MIX),
+    "mixed_writes": weighted(MIXED_WRITES),
+}
+
+async def run_scenario(name, client, users, tokens, args):
+    from app.auth.auth import principal_cache, user_cache
+
+    # Each scenario starts cold and with its own random stream, so adding or
+    # reordering scenarios does not change what the others do.
+    principal_cache.clear()
+    user_cache.clear()
+    recorder = Recorder()
+    rng = random.Random(f"{args.seed}:{name}")
+    categories = category_names(args.categories)
+    sessions = [
+        Session(client, recorder, users[i % len(users)], {"Authorization": f"Bearer {tokens[i % len(users)]}"},
+                random.Random(rng.getrandbits(64)), categories)
+        for i in range(args.concurrency)
+    ]
+    operation = SCENARIOS[name]
+    counter = iter(range(args.requests))
+
+    async def worker(session):
+        for _ in counter:
+            await operation(session)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(session) for session in sessions])
+    return recorder.report(time.perf_counter() - started)
+
+async def run(args):
+    import httpx
+    from app.auth.auth import create_access_token
+    from app.auth.hashing import get_hash_pool, shutdown_hash_pool
+    from app.config import settings
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.main import app
+    from benchmarks.seed import seed_database
+
+    started = time.perf_counter()
+    create_tables()
+    with db_connection() as conn:
+        users = seed_database(conn, seed_config(args))
+    seed_seconds = time.perf_counter() - started
+    tokens = [create_access_token({"sub": user.username}) for user in users]
+
+    # Start the hashing workers before any clock does.
+    await asyncio.gather(*[
+        asyncio.get_running_loop().run_in_executor(get_hash_pool(), time.sleep, 0.01)
+        for _ in range(settings.PASSWORD_HASH_WORKERS)
+    ])
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in args.scenario or list(SCENARIOS):
+            results[name] = await run_scenario(name, client, users, tokens, args)
+    shutdown_hash_pool()
+    close_pools()
+
+    config = vars(seed_config(args))
+    config.update(concurrency=args.concurrency, requests=args.requests, bcrypt_rounds=settings.BCRYPT_ROUNDS)
+    return {"config": config, "seed_seconds": round(seed_seconds, 2), "scenarios": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_seed_arguments(parser)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="repeat to run several; default all")
+    parser.add_argument("--requests", type=int, default=500, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "load.db")
+        report = json.dumps(asyncio.run(run(args)), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+if __name__ == "__main__":
+    main()
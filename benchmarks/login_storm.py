@@ -0,0 +1,88 @@
+"""Login storm: many concurrent POST /users/token requests against one worker.
+
+Run from the repository root:
+
+    python -m benchmarks.login_storm --users 200 --concurrency 64
+
+Set BCRYPT_ROUNDS and PASSWORD_HASH_WORKERS in the environment to compare
+cost settings and pool sizes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import password_hash, percentile
+
+async def run(args):
+    import httpx
+    from app.auth.hashing import get_hash_pool, shutdown_hash_pool
+    from app.config import settings
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.main import app
+
+    create_tables()
+    hashed = password_hash("storm-password")
+    with db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (id, username, hashed_password) VALUES (?, ?, ?)",
+            [(str(uuid.uuid4()), f"user{i}", hashed) for i in range(args.users)],
+        )
+
+    # Start the hashing workers before the clock does.
+    await asyncio.gather(*[
+        asyncio.get_running_loop().run_in_executor(get_hash_pool(), time.sleep, 0.01)
+        for _ in range(settings.PASSWORD_HASH_WORKERS)
+    ])
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    statuses = {}
+
+    async def login(client, i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/users/token",
+                data={"username": f"user{i % args.users}", "password": "storm-password"},
+            )
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[login(client, i) for i in range(args.logins)])
+        elapsed = time.perf_counter() - started
+    shutdown_hash_pool()
+    close_pools()
+
+    succeeded = statuses.get(200, 0)
+    print(json.dumps({
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "hash_workers": settings.PASSWORD_HASH_WORKERS,
+        "logins": args.logins,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(succeeded / elapsed, 1),
+        "logins_per_second_per_core": round(succeeded / elapsed / settings.PASSWORD_HASH_WORKERS, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Throughput with METRICS_ENABLED=0 vs 1, using the load scenarios.
+
+Each round runs ``benchmarks.load`` once per setting in a fresh process
+(settings are read at import time), alternating so drift affects both equally;
+the best round per setting is compared.
+
+Run from the repository root:
+
+    python -m benchmarks.metrics_overhead --rounds 3 --scenario read_mix --scenario mixed_writes
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+def run_load(enabled, args, output):
+    env = {**os.environ, "METRICS_ENABLED": "1" if enabled else "0"}
+    command = [
+        sys.executable, "-m", "benchmarks.load", "--output", output,
+        "--users", str(args.users), "--transactions-per-user", str(args.transactions_per_user),
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+    ]
+    for scenario in args.scenario:
+        command += ["--scenario", scenario]
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    with open(output) as f:
+        return {name: result["requests_per_second"] for name, result in json.load(f)["scenarios"].items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--scenario", action="append")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--transactions-per-user", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    args.scenario = args.scenario or ["read_mix", "mixed_writes"]
+
+    best = {False: {}, True: {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for attempt in range(args.rounds):
+            for enabled in (False, True):
+                output = os.path.join(tmp, f"{attempt}-{int(enabled)}.json")
+                for name, rps in run_load(enabled, args, output).items():
+                    best[enabled][name] = max(best[enabled].get(name, 0.0), rps)
+
+    print(json.dumps({
+        name: {
+            "uninstrumented_rps": best[False][name],
+            "instrumented_rps": best[True][name],
+            "overhead_percent": round((1 - best[True][name] / best[False][name]) * 100, 1),
+        }
+        for name in best[False]
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
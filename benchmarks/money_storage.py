@@ -0,0 +1,87 @@
+"""Compare REAL dollars with INTEGER cents for stored amounts.
+
+Builds the same synthetic ledger twice, once with a REAL ``amount`` column and
+once with INTEGER minor units, and reports the on-disk size, the per-user sum
+time and how far the REAL sum drifts from the exact total.
+
+Run from the repository root:
+
+    python -m benchmarks.money_storage --transactions 1000000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.common import seed_transactions
+
+SCHEMA = """
+CREATE TABLE categories (
+    key INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    UNIQUE(user_id, name)
+);
+CREATE TABLE transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount {amount_type} NOT NULL,
+    type TEXT NOT NULL,
+    category_key INTEGER NOT NULL,
+    description TEXT
+);
+CREATE INDEX idx_transactions_user_date ON transactions (user_id, date, type, category_key, amount);
+"""
+
+def build(path, amount_type, count):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA.format(amount_type=amount_type))
+    # Seeds cents; the REAL table stores the same values as dollars.
+    seed_transactions(conn, "bench-user", count)
+    if amount_type == "REAL":
+        conn.execute("UPDATE transactions SET amount = amount / 100.0")
+    conn.commit()
+    conn.execute("VACUUM")
+    return conn
+
+def time_sum(conn, repeat):
+    best = float("inf")
+    total = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total = conn.execute(
+            "SELECT SUM(amount) FROM transactions WHERE user_id = ? AND type = 'expense'", ("bench-user",)
+        ).fetchone()[0]
+        best = min(best, time.perf_counter() - started)
+    return total, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {"transactions": args.transactions}
+    with tempfile.TemporaryDirectory() as tmp:
+        sums = {}
+        for amount_type in ("REAL", "INTEGER"):
+            path = os.path.join(tmp, f"{amount_type.lower()}.db")
+            conn = build(path, amount_type, args.transactions)
+            total, seconds = time_sum(conn, args.repeat)
+            conn.close()
+            sums[amount_type] = total
+            results[amount_type.lower()] = {
+                "file_bytes": os.path.getsize(path),
+                "sum_seconds": round(seconds, 4),
+            }
+    # Binary floating point cannot represent most cent values, so the REAL sum drifts.
+    results["real_sum_drift"] = sums["REAL"] - sums["INTEGER"] / 100
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Catch up a year of missed occurrences for many recurring schedules.
+
+Run from the repository root:
+
+    python -m benchmarks.recurring_catchup --schedules 100000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+from benchmarks.common import CATEGORIES
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schedules", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--days", type=int, default=365, help="how far behind the schedules are")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        from app.data.categories import intern_category
+        from app.data.database import close_pools, create_tables, db_connection
+        from app.data.scheduler import materialize_due
+
+        create_tables()
+        today = date(2025, 1, 1)
+        rng = random.Random(11)
+        user_ids = [str(uuid.uuid4()) for _ in range(args.users)]
+        with db_connection() as conn:
+            rows = []
+            for i in range(args.schedules):
+                start = today - timedelta(days=args.days - rng.randrange(28))
+                user_id = rng.choice(user_ids)
+                amount = rng.randrange(500, 200_000)
+                type_ = rng.choice(("income", "expense", "expense"))
+                rows.append((
+                    str(uuid.uuid4()), user_id, f"schedule {i}", amount,
+                    type_, intern_category(conn, user_id, rng.choice(CATEGORIES), type_), None,
+                    rng.choices(("monthly", "weekly", "yearly"), weights=(6, 3, 1))[0],
+                    start.isoformat(), start.isoformat(),
+                ))
+            conn.executemany(
+                "INSERT INTO recurring_transactions (id, user_id, name, amount, type, category_key, description, frequency, start_date, next_due_date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+        started = time.perf_counter()
+        schedules, inserted = materialize_due(today)
+        elapsed = time.perf_counter() - started
+        rerun = materialize_due(today)
+        close_pools()
+
+    print(json.dumps({
+        "schedules": schedules,
+        "transactions_inserted": inserted,
+        "seconds": round(elapsed, 2),
+        "transactions_per_second": round(inserted / elapsed, 1),
+        "rerun": {"schedules": rerun[0], "inserted": rerun[1]},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
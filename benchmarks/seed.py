@@ -0,0 +1,125 @@
+"""Seed a throwaway SQLite file with a reproducible synthetic workload.
+
+The same arguments always produce the same rows, ids included, so benchmark
+runs against separately seeded files are comparable. Every user gets the
+password ``SEED_PASSWORD``.
+
+Run from the repository root:
+
+    python -m benchmarks.seed /tmp/bench.db --users 50 --transactions-per-user 20000
+"""
+import argparse
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from benchmarks.common import CATEGORIES, password_hash, seed_transactions, seeded_uuid
+
+SEED_PASSWORD = "bench-password"
+START = date(2019, 1, 1)
+DAYS = 5 * 365
+
+@dataclass
+class SeedConfig:
+    users: int = 10
+    transactions_per_user: int = 10_000
+    categories: int = len(CATEGORIES)
+    goals: int = 5
+    recurring: int = 5
+    seed: int = 42
+
+@dataclass
+class SeededUser:
+    id: str
+    username: str
+
+def category_names(count):
+    return [CATEGORIES[i] if i < len(CATEGORIES) else f"category{i}" for i in range(count)]
+
+def seed_database(conn, config: SeedConfig):
+    """Insert users and their data through ``conn``; returns the ``SeededUser`` list."""
+    rng = random.Random(config.seed)
+    hashed = password_hash(SEED_PASSWORD) # one hash for all users; bcrypt per user would dominate seeding
+    names = category_names(config.categories)
+    users = [SeededUser(seeded_uuid(rng), f"user{i}") for i in range(config.users)]
+    conn.executemany(
+        "INSERT INTO users (id, username, hashed_password) VALUES (?, ?, ?)",
+        [(u.id, u.username, hashed) for u in users],
+    )
+    for i, user in enumerate(users):
+        conn.executemany(
+            "INSERT INTO categories (id, user_id, name, type) VALUES (?, ?, ?, ?)",
+            [(seeded_uuid(rng), user.id, name, rng.choice(("income", "expense"))) for name in names],
+        )
+        seed_transactions(
+            conn, user.id, config.transactions_per_user,
+            start=START, days=DAYS, seed=config.seed * 1_000_003 + i, categories=names,
+        )
+        keys = dict(conn.execute("SELECT name, key FROM categories WHERE user_id = ?", (user.id,)).fetchall())
+        conn.executemany(
+            "INSERT INTO goals (id, user_id, name, target_amount, current_amount, target_date) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    seeded_uuid(rng), user.id, f"goal {g}", rng.randrange(100_000, 10_000_000),
+                    rng.randrange(0, 100_000), (START + timedelta(days=DAYS + rng.randrange(3 * 365))).isoformat(),
+                )
+                for g in range(config.goals)
+            ],
+        )
+        rows = []
+        for r in range(config.recurring):
+            start = START + timedelta(days=rng.randrange(DAYS))
+            rows.append((
+                seeded_uuid(rng), user.id, f"schedule {r}", rng.randrange(500, 200_000),
+                rng.choice(("income", "expense")), keys[rng.choice(names)], None,
+                rng.choice(("weekly", "monthly", "yearly")), start.isoformat(), start.isoformat(),
+            ))
+        conn.executemany(
+            "INSERT INTO recurring_transactions (id, user_id, name, amount, type, category_key, description, frequency, start_date, next_due_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    conn.execute("ANALYZE")
+    return users
+
+def add_seed_arguments(parser):
+    defaults = SeedConfig()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--transactions-per-user", type=int, default=defaults.transactions_per_user)
+    parser.add_argument("--categories", type=int, default=defaults.categories)
+    parser.add_argument("--goals", type=int, default=defaults.goals, help="goals per user")
+    parser.add_argument("--recurring", type=int, default=defaults.recurring, help="recurring schedules per user")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+def seed_config(args):
+    return SeedConfig(args.users, args.transactions_per_user, args.categories, args.goals, args.recurring, args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="SQLite file to create; must not exist")
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+
+    os.environ["DATABASE_URL"] = args.path
+    from app.data.database import close_pools, create_tables, db_connection
+
+    config = seed_config(args)
+    started = time.perf_counter()
+    create_tables()
+    with db_connection() as conn:
+        users = seed_database(conn, config)
+    close_pools()
+    print(json.dumps({
+        "path": args.path,
+        "config": vars(config),
+        "users": len(users),
+        "seconds": round(time.perf_counter() - started, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
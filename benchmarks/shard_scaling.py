@@ -0,0 +1,111 @@
+"""Write throughput across worker processes as the shard count grows.
+
+Each run registers ``--users`` users with ``DB_SHARDS`` set to the shard count
+under test, then starts ``--processes`` worker processes (standing in for
+uvicorn workers) that each insert transactions for their share of the users,
+committing every insert on its own through the same function the
+``POST /transactions/`` handler uses. With 0 shards every write goes to the
+single file and waits for its write lock.
+
+Run from the repository root:
+
+    python -m benchmarks.shard_scaling --processes 4 --shards 0 2 4 8
+    DB_SYNCHRONOUS=FULL python -m benchmarks.shard_scaling
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from datetime import date
+
+from benchmarks.common import CATEGORIES, percentile
+
+def worker(user_ids, inserts, start, results):
+    from app.api.transaction_api import _insert_transaction
+    from app.data.database import close_pools, ledger_connection
+    from app.models.models import TransactionCreate
+
+    start.wait()
+    latencies = []
+    for i in range(inserts):
+        user_id = user_ids[i % len(user_ids)]
+        transaction = TransactionCreate(
+            date=date(2024, 1, 1 + i % 28), amount=1 + i, type="expense",
+            category=CATEGORIES[i % len(CATEGORIES)], description=f"insert {i}",
+        )
+        started = time.perf_counter()
+        with ledger_connection(user_id) as conn:
+            _insert_transaction(conn, str(uuid.uuid4()), user_id, transaction)
+        latencies.append(time.perf_counter() - started)
+    close_pools()
+    results.put(latencies)
+
+def run(tmp, shards, args):
+    os.environ["DATABASE_URL"] = os.path.join(tmp, f"shards{shards}", "bench.db")
+    os.environ["DB_SHARDS"] = str(shards)
+    os.makedirs(os.path.dirname(os.environ["DATABASE_URL"]))
+
+    # Spawned workers read their settings from the environment set above.
+    context = multiprocessing.get_context("spawn")
+    setup = context.Process(target=register, args=(args.users,))
+    setup.start()
+    setup.join()
+
+    users = user_ids(args.users)
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(users[p::args.processes], args.inserts, start, results))
+        for p in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(2) # let the workers import the app before timing
+    started = time.perf_counter()
+    start.set()
+    latencies = [latency for _ in processes for latency in results.get()]
+    seconds = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    return {
+        "inserts_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def user_ids(count):
+    return [str(uuid.uuid5(uuid.NAMESPACE_URL, f"shard-bench:{i}")) for i in range(count)]
+
+def register(count):
+    from app.auth.auth import _insert_user
+    from app.data.database import close_pools, create_tables, db_connection
+
+    create_tables()
+    with db_connection() as conn:
+        for i, user_id in enumerate(user_ids(count)):
+            _insert_user(conn, user_id, f"bench{i}", "-")
+    close_pools()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4, help="worker processes")
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--inserts", type=int, default=2000, help="inserts per process")
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 2, 4, 8], help="shard counts to compare")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {str(shards): run(tmp, shards, args) for shards in args.shards}
+    print(json.dumps({
+        "processes": args.processes,
+        "inserts": args.processes * args.inserts,
+        "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+        "cpus": os.cpu_count(),
+        "shards": results,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare the old Python row-loop summary with the SQL GROUP BY summary.
+
+Run from the repository root:
+
+    python -m benchmarks.summary_aggregation --transactions 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+
+from app.data.categories import category_name_sql
+from benchmarks.common import seed_transactions
+
+def python_loop_summary(conn, user_id):
+    # The pre-aggregation implementation of /reports/summary, kept as the baseline.
+    rows = conn.execute(
+        f"SELECT amount, type, {category_name_sql()} AS category FROM transactions WHERE user_id = ?", (user_id,)
+    ).fetchall()
+    total_income = 0.0
+    total_expenses = 0.0
+    spending_by_category = defaultdict(float)
+    income_by_category = defaultdict(float)
+    for t in rows:
+        if t['type'] == 'income':
+            total_income += t['amount']
+            income_by_category[t['category']] += t['amount']
+        elif t['type'] == 'expense':
+            total_expenses += t['amount']
+            spending_by_category[t['category']] += t['amount']
+    return total_income, total_expenses, dict(spending_by_category), dict(income_by_category)
+
+def timed(func, repeat):
+    best = float("inf")
+    peak = 0
+    result = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return result, best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        from app.api.report_api import _summarize
+        from app.data.database import close_pools, create_tables, db_connection
+
+        create_tables()
+        user_id = str(uuid.uuid4())
+        with db_connection() as conn:
+            seed_transactions(conn, user_id, args.transactions)
+            conn.execute("ANALYZE")
+
+        with db_connection() as conn:
+            old, old_seconds, old_peak = timed(lambda: python_loop_summary(conn, user_id), args.repeat)
+            new, new_seconds, new_peak = timed(lambda: _summarize(conn, user_id, None, None), args.repeat)
+        close_pools()
+
+    # Amounts are stored in cents; the baseline sums raw column values.
+    assert old[0] == round(new.total_income * 100) and old[1] == round(new.total_expenses * 100)
+    print(json.dumps({
+        "transactions": args.transactions,
+        "python_loop": {"seconds": round(old_seconds, 4), "peak_bytes": old_peak},
+        "sql_group_by": {"seconds": round(new_seconds, 4), "peak_bytes": new_peak},
+        "speedup": round(old_seconds / new_seconds, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
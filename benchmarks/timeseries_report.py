@@ -0,0 +1,65 @@
+"""Latency of GET /reports/reports/timeseries over five years for a heavy user.
+
+Run from the repository root:
+
+    python -m benchmarks.timeseries_report --transactions 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import percentile, seed_transactions
+
+async def run(args):
+    import httpx
+    from app.auth.auth import create_access_token
+    from app.data.database import close_pools, create_tables, db_connection
+    from app.main import app
+
+    create_tables()
+    user_id = str(uuid.uuid4())
+    with db_connection() as conn:
+        conn.execute(
+            "INSERT INTO users (id, username, hashed_password) VALUES (?, ?, ?)",
+            (user_id, "bench", "unused"),
+        )
+        seed_transactions(conn, user_id, args.transactions)
+        conn.execute("ANALYZE")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for interval in ("day", "week", "month"):
+            params = {"interval": interval, "start_date": "2019-01-01", "end_date": "2023-12-31"}
+            latencies = []
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                response = await client.get("/reports/reports/timeseries", params=params, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+            results[interval] = {
+                "periods": len(response.json()["periods"]),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            }
+    close_pools()
+    print(json.dumps({"transactions": args.transactions, "intervals": results}, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        os.environ.setdefault("RECURRING_SCHEDULER_ENABLED", "0")
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Latency of /transactions/search on a large ledger.
+
+Seeds ledgers with merchant-style descriptions (indexed by the FTS triggers as
+they are written), then times one page of one user's results for common, rare,
+multi-word and date-restricted queries in both orders. Other users' ledgers
+share the index and its words; with ``--users`` above 1 the timings show what
+a search still pays for them. The plain listing scan a client had to do before
+is timed for comparison.
+
+Run from the repository root:
+
+    python -m benchmarks.transaction_search --transactions 1000000
+    python -m benchmarks.transaction_search --transactions 100000 --users 10
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import date
+
+from benchmarks.common import percentile, seed_transactions
+
+MERCHANTS = (
+    "Amazon", "Amazon Marketplace", "Walmart", "Target", "Costco", "Starbucks", "Shell", "Uber", "Lyft",
+    "Netflix", "Spotify", "Apple", "Google", "Whole Foods", "Trader Joes", "Home Depot", "IKEA", "Airbnb",
+    "Delta", "United", "CVS", "Walgreens", "Chipotle", "McDonalds", "Safeway", "Kroger", "Etsy", "eBay",
+)
+WORDS = ("order", "refund", "subscription", "groceries", "fuel", "ride", "books", "gift", "monthly", "travel")
+
+QUERIES = (
+    ("common word", {"q": "amazon"}),
+    ("rare prefix", {"q": "walg"}),
+    ("two words", {"q": "amazon refund"}),
+    ("selective words", {"q": "netflix gift"}),
+    ("word in March 2023", {"q": "amazon", "start_date": "2023-03-01", "end_date": "2023-03-31"}),
+)
+
+def descriptions(rng):
+    return [f"{merchant} {rng.choice(WORDS)} #{rng.randrange(1000)}" for merchant in MERCHANTS for _ in range(50)]
+
+def timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return result, samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=1_000_000, help="per user")
+    parser.add_argument("--users", type=int, default=1, help="ledgers in the file; the first is searched")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        from app.api.transaction_search import search_page
+        from app.data.database import close_pools, create_tables, db_connection
+
+        create_tables()
+        user_ids = [str(uuid.uuid4()) for _ in range(args.users)]
+        user_id = user_ids[0]
+        started = time.perf_counter()
+        with db_connection() as conn:
+            for seed, owner in enumerate(user_ids):
+                seed_transactions(conn, owner, args.transactions, seed=42 + seed, descriptions=descriptions(random.Random(7)))
+            conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('optimize')")
+            conn.execute("ANALYZE")
+        seed_seconds = time.perf_counter() - started
+
+        results = {}
+        with db_connection() as conn:
+            for name, params in QUERIES:
+                start = date.fromisoformat(params["start_date"]) if "start_date" in params else None
+                end = date.fromisoformat(params["end_date"]) if "end_date" in params else None
+                for order in ("rank", "date"):
+                    (rows, _), samples = timed(
+                        lambda: search_page(conn, user_id, params["q"], start, end, None, args.limit, order), args.repeat,
+                    )
+                    results[f"{name} ({order})"] = {
+                        "rows": len(rows),
+                        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                    }
+            _, samples = timed(
+                lambda: [r for r in conn.execute(
+                    "SELECT * FROM transactions WHERE user_id = ?", (user_id,)
+                ) if "amazon" in (r["description"] or "").lower()],
+                3,
+            )
+            results["client-side filter of the full ledger"] = {"p50_ms": round(percentile(samples, 50) * 1000, 2)}
+        close_pools()
+
+    print(json.dumps({
+        "transactions_per_user": args.transactions,
+        "users": args.users,
+        "seed_seconds_with_fts_triggers": round(seed_seconds, 1),
+        "queries": results,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()